@@ -0,0 +1,186 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+
+def parse_model_limits(spec: str | None) -> dict[str, int]:
+    """Parse ``"model=limit,model2=limit"`` into ``{model: limit}``."""
+    limits: dict[str, int] = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        model, limit = part.rsplit("=", 1)
+        if model.strip() and limit.strip():
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+class ConcurrencyLimiter:
+    """One global semaphore plus optional per-model semaphores.
+
+    The per-model slot is taken first so a call waiting on a busy model does
+    not hold one of the global slots.
+    """
+
+    def __init__(self, max_concurrency: int, per_model: dict[str, int] | None = None):
+        self._global = asyncio.Semaphore(max(1, int(max_concurrency)))
+        self._per_model = {m: asyncio.Semaphore(max(1, n)) for m, n in (per_model or {}).items()}
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        model_sem = self._per_model.get(model)
+        if model_sem is None:
+            async with self._global:
+                yield
+            return
+        async with model_sem, self._global:
+            yield
+
+
+def certain_survivors(scores: dict[int, float], n: int, pool_size: int) -> list[int]:
+    """Return the players guaranteed to pass the score filter.
+
+    Players are ranked like ``sorted(..., key=score, reverse=True)`` (ties keep
+    their original order). A scored player is certain to survive when the
+    players ranked ahead of it plus every player still being scored cannot
+    push it out of the top ``pool_size``.
+    """
+    ranked = sorted(scores, key=lambda i: (-scores[i], i))
+    unscored = n - len(scores)
+    return [i for pos, i in enumerate(ranked) if pos + unscored < pool_size]
+
+
+async def score_and_play(
+    n: int,
+    *,
+    score,
+    play,
+    on_match,
+    make_scheduler,
+    rating: dict,
+    pool_size: int,
+    max_matches: int = 0,
+    eager: bool = True,
+    refresh=None,
+    should_stop=None,
+    rescore=None,
+    replan=None,
+) -> tuple[dict[int, float], list[int]]:
+    """Score ``n`` players and play the pairwise stage on the running loop.
+
+    ``score(i)`` and ``play(i, j)`` are coroutines working on player indices;
+    a player whose score is ``None`` is left out of the pool. ``score`` may
+    be ``None`` to skip the score filter and ``play`` may be
+    ``None`` to skip the pairwise stage. ``on_match(i, j, winner)`` is called
+    for every finished match. The scheduler built by ``make_scheduler(pool)``
+    reads ``rating`` between rounds; ``refresh()``, when given, is called
+    before every round and once at the end to bring ``rating`` up to date.
+    ``should_stop()``, when given, is checked after every pairwise result;
+    once it returns ``True`` the matches still in flight are cancelled and
+    no further rounds are scheduled. ``rescore(scores)``, when given, is
+    awaited once every player is scored and before the pool is cut; it may
+    change ``scores`` in place, e.g. to escalate the players near the cut.
+    ``replan()``, when given, is called next and returns the ``(pool_size,
+    max_matches)`` to go on with, e.g. sized for what is left of a budget.
+
+    With ``eager`` set, matches between players that are already certain to
+    survive the score filter start while the remaining players are still
+    being scored. Only use it with schedulers that play every pair of the
+    pool (round-robin), since the pairs are fixed before scoring finishes.
+    It is ignored with ``rescore`` or ``replan``, which may move the cut.
+
+    Returns the scores and the pool of surviving players.
+    """
+    scores: dict[int, float] = {}
+    played: dict[frozenset, tuple] = {}
+    pending: set[asyncio.Task] = set()
+
+    def budget_left() -> bool:
+        return max_matches <= 0 or len(played) < max_matches
+
+    async def judged(i: int, j: int):
+        return i, j, await play(i, j)
+
+    async def run_match(i: int, j: int):
+        winner = await play(i, j)
+        on_match(i, j, winner)
+        played[frozenset((i, j))] = (i, j, winner)
+
+    def start_match(i: int, j: int) -> None:
+        if not budget_left():
+            return
+        # Reserve the slot so budget and duplicate checks see in-flight matches.
+        played[frozenset((i, j))] = None
+        pending.add(asyncio.create_task(run_match(i, j)))
+
+    if score is None:
+        pool = list(range(n))
+    else:
+        promoted: list[int] = []
+        dropped: set[int] = set()
+
+        async def score_one(i: int):
+            value = await score(i)
+            if value is None:
+                dropped.add(i)
+            else:
+                scores[i] = value
+            return i
+
+        eager = eager and play is not None and rescore is None and replan is None
+        for fut in asyncio.as_completed([score_one(i) for i in range(n)]):
+            await fut
+            if not eager:
+                continue
+            for i in certain_survivors(scores, n - len(dropped), pool_size):
+                if i in promoted:
+                    continue
+                for j in promoted:
+                    start_match(j, i)
+                promoted.append(i)
+        if rescore is not None:
+            await rescore(scores)
+        if replan is not None:
+            pool_size, max_matches = replan()
+        pool = sorted(scores, key=lambda i: (-scores[i], i))[:pool_size]
+
+    if play is None:
+        return scores, pool
+
+    if pending:
+        await asyncio.gather(*pending)
+    scheduler = make_scheduler(pool)
+    for result in played.values():
+        scheduler.record(*result)
+
+    def finish(i: int, j: int, winner) -> None:
+        on_match(i, j, winner)
+        played[frozenset((i, j))] = (i, j, winner)
+        scheduler.record(i, j, winner)
+
+    stopped = should_stop is not None and should_stop()
+    while budget_left() and not stopped:
+        if refresh is not None:
+            refresh()
+        pairs = [p for p in scheduler.next_round(rating) if frozenset(p) not in played]
+        if max_matches > 0:
+            pairs = pairs[: max_matches - len(played)]
+        if not pairs:
+            break
+        tasks = [asyncio.ensure_future(judged(i, j)) for i, j in pairs]
+        for fut in asyncio.as_completed(tasks):
+            finish(*await fut)
+            if should_stop is not None and should_stop():
+                stopped = True
+                break
+        if stopped:
+            unfinished = [t for t in tasks if not t.done()]
+            for task in unfinished:
+                task.cancel()
+            # Matches that completed while we were deciding are already paid for.
+            for task in tasks:
+                if task not in unfinished and frozenset(task.result()[:2]) not in played:
+                    finish(*task.result())
+            await asyncio.gather(*unfinished, return_exceptions=True)
+    if refresh is not None:
+        refresh()
+    return scores, pool
@@ -0,0 +1 @@
+"""Offline benchmarks for the tournament engine (see ``benchmarks/run.py``)."""
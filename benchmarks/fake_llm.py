@@ -0,0 +1,274 @@
+"""Deterministic stand-in for ``litellm.completion`` used by the benchmarks.
+
+Every generated answer carries a hidden quality drawn from a standard
+normal distribution, written into its text as ``[q=0.1234]`` so judges can
+read it back and benchmarks can compute the true ranking. Judges see each
+quality through Gaussian noise, so a judge with ``judge_noise=0`` is always
+right and larger values make it flip close matches more often.
+
+Answers, verdicts and latencies are derived from a hash of the seed and the
+prompt (plus how often that prompt was sent before), so they do not depend
+on the order in which concurrent calls arrive. Rate limit rejections depend
+on timing and are the only non-deterministic part.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import tournament_utils
+
+
+QUALITY_RE = re.compile(r"\[q=(-?\d+(?:\.\d+)?)\]")
+PAIR_RE = re.compile(r"<A>(.*?)</A>\s*<B>(.*?)</B>", re.DOTALL)
+OUTPUTS_RE = re.compile(r"<O(\d+)>(.*?)</O\1>", re.DOTALL)
+EXAMPLE_RE = re.compile(r"e\.g\. \[\[?([^\]]*)\]")
+
+WORDS = (
+    "the answer depends on context but in most cases a careful reading of the question shows that "
+    "evidence supports one clear option while alternatives remain plausible under different assumptions"
+).split()
+
+
+class RateLimitError(Exception):
+    """Looks like a provider 429 to :func:`dispatch.is_retryable`."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limit exceeded")
+        self.response = SimpleNamespace(headers={"retry-after": f"{retry_after:.4f}"})
+
+
+def count_tokens(text: str) -> int:
+    """Rough token count: four tokens for every three words."""
+    return max(1, round(len(text.split()) * 4 / 3))
+
+
+def quality(text: str) -> float:
+    """The hidden quality written into a generated answer (``-inf`` if there is none)."""
+    match = QUALITY_RE.search(text)
+    return float(match.group(1)) if match else -math.inf
+
+
+class Latency:
+    """Log-normal latency with a per-token cost and an occasional slow tail.
+
+    A call takes ``median * exp(sigma * z) + per_token * completion_tokens``
+    seconds, multiplied by ``tail_factor`` with probability ``tail_prob``.
+    """
+
+    def __init__(
+        self,
+        median: float = 1.0,
+        sigma: float = 0.4,
+        per_token: float = 0.01,
+        tail_prob: float = 0.02,
+        tail_factor: float = 8.0,
+    ):
+        self.median = median
+        self.sigma = sigma
+        self.per_token = per_token
+        self.tail_prob = tail_prob
+        self.tail_factor = tail_factor
+
+    def sample(self, rng: random.Random, completion_tokens: int) -> float:
+        seconds = self.median * math.exp(self.sigma * rng.gauss(0, 1)) + self.per_token * completion_tokens
+        if rng.random() < self.tail_prob:
+            seconds *= self.tail_factor
+        return seconds
+
+
+class FakeLLM:
+    """Configurable fake completion backend.
+
+    ``time_scale`` converts simulated seconds into real ones (``0.01`` runs a
+    one-second call in 10 ms, ``0`` does not sleep at all). ``rpm`` rejects
+    requests beyond that many per simulated minute and model with a 429
+    carrying ``Retry-After``. ``n_cap`` returns at most that many choices per
+    generation request, like providers that cap ``n``. ``duplicate_rate`` is
+    the probability that a generated answer repeats an earlier one.
+    ``position_bias`` is added to the perceived quality of the player shown
+    first in a pairwise match; ``tie_margin`` makes the judge answer ``tie``
+    when allowed and the perceived qualities are that close.
+    ``parse_failure_rate`` is the share of judge answers without a verdict.
+    ``model_noise`` maps judge models to their own ``judge_noise``, e.g. to
+    pair a noisy cheap judge with an accurate expensive one.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        *,
+        latency: Latency | None = None,
+        time_scale: float = 0.01,
+        rpm: float = 0,
+        n_cap: int = 0,
+        answer_words: int = 60,
+        duplicate_rate: float = 0.0,
+        judge_noise: float = 0.5,
+        position_bias: float = 0.0,
+        tie_margin: float = 0.0,
+        parse_failure_rate: float = 0.0,
+        model_noise: dict[str, float] | None = None,
+    ):
+        self.seed = seed
+        self.latency = latency or Latency()
+        self.time_scale = time_scale
+        self.rpm = rpm
+        self.n_cap = n_cap
+        self.answer_words = answer_words
+        self.duplicate_rate = duplicate_rate
+        self.judge_noise = judge_noise
+        self.position_bias = position_bias
+        self.tie_margin = tie_margin
+        self.parse_failure_rate = parse_failure_rate
+        self.model_noise = dict(model_noise or {})
+        self.calls: Counter = Counter()
+        self.calls_by_model: Counter = Counter()
+        self.rejected = 0
+        self._sent: Counter = Counter()
+        self._recent: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    # --- randomness -------------------------------------------------------
+
+    def _seeded(self, *parts) -> random.Random:
+        digest = hashlib.sha1("\x00".join(map(str, (self.seed, *parts))).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _rng(self, messages: list[dict]) -> tuple[random.Random, str, int]:
+        """Generator seeded by the prompt and how often it was sent before; also those two."""
+        prompt = "\x00".join(m["content"] for m in messages)
+        with self._lock:
+            self._sent[prompt] += 1
+            attempt = self._sent[prompt]
+        return self._seeded(attempt, prompt), prompt, attempt
+
+    def _admit(self, model: str) -> None:
+        if self.rpm <= 0 or self.time_scale <= 0:
+            return
+        window = 60.0 * self.time_scale
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent.setdefault(model, deque())
+            while recent and now - recent[0] >= window:
+                recent.popleft()
+            if len(recent) >= self.rpm:
+                self.rejected += 1
+                raise RateLimitError(recent[0] + window - now)
+            recent.append(now)
+
+    # --- answers ----------------------------------------------------------
+
+    def _answer(self, prompt: str, slot: int) -> str:
+        rng = self._seeded("answer", slot, prompt)
+        words = " ".join(rng.choice(WORDS) for _ in range(self.answer_words))
+        return f"[q={rng.gauss(0, 1):.4f}] {words}"
+
+    def _generate(self, rng: random.Random, prompt: str, attempt: int, n: int) -> list[str]:
+        # Answers are numbered per prompt, so streamed single-answer requests
+        # and one ``n``-answer request produce the same answers.
+        first = (attempt - 1) * n
+        if self.n_cap:
+            n = min(n, self.n_cap)
+        answers = []
+        for slot in range(first, first + n):
+            if slot and rng.random() < self.duplicate_rate:
+                slot = rng.randrange(slot)
+            answers.append(self._answer(prompt, slot))
+        return answers
+
+    def _perceived(self, rng: random.Random, text: str, noise: float) -> float:
+        return quality(text) + rng.gauss(0, noise)
+
+    def _scores(self, rng: random.Random, text: str, criteria: int, noise: float) -> list[int]:
+        return [max(1, min(10, round(5.5 + 2 * self._perceived(rng, text, noise)))) for _ in range(criteria)]
+
+    def _judge(self, rng: random.Random, prompt: str, model: str, structured: bool = False) -> tuple[str, str]:
+        """Return the call kind and the answer of the judge ``model`` for ``prompt``.
+
+        With ``structured`` (a JSON ``response_format`` was requested) the
+        verdict is a JSON object instead of a ``Final verdict:`` line.
+        """
+        noise = self.model_noise.get(model, self.judge_noise)
+        example = EXAMPLE_RE.search(prompt)
+        criteria = max(1, example.group(1).count("1-10")) if example else 1
+        pair = PAIR_RE.search(prompt)
+        outputs = OUTPUTS_RE.findall(prompt)
+        if pair:
+            kind = "pairwise"
+            first, second = (self._perceived(rng, text, noise) for text in pair.groups())
+            diff = first + self.position_bias - second
+            if ("Final verdict: tie" in prompt or '"verdict": "tie"' in prompt) and abs(diff) < self.tie_margin:
+                verdict = "tie"
+            else:
+                verdict = "A" if diff >= 0 else "B"
+        elif outputs and "Rank the" in prompt:
+            kind = "rank"
+            perceived = [self._perceived(rng, text, noise) for _, text in outputs]
+            order = sorted(range(len(outputs)), key=lambda i: -perceived[i])
+            verdict = [i + 1 for i in order]
+        elif outputs:
+            kind = "score_batch"
+            verdict = [self._scores(rng, text, criteria, noise) for _, text in outputs]
+        else:
+            kind = "score"
+            verdict = self._scores(rng, prompt.rsplit("Output:\n", 1)[-1], criteria, noise)
+        if rng.random() < self.parse_failure_rate:
+            return kind, "I cannot decide between these."
+        if structured:
+            return kind, json.dumps({"verdict": verdict})
+        return kind, f"Final verdict: {verdict}"
+
+    def _respond(self, model: str, messages: list[dict], n: int, structured: bool = False) -> tuple[object, float]:
+        """Build the response and its simulated latency in seconds."""
+        self._admit(model)
+        rng, prompt, attempt = self._rng(messages)
+        if any(m["role"] == "system" for m in messages):
+            kind, text = self._judge(rng, prompt, model, structured)
+            contents = [text]
+        else:
+            kind = "generate"
+            contents = self._generate(rng, prompt, attempt, n)
+        with self._lock:
+            self.calls[kind] += 1
+            self.calls_by_model[model] += 1
+        prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+        completion_tokens = sum(count_tokens(c) for c in contents)
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=c)) for c in contents],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+        )
+        return response, self.latency.sample(rng, completion_tokens) * self.time_scale
+
+    # --- litellm interface --------------------------------------------------
+
+    def completion(self, *, model: str, messages: list[dict], n: int = 1, **kwargs):
+        response, delay = self._respond(model, messages, n, "response_format" in kwargs)
+        if delay > 0:
+            time.sleep(delay)
+        return response
+
+    async def acompletion(self, *, model: str, messages: list[dict], n: int = 1, **kwargs):
+        response, delay = self._respond(model, messages, n, "response_format" in kwargs)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return response
+
+    @contextmanager
+    def installed(self):
+        """Route every model call of :mod:`tournament_utils` to this backend."""
+        saved = tournament_utils.completion, tournament_utils.acompletion
+        tournament_utils.completion, tournament_utils.acompletion = self.completion, self.acompletion
+        try:
+            yield self
+        finally:
+            tournament_utils.completion, tournament_utils.acompletion = saved
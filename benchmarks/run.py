@@ -0,0 +1,290 @@
+"""Benchmark tournament strategies against the fake backend in ``fake_llm.py``.
+
+Usage::
+
+    python benchmarks/run.py --strategies round_robin,swiss,active --pool-sizes 8,16,32 --workers 4,16
+    python benchmarks/run.py --compare benchmarks/results/<old commit>.json benchmarks/results/<new commit>.json
+
+Every combination of strategy (pairing mode), pipeline (threads or
+asyncio), worker count and pool size (number of generations) is run once
+per seed. Each run records the wall-clock time, the calls, tokens and
+retries per stage, the rate limit rejections and the top-k recall against
+the hidden answer qualities. The results are written as JSON together with
+the commit they were measured on, so two files can be compared with
+``--compare``.
+"""
+import argparse, json, os, statistics, subprocess, sys, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import engine
+from benchmarks.fake_llm import FakeLLM, Latency, quality
+from dispatch import Dispatcher
+from pairing import PAIRING_MODES
+
+
+INSTRUCTION = "Explain whether the evidence supports the claim."
+# Columns compared between result files: name, format and whether lower is better.
+COMPARED = (
+    ("wall_s", "{:.2f}", True),
+    ("judge_calls", "{:.0f}", True),
+    ("tokens", "{:.0f}", True),
+    ("recall", "{:.2f}", False),
+)
+
+
+def git_commit() -> dict:
+    """Commit of the working tree and whether it has uncommitted changes."""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def recall_at_k(state, k: int) -> tuple[float, bool]:
+    """Share of the true top ``k`` among the top picks, and whether the best answer came first."""
+    truth = sorted(state.players, key=quality, reverse=True)[:k]
+    if not truth:
+        return 0.0, False
+    hits = len(set(state.top_picks[:k]) & set(truth))
+    return hits / len(truth), bool(state.top_picks) and state.top_picks[0] == truth[0]
+
+
+def run_config(config: dict, settings: dict) -> dict:
+    """Run one tournament on a fresh fake backend and return its measurements."""
+    time_scale = settings["time_scale"]
+    backend = FakeLLM(
+        config["seed"],
+        latency=Latency(settings["latency_median"], settings["latency_sigma"], tail_prob=settings["tail_prob"]),
+        time_scale=time_scale,
+        rpm=settings["rpm"],
+        n_cap=settings["n_cap"],
+        duplicate_rate=settings["duplicate_rate"],
+        judge_noise=settings["judge_noise"],
+        position_bias=settings["position_bias"],
+        tie_margin=settings["tie_margin"],
+        model_noise={"fake-cascade": settings["cascade_noise"]} if settings["cascade_noise"] is not None else None,
+    )
+    # The dispatcher paces and backs off in real seconds, the backend limits per simulated minute.
+    pace = settings["pace"] and settings["rpm"] and time_scale
+    dispatcher = Dispatcher(
+        settings["rpm"] / time_scale if pace else 0,
+        max_retries=settings["max_retries"],
+        base_delay=0.5 * time_scale,
+        max_delay=30.0 * time_scale,
+    )
+    n_gen = config["pool_size"]
+    top_k = settings["top_picks"]
+    judges = range(1, settings["judges"] + 1)
+    with backend.installed():
+        started = time.perf_counter()
+        state = engine.run(
+            api_base="",
+            api_token="",
+            generate_model="fake-generate",
+            score_model=",".join(f"fake-score-{i}" for i in judges),
+            pairwise_model=",".join(f"fake-pairwise-{i}" for i in judges),
+            generate_temperature=0.9,
+            score_temperature=0.6,
+            pairwise_temperature=0.6,
+            instruction_input=INSTRUCTION,
+            criteria_input=engine.CRITERIA_DEFAULT,
+            n_gen=n_gen,
+            pool_size=max(top_k, round(n_gen * settings["pool_fraction"])),
+            num_top_picks=top_k,
+            max_workers=config["workers"],
+            enable_score_filter=settings["score_filter"],
+            enable_pairwise_filter=True,
+            score_with_instruction=True,
+            pairwise_with_instruction=True,
+            generate_thinking=False,
+            score_thinking=False,
+            pairwise_thinking=False,
+            pairing_mode=config["strategy"],
+            max_matches=settings["max_matches"],
+            use_async=config["pipeline"] == "async",
+            judge_cache_path="",
+            score_batch_size=settings["score_batch_size"],
+            early_stop_confidence=settings["early_stop_confidence"],
+            stream_generation=settings["stream_generation"],
+            pairwise_order=settings["pairwise_order"],
+            dedup_threshold=0,
+            cascade_model="fake-cascade" if settings["cascade_noise"] is not None else "",
+            cascade_margin=settings["cascade_margin"],
+            dispatcher=dispatcher,
+        )
+        wall = time.perf_counter() - started
+    calls = {stage: 0 for stage in ("generate", "score", "pairwise")}
+    for (stage, _), stats in state.metrics.snapshot().items():
+        calls[stage] = calls.get(stage, 0) + stats.calls
+    totals = state.metrics.totals()
+    recall, top1 = recall_at_k(state, top_k)
+    return {
+        **config,
+        "wall_s": round(wall, 4),
+        "simulated_s": round(wall / time_scale, 2) if time_scale else None,
+        "calls": calls,
+        "judge_calls": calls["score"] + calls["pairwise"],
+        "cascade_calls": backend.calls_by_model["fake-cascade"],
+        "prompt_tokens": totals.prompt_tokens,
+        "completion_tokens": totals.completion_tokens,
+        "tokens": totals.prompt_tokens + totals.completion_tokens,
+        "retries": totals.retries,
+        "rate_limited": backend.rejected,
+        "players": len(state.players),
+        "recall": recall,
+        "top1": top1,
+    }
+
+
+def configs(args):
+    for strategy in args.strategies:
+        for pipeline in args.pipelines:
+            for workers in args.workers:
+                for pool_size in args.pool_sizes:
+                    for seed in range(args.seeds):
+                        yield {
+                            "strategy": strategy,
+                            "pipeline": pipeline,
+                            "workers": workers,
+                            "pool_size": pool_size,
+                            "seed": seed,
+                        }
+
+
+def config_key(row: dict) -> tuple:
+    return row["strategy"], row["pipeline"], row["workers"], row["pool_size"]
+
+
+def summarize(runs: list[dict]) -> dict[tuple, dict]:
+    """Median wall time and mean of the other compared columns over the seeds of each configuration."""
+    groups: dict[tuple, list[dict]] = {}
+    for row in runs:
+        groups.setdefault(config_key(row), []).append(row)
+    return {
+        key: {
+            name: (statistics.median if name == "wall_s" else statistics.fmean)(r[name] for r in rows)
+            for name, _, _ in COMPARED
+        }
+        for key, rows in groups.items()
+    }
+
+
+def table(header: list[str], rows: list[list[str]]) -> str:
+    widths = [max(len(r[i]) for r in [header, *rows]) for i in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(w) for cell, w in zip(row, widths)) for row in [header, *rows])
+
+
+def summary_table(runs: list[dict]) -> str:
+    rows = [
+        [*map(str, key), *(fmt.format(values[name]) for name, fmt, _ in COMPARED)]
+        for key, values in summarize(runs).items()
+    ]
+    return table(["strategy", "pipeline", "workers", "pool", *(name for name, _, _ in COMPARED)], rows)
+
+
+def compare_table(old: dict, new: dict) -> str:
+    """Per-configuration change between two result files; ``!`` marks changes for the worse above 10%."""
+    before, after = summarize(old["runs"]), summarize(new["runs"])
+    rows = []
+    for key in after:
+        if key not in before:
+            continue
+        cells = list(map(str, key))
+        for name, fmt, lower_is_better in COMPARED:
+            a, b = before[key][name], after[key][name]
+            change = (b - a) / a if a else 0.0
+            worse = change > 0.1 if lower_is_better else change < -0.1
+            cells.append(f"{fmt.format(a)} -> {fmt.format(b)} ({change:+.0%}){' !' if worse else ''}")
+        rows.append(cells)
+    header = ["strategy", "pipeline", "workers", "pool", *(name for name, _, _ in COMPARED)]
+    title = f"{old.get('commit', '?')[:10]} -> {new.get('commit', '?')[:10]}"
+    return title + "\n" + table(header, rows)
+
+
+def csv(cast):
+    return lambda value: [cast(v) for v in value.split(",") if v]
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark tournament strategies against a fake LLM backend.")
+    p.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    p.add_argument("-o", "--output", help="results file (default benchmarks/results/<commit>.json)")
+    p.add_argument("--strategies", type=csv(str), default=["round_robin", "swiss", "knockout", "active", "listwise", "groups"])
+    p.add_argument("--pipelines", type=csv(str), default=["threads", "async"], help="threads, async or both")
+    p.add_argument("--workers", type=csv(int), default=[4, 32], help="max_workers values")
+    p.add_argument("--pool-sizes", type=csv(int), default=[8, 16, 32], help="generations per tournament")
+    p.add_argument("--seeds", type=int, default=3, help="runs per configuration")
+    p.add_argument("--top-picks", type=int, default=3)
+    p.add_argument("--pool-fraction", type=float, default=0.5, help="share of the players kept by the score filter")
+    p.add_argument("--score-filter", action=argparse.BooleanOptionalAction, default=True)
+    p.add_argument("--score-batch-size", type=int, default=1)
+    p.add_argument("--max-matches", type=int, default=0)
+    p.add_argument("--early-stop-confidence", type=float, default=0)
+    p.add_argument("--stream-generation", action=argparse.BooleanOptionalAction, default=False)
+    p.add_argument("--pairwise-order", choices=engine.PAIRWISE_ORDERS, default="fixed")
+    p.add_argument("--time-scale", type=float, default=0.01, help="real seconds per simulated second")
+    p.add_argument("--latency-median", type=float, default=1.0, help="simulated seconds")
+    p.add_argument("--latency-sigma", type=float, default=0.4)
+    p.add_argument("--tail-prob", type=float, default=0.02, help="share of calls 8x slower")
+    p.add_argument("--rpm", type=float, default=0, help="simulated requests per minute per model (0 = unlimited)")
+    p.add_argument(
+        "--pace", action=argparse.BooleanOptionalAction, default=True, help="let the dispatcher pace requests to --rpm"
+    )
+    p.add_argument("--max-retries", type=int, default=8)
+    p.add_argument("--n-cap", type=int, default=0, help="most choices per generation request (0 = no cap)")
+    p.add_argument("--duplicate-rate", type=float, default=0.0)
+    p.add_argument("--judge-noise", type=float, default=0.5)
+    p.add_argument("--position-bias", type=float, default=0.0)
+    p.add_argument("--tie-margin", type=float, default=0.0)
+    p.add_argument("--judges", type=int, default=1, help="first-pass judges per stage (more than one = ensemble)")
+    p.add_argument("--cascade-noise", type=float, help="judge noise of a cascade judge for close calls (default none)")
+    p.add_argument("--cascade-margin", type=float, default=engine.CASCADE_MARGIN_DEFAULT)
+    args = p.parse_args(argv)
+    unknown = set(args.strategies) - set(PAIRING_MODES)
+    if unknown or set(args.pipelines) - {"threads", "async"}:
+        p.error(f"unknown strategy or pipeline: {', '.join(sorted(unknown)) or args.pipelines}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.compare:
+        files = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                files.append(json.load(f))
+        print(compare_table(*files))
+        return 0
+    settings = {
+        name: value
+        for name, value in vars(args).items()
+        if name not in {"compare", "output", "strategies", "pipelines", "workers", "pool_sizes", "seeds"}
+    }
+    todo = list(configs(args))
+    runs = []
+    for i, config in enumerate(todo, 1):
+        row = run_config(config, settings)
+        runs.append(row)
+        print(
+            f"{i}/{len(todo)} {config['strategy']} {config['pipeline']} workers={config['workers']} "
+            f"pool={config['pool_size']} seed={config['seed']}: {row['wall_s']:.2f}s, "
+            f"{row['judge_calls']} judge calls, recall {row['recall']:.2f}",
+            file=sys.stderr,
+        )
+    result = {**git_commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "settings": settings, "runs": runs}
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{result['commit'][:10] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=1)
+    print(summary_table(runs))
+    print(f"Results written to {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,384 @@
+import math
+import threading
+
+from metrics import estimate_cost, usage_tokens
+
+
+# Rough prompt-size estimate used before any usage is known.
+CHARS_PER_TOKEN = 4
+# Judge prompt text besides the instruction, criteria and players.
+JUDGE_OVERHEAD_TOKENS = 80
+# Completion tokens of a bare verdict, and of a verdict with reasons.
+VERDICT_TOKENS = 20
+EXPLAIN_TOKENS = 300
+# Completion tokens assumed per answer until real answers are seen.
+ANSWER_TOKENS_GUESS = 400
+# Answers generated before planning, so the plan is made for their real length.
+SAMPLE_ANSWERS = 2
+# Latency model for planning: time to the first token plus decoding time.
+FIRST_TOKEN_SECONDS = 0.5
+TOKENS_PER_SECOND = 50.0
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of dispatching a call that would go over the budget."""
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def call_seconds(completion_tokens: float) -> float:
+    return FIRST_TOKEN_SECONDS + completion_tokens / TOKENS_PER_SECOND
+
+
+class CallCosts:
+    """Estimated ``(prompt, completion)`` tokens of each kind of call in a tournament.
+
+    Prompts are estimated from the instruction, the criteria block and
+    ``answer_tokens`` per player; completions from the verdict format.
+    """
+
+    def __init__(
+        self,
+        instruction: str,
+        criteria_block: str,
+        answer_tokens: float = ANSWER_TOKENS_GUESS,
+        *,
+        score_with_instruction: bool = True,
+        pairwise_with_instruction: bool = True,
+        score_explain: bool = False,
+        pairwise_explain: bool = False,
+    ):
+        self.instruction_tokens = estimate_tokens(instruction)
+        self.answer_tokens = answer_tokens
+        context = JUDGE_OVERHEAD_TOKENS + estimate_tokens(criteria_block)
+        self.score_context = context + (self.instruction_tokens if score_with_instruction else 0)
+        self.pairwise_context = context + (self.instruction_tokens if pairwise_with_instruction else 0)
+        self.score_verdict = EXPLAIN_TOKENS if score_explain else VERDICT_TOKENS
+        self.pairwise_verdict = EXPLAIN_TOKENS if pairwise_explain else VERDICT_TOKENS
+
+    def generate(self, n: int) -> tuple[float, float]:
+        return self.instruction_tokens, n * self.answer_tokens
+
+    def score(self, k: int = 1) -> tuple[float, float]:
+        return self.score_context + k * self.answer_tokens, k * self.score_verdict
+
+    def pairwise(self) -> tuple[float, float]:
+        return self.pairwise_context + 2 * self.answer_tokens, self.pairwise_verdict
+
+    def rank(self, k: int) -> tuple[float, float]:
+        return self.pairwise_context + k * self.answer_tokens, self.pairwise_verdict
+
+    def of_call(self, stage: str, args: tuple) -> tuple[float, float]:
+        """Estimate for one call from the positional ``args`` of its ``tournament_utils`` function."""
+        texts = [t for arg in args for t in (arg if isinstance(arg, list) else [arg]) if isinstance(t, str)]
+        prompt = sum(map(estimate_tokens, texts))
+        if stage == "generate":
+            return prompt, args[1] * self.answer_tokens
+        verdict = self.score_verdict if stage == "score" else self.pairwise_verdict
+        return JUDGE_OVERHEAD_TOKENS + prompt, verdict
+
+
+class Plan:
+    """Tournament size chosen by :class:`Planner` with its estimated spend and duration."""
+
+    def __init__(self, n_gen, pool_size, max_matches, matches, tokens, cost, seconds):
+        self.n_gen = n_gen
+        self.pool_size = pool_size
+        # Match cap to run with; 0 plays the full schedule.
+        self.max_matches = max_matches
+        self.matches = matches
+        self.tokens = tokens
+        self.cost = cost
+        self.seconds = seconds
+
+    def __str__(self) -> str:
+        matches = f"{self.matches} judge calls" + (" (capped)" if self.max_matches else "")
+        cost = f", ${self.cost:.4f}" if self.cost else ""
+        return (
+            f"{self.n_gen} generations, pool of {self.pool_size}, {matches}; "
+            f"about {self.tokens:.0f} tokens{cost} and {self.seconds:.0f}s"
+        )
+
+
+class Planner:
+    """Choose generation count, pool size and match cap to fit a budget.
+
+    ``max_tokens``, ``max_cost`` (USD, priced with LiteLLM's table) and
+    ``latency_target`` (seconds) are limits; ``0`` disables one. The
+    settings the user picked are upper bounds: :meth:`plan` shrinks the
+    generations and the pool together until the whole match schedule
+    fits, and only caps the matches when even the smallest tournament does
+    not fit, never below one match per pool player. Latency is estimated
+    per stage from the number of call waves ``max_workers`` allows.
+    A stage judged by an ensemble (a list of models) costs one call per
+    model; escalations to a cascade judge are not planned for, the budget
+    refuses them once it is spent.
+    """
+
+    def __init__(
+        self,
+        costs: CallCosts,
+        *,
+        models: dict[str, str | list[str]],
+        pairing_mode: str,
+        num_top_picks: int,
+        max_workers: int,
+        max_tokens: float = 0,
+        max_cost: float = 0,
+        latency_target: float = 0,
+        score_filter: bool = True,
+        pairwise_filter: bool = True,
+        score_batch_size: int = 1,
+        calls_per_match: int = 1,
+        rank_group_size: int = 4,
+        rank_rounds: int = 3,
+        group_stage_size: int = 8,
+        group_advance: int = 2,
+    ):
+        self.costs = costs
+        self.models = models
+        self.pairing_mode = pairing_mode
+        self.num_top_picks = num_top_picks
+        self.max_workers = max(1, max_workers)
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.latency_target = latency_target
+        self.score_filter = score_filter
+        self.pairwise_filter = pairwise_filter
+        self.score_batch_size = max(1, score_batch_size)
+        self.calls_per_match = calls_per_match
+        self.rank_group_size = rank_group_size
+        self.rank_rounds = rank_rounds
+        self.group_stage_size = group_stage_size
+        self.group_advance = group_advance
+        self._scheduled: dict[int, int] = {}
+
+    def scheduled_matches(self, pool: int) -> int:
+        """Judge calls the pairing mode schedules for a pool of ``pool`` players."""
+        if pool not in self._scheduled:
+            from pairing import make_scheduler
+
+            scheduler = make_scheduler(
+                self.pairing_mode,
+                list(range(pool)),
+                self.num_top_picks,
+                group_size=self.rank_group_size,
+                rounds=self.rank_rounds,
+                stage_size=self.group_stage_size,
+                advance=self.group_advance,
+            )
+            self._scheduled[pool] = scheduler.expected_matches()
+        return self._scheduled[pool]
+
+    def _spend(self, stage: str, calls: float, tokens: tuple[float, float]) -> tuple[float, float]:
+        # A stage judged by an ensemble sends every call to each of its models.
+        models = self.models[stage]
+        if isinstance(models, str):
+            models = [models]
+        prompt, completion = tokens
+        cost = sum(estimate_cost(m, round(prompt), round(completion)) for m in models) * calls
+        return calls * len(models) * (prompt + completion), cost
+
+    def _waves(self, calls: float, per_round: float) -> float:
+        """Sequential call waves: rounds of ``per_round`` calls, ``max_workers`` at a time."""
+        if calls <= 0:
+            return 0
+        if self.pairing_mode == "round_robin":
+            return math.ceil(calls / self.max_workers)
+        rounds = math.ceil(calls / max(1, per_round))
+        return rounds * math.ceil(min(calls, per_round) / self.max_workers)
+
+    def _match_call(self, pool: int) -> tuple[tuple[float, float], float]:
+        """Tokens of one pairwise stage call and the calls a round holds."""
+        if self.pairing_mode == "listwise":
+            group = min(self.rank_group_size, pool)
+            return self.costs.rank(group), math.ceil(pool / max(1, group))
+        return self.costs.pairwise(), max(1, pool // 2)
+
+    def estimate(self, n_gen: int, pool: int, matches: int, done=(), generated: int = 0) -> tuple[float, float, float]:
+        """Tokens, cost and seconds of a run, leaving out the stages in ``done``.
+
+        The first ``generated`` of the ``n_gen`` answers already exist and are
+        left out of the generation stage.
+        """
+        tokens = cost = seconds = 0.0
+        if "generate" not in done and n_gen > generated:
+            t, c = self._spend("generate", 1, self.costs.generate(n_gen - generated))
+            tokens, cost = tokens + t, cost + c
+            seconds += call_seconds(self.costs.answer_tokens)
+        if self.score_filter and "score" not in done:
+            calls = math.ceil(n_gen / self.score_batch_size)
+            per_call = self.costs.score(min(n_gen, self.score_batch_size))
+            t, c = self._spend("score", calls, per_call)
+            tokens, cost = tokens + t, cost + c
+            seconds += math.ceil(calls / self.max_workers) * call_seconds(per_call[1])
+        if self.pairwise_filter and matches:
+            per_call, per_round = self._match_call(pool)
+            calls = matches * (self.calls_per_match if self.pairing_mode != "listwise" else 1)
+            t, c = self._spend("pairwise", calls, per_call)
+            tokens, cost = tokens + t, cost + c
+            seconds += self._waves(matches, per_round) * call_seconds(per_call[1])
+        return tokens, cost, seconds
+
+    def _fits(self, tokens: float, cost: float, seconds: float, spent_tokens: float, spent_cost: float) -> bool:
+        return (
+            (not self.max_tokens or spent_tokens + tokens <= self.max_tokens)
+            and (not self.max_cost or spent_cost + cost <= self.max_cost)
+            and (not self.latency_target or seconds <= self.latency_target)
+        )
+
+    def _candidates(self, n_gen: int, pool_size: int, done, generated: int = 0) -> list[tuple[int, int]]:
+        """``(generations, pool)`` sizes to try, largest first.
+
+        Before generation the pool shrinks with the generations, keeping the
+        ratio the user picked, but never below the ``generated`` answers
+        that already exist; afterwards only the pool shrinks.
+        """
+        if "generate" in done:
+            if not self.score_filter:
+                return [(n_gen, n_gen)]
+            return [(n_gen, pool) for pool in range(min(pool_size, n_gen), min(n_gen, self.num_top_picks) - 1, -1)]
+        ratio = min(1.0, pool_size / n_gen) if n_gen else 1.0
+        sizes = []
+        for n in range(n_gen, max(1, generated, min(n_gen, self.num_top_picks)) - 1, -1):
+            pool = min(n, max(self.num_top_picks, round(n * ratio))) if self.score_filter else n
+            sizes.append((n, pool))
+        return sizes
+
+    def plan(
+        self,
+        n_gen: int,
+        pool_size: int,
+        max_matches: int = 0,
+        *,
+        done=(),
+        spent_tokens: float = 0,
+        spent_cost: float = 0,
+        generated: int = 0,
+    ) -> Plan | None:
+        """Largest tournament within the limits, or ``None`` if not even the smallest fits.
+
+        The largest sizes whose full match schedule fits win. If none does,
+        the matches of the largest sizes that fit with one match per pool
+        player are capped instead. Stages in ``done`` (``"generate"``,
+        ``"score"``) have already run: once the ``n_gen`` players exist only
+        the pool and the matches are planned, against what is left after
+        ``spent_tokens`` and ``spent_cost``. ``generated`` answers sampled
+        before planning are already paid for and kept.
+        """
+        candidates = self._candidates(n_gen, pool_size, done, generated)
+
+        def estimate(n, pool, matches):
+            return self.estimate(n, pool, matches, done, generated)
+
+        def fits(n, pool, matches):
+            return self._fits(*estimate(n, pool, matches), spent_tokens, spent_cost)
+
+        for n, pool in candidates:
+            full = self._match_limit(pool, max_matches)
+            if fits(n, pool, full):
+                return Plan(n, pool, max_matches, full, *estimate(n, pool, full))
+        for n, pool in candidates:
+            lo, hi = self._fewest(pool, max_matches), self._match_limit(pool, max_matches)
+            if not fits(n, pool, lo):
+                continue
+            # Binary search for the most matches that still fit.
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if fits(n, pool, mid):
+                    lo = mid
+                else:
+                    hi = mid - 1
+            return Plan(n, pool, lo, lo, *estimate(n, pool, lo))
+        return None
+
+    def _match_limit(self, pool: int, max_matches: int = 0) -> int:
+        """Judge calls the schedule of ``pool`` players makes under the ``max_matches`` cap."""
+        full = self.scheduled_matches(pool) if self.pairwise_filter else 0
+        return min(full, max_matches) if max_matches > 0 else full
+
+    def _fewest(self, pool: int, max_matches: int = 0) -> int:
+        """The fewest matches :meth:`plan` caps a pool at: one per pool player."""
+        return min(self._match_limit(pool, max_matches), pool - 1)
+
+    def smallest(self, n_gen: int, pool_size: int, max_matches: int = 0, *, generated: int = 0) -> Plan:
+        """The smallest tournament :meth:`plan` would accept, whether it fits or not.
+
+        It tells how far a budget that :meth:`plan` turns down is from the
+        least it could run with.
+        """
+        n, pool = self._candidates(n_gen, pool_size, (), generated)[-1]
+        matches = self._fewest(pool, max_matches)
+        return Plan(n, pool, matches, matches, *self.estimate(n, pool, matches, (), generated))
+
+
+class Budget:
+    """Token and dollar limits enforced on every model call of a tournament.
+
+    :meth:`admit` books a call's estimated tokens before it is sent and
+    raises :class:`BudgetExceeded` if the spend so far, the calls still in
+    flight and this one would go over a limit. :meth:`settle` replaces the
+    estimate with the real usage once the call is done. A limit of ``0`` is
+    no limit.
+    """
+
+    def __init__(self, max_tokens: float = 0, max_cost: float = 0):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.spent_tokens = 0
+        self.spent_cost = 0.0
+        self.refused = 0
+        self._reserved_tokens = 0.0
+        self._reserved_cost = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether a call has been refused; the engine stops scheduling new ones."""
+        return self.refused > 0
+
+    def admit(self, model: str, tokens: tuple[float, float]) -> tuple[float, float]:
+        prompt, completion = tokens
+        estimate = prompt + completion
+        cost = estimate_cost(model, round(prompt), round(completion))
+        with self._lock:
+            over_tokens = self.max_tokens and self.spent_tokens + self._reserved_tokens + estimate > self.max_tokens
+            over_cost = self.max_cost and self.spent_cost + self._reserved_cost + cost > self.max_cost
+            if over_tokens or over_cost:
+                self.refused += 1
+                raise BudgetExceeded(f"{model} call of about {estimate:.0f} tokens would exceed the budget")
+            self._reserved_tokens += estimate
+            self._reserved_cost += cost
+        return estimate, cost
+
+    def settle(self, ticket: tuple[float, float], model: str | None = None, usage=None) -> None:
+        """Release the reservation ``ticket`` and charge ``usage`` (nothing for a failed call)."""
+        pt, ct = usage_tokens(usage)
+        cost = estimate_cost(model, pt, ct) if model else 0.0
+        with self._lock:
+            self._reserved_tokens -= ticket[0]
+            self._reserved_cost -= ticket[1]
+            self.spent_tokens += pt + ct
+            self.spent_cost += cost
+
+    def summary(self) -> str:
+        limits = []
+        if self.max_tokens:
+            limits.append(f"{self.spent_tokens} of {self.max_tokens:.0f} tokens")
+        if self.max_cost:
+            limits.append(f"${self.spent_cost:.4f} of ${self.max_cost:.4f}")
+        text = f"Budget: {' and '.join(limits)} used"
+        if self.refused:
+            text += f", {self.refused} calls refused"
+        return text
+
+    def as_dict(self) -> dict:
+        return {
+            "max_tokens": self.max_tokens,
+            "max_cost": self.max_cost,
+            "spent_tokens": self.spent_tokens,
+            "spent_cost": self.spent_cost,
+            "refused": self.refused,
+        }
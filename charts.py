@@ -0,0 +1,96 @@
+"""Score histogram and Elo chart of a tournament, rendered off the request thread.
+
+Charts are drawn with matplotlib's object-oriented API: every chart is its
+own ``Figure`` that pyplot never sees, so concurrent runs share no drawing
+state and nothing keeps a figure alive once the caller lets go of it. All
+rendering goes through one background thread shared by every run (see
+:func:`submit`), which keeps the tournament loop free and matplotlib
+single-threaded.
+
+``CHART_FORMAT`` chooses what a chart is:
+
+- ``figure``: a matplotlib ``Figure``, for ``gr.Plot``;
+- ``svg``: SVG markup, the figure is cleared as soon as it is written;
+- ``json``: the chart data only (bin edges and counts, or ratings), without
+  importing matplotlib at all.
+"""
+import io, os, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+CHART_FORMATS = ("figure", "svg", "json")
+CHART_FORMAT_DEFAULT = os.getenv("CHART_FORMAT", "figure")
+HISTOGRAM_BINS = 10
+
+
+def histogram_data(scores: list[float], bins: int = HISTOGRAM_BINS) -> dict:
+    """Counts of ``scores`` in ``bins`` equal bins from the lowest to the highest score."""
+    if not scores:
+        return {"kind": "histogram", "edges": [], "counts": []}
+    low, high = min(scores), max(scores)
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    width = (high - low) / bins
+    counts = [0] * bins
+    for score in scores:
+        counts[min(bins - 1, int((score - low) / width))] += 1
+    edges = [round(low + i * width, 4) for i in range(bins + 1)]
+    return {"kind": "histogram", "edges": edges, "counts": counts}
+
+
+def elo_data(rating: dict, rating_err: dict | None = None) -> dict:
+    """Ratings best first, with their standard errors when known."""
+    ranked = sorted(rating, key=rating.get, reverse=True)
+    data = {"kind": "elo", "ratings": [round(rating[p], 1) for p in ranked]}
+    if rating_err and all(p in rating_err for p in ranked):
+        data["stderr"] = [round(rating_err[p], 1) for p in ranked]
+    return data
+
+
+def _figure(data: dict):
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.subplots()
+    if data["kind"] == "histogram":
+        edges = data["edges"]
+        widths = [b - a for a, b in zip(edges, edges[1:])]
+        ax.bar(edges[:-1], data["counts"], width=widths, align="edge")
+    else:
+        ratings = data["ratings"]
+        ranks = range(len(ratings))
+        errors = [1.96 * e for e in data["stderr"]] if "stderr" in data else None
+        ax.bar(ranks, ratings, yerr=errors)
+        ax.set_xticks(ranks)
+        ax.set_xticklabels([str(i + 1) for i in ranks])
+    return fig
+
+
+def render(data: dict, fmt: str | None = None):
+    """Turn chart data into a chart of the format ``fmt`` (default ``CHART_FORMAT``)."""
+    fmt = fmt or CHART_FORMAT_DEFAULT
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unknown chart format: {fmt!r}")
+    if fmt == "json":
+        return data
+    fig = _figure(data)
+    if fmt == "figure":
+        return fig
+    buf = io.StringIO()
+    fig.savefig(buf, format="svg", metadata={"Date": None})
+    fig.clear()
+    svg = buf.getvalue()
+    return svg[svg.find("<svg"):]
+
+
+_renderer: ThreadPoolExecutor | None = None
+_renderer_lock = threading.Lock()
+
+
+def submit(data: dict, fmt: str | None = None) -> Future:
+    """Render ``data`` on the shared chart thread; the future holds the chart."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="charts")
+    return _renderer.submit(render, data, fmt)
@@ -0,0 +1,291 @@
+"""Run tournaments for a batch of instructions without the Gradio UI.
+
+Usage::
+
+    python cli.py instructions.jsonl -o results.jsonl --concurrency 4
+
+Every input line is a JSON object with an ``instruction`` and optionally an
+``id``, ``criteria`` and any :func:`engine.tournament` keyword (``n_gen``,
+``pool_size``, ``pairing_mode``, …) to override the command line for that
+instruction. Results are appended to the output as soon as each tournament
+finishes, so an interrupted run picks up where it stopped when started again
+with the same output. Writing ``.parquet`` needs pandas with a Parquet engine;
+the JSONL checkpoint is kept next to it as ``<output>.jsonl``. With
+``--journal-dir`` every tournament also journals its calls to
+``<dir>/<id>.jsonl``, so a tournament cut short resumes its own calls too.
+"""
+from dotenv import load_dotenv
+load_dotenv("./local.env",override=True)
+import argparse, inspect, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import engine
+from dispatch import Dispatcher
+from metrics import Metrics
+from pairing import PAIRING_MODES
+from tournament_utils import PROMPT_LAYOUTS
+from journal import JOURNAL_MODES
+
+
+TOURNAMENT_PARAMS = set(inspect.signature(engine.tournament).parameters) - {"state", "dispatcher"}
+
+
+def load_instructions(path: str) -> list[dict]:
+    """Read the input JSONL; records without an ``id`` are numbered by line."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("instruction"):
+                raise ValueError(f"{path}:{line_no}: missing 'instruction'")
+            record.setdefault("id", line_no)
+            records.append(record)
+    return records
+
+
+def completed_ids(path: str) -> set:
+    """Ids already finished in a checkpoint file; failed runs are retried."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a truncated last line.
+                continue
+            if "error" not in row:
+                done.add(row["id"])
+    return done
+
+
+def tournament_kwargs(record: dict, options: dict) -> dict:
+    kwargs = dict(options)
+    journal_dir = kwargs.pop("journal_dir", "")
+    if journal_dir:
+        kwargs["journal_path"] = os.path.join(journal_dir, f"{record['id']}.jsonl")
+    kwargs["instruction_input"] = record["instruction"]
+    if "criteria" in record:
+        kwargs["criteria_input"] = record["criteria"]
+    kwargs.update({k: v for k, v in record.items() if k in TOURNAMENT_PARAMS})
+    return kwargs
+
+
+def run_one(record: dict, options: dict, on_log=None, metrics: Metrics | None = None) -> dict:
+    start = time.time()
+    try:
+        state = engine.run(**tournament_kwargs(record, options), on_log=on_log)
+    except Exception as e:
+        return {"id": record["id"], "instruction": record["instruction"], "error": f"{type(e).__name__}: {e}"}
+    if metrics is not None:
+        metrics.merge(state.metrics)
+    row = {"id": record["id"], **state.to_dict()}
+    row["elapsed"] = round(time.time() - start, 3)
+    return row
+
+
+def write_parquet(jsonl_path: str, parquet_path: str) -> None:
+    """Convert the checkpoint to Parquet, keeping the last row for each id."""
+    try:
+        import pandas as pd
+    except ImportError as e:
+        raise SystemExit("Writing Parquet needs pandas and pyarrow (or fastparquet)") from e
+    with open(jsonl_path, encoding="utf-8") as f:
+        rows = {}
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            rows[row["id"]] = row
+    df = pd.DataFrame(list(rows.values()))
+    for col in ("top_picks", "usage"):
+        if col in df:
+            df[col] = df[col].map(lambda v: json.dumps(v, ensure_ascii=False) if isinstance(v, (list, dict)) else v)
+    df.to_parquet(parquet_path, index=False)
+
+
+def run_batch(
+    records: list[dict],
+    options: dict,
+    output: str,
+    concurrency: int = 1,
+    verbose: bool = False,
+    metrics: Metrics | None = None,
+) -> int:
+    """Run every record not yet in ``output`` and append its result there.
+
+    Calls made by the tournaments are added to ``metrics`` when given.
+    Returns the number of tournaments that failed.
+    """
+    done = completed_ids(output)
+    todo = [r for r in records if r["id"] not in done]
+    if done:
+        print(f"Resuming: {len(records) - len(todo)} of {len(records)} already done", file=sys.stderr)
+    failures = 0
+
+    def log_for(record):
+        if not verbose:
+            return None
+        return lambda msg: print(f"[{record['id']}] {msg}", file=sys.stderr)
+
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
+        futures = {ex.submit(run_one, r, options, log_for(r), metrics): r for r in todo}
+        for i, fut in enumerate(as_completed(futures), 1):
+            row = fut.result()
+            # Results are written from this thread only, one flushed line each.
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            out.flush()
+            os.fsync(out.fileno())
+            status = f"failed: {row['error']}" if "error" in row else "done"
+            failures += "error" in row
+            print(f"{i}/{len(todo)} {row['id']} {status}", file=sys.stderr)
+    return failures
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Run LLM tournaments for a JSONL file of instructions.")
+    p.add_argument("input", help="JSONL file, one {'instruction': ...} object per line")
+    p.add_argument("-o", "--output", required=True, help="results file (.jsonl or .parquet)")
+    p.add_argument("--concurrency", type=int, default=1, help="tournaments run at the same time")
+    p.add_argument("-v", "--verbose", action="store_true", help="print tournament progress to stderr")
+    p.add_argument("--prometheus", help="write the call metrics of the batch to this file (Prometheus text format)")
+    p.add_argument("--api-base", default=engine.API_BASE_DEFAULT)
+    p.add_argument("--api-token", default=engine.API_TOKEN_DEFAULT)
+    p.add_argument("--generate-model", default=engine.GENERATE_MODEL_DEFAULT)
+    p.add_argument("--score-model", default=engine.SCORE_MODEL_DEFAULT, help="comma separated for an ensemble")
+    p.add_argument("--pairwise-model", default=engine.PAIRWISE_MODEL_DEFAULT, help="comma separated for an ensemble")
+    p.add_argument("--generate-temperature", type=float, default=engine.GENERATE_TEMPERATURE_DEFAULT)
+    p.add_argument("--score-temperature", type=float, default=engine.SCORE_TEMPERATURE_DEFAULT)
+    p.add_argument("--pairwise-temperature", type=float, default=engine.PAIRWISE_TEMPERATURE_DEFAULT)
+    p.add_argument("--criteria", default=engine.CRITERIA_DEFAULT)
+    p.add_argument("--n-gen", type=int, default=engine.NUM_GENERATIONS_DEFAULT)
+    p.add_argument("--pool-size", type=int, default=engine.POOL_SIZE_DEFAULT)
+    p.add_argument("--top-picks", type=int, default=engine.NUM_TOP_PICKS_DEFAULT)
+    p.add_argument("--max-workers", type=int, default=engine.MAX_WORKERS_DEFAULT, help="LLM calls per tournament")
+    p.add_argument("--score-filter", action=argparse.BooleanOptionalAction, default=engine.SCORE_FILTER_DEFAULT)
+    p.add_argument("--pairwise-filter", action=argparse.BooleanOptionalAction, default=engine.PAIRWISE_FILTER_DEFAULT)
+    p.add_argument("--pairing-mode", choices=PAIRING_MODES, default=engine.PAIRING_MODE_DEFAULT)
+    p.add_argument("--max-matches", type=int, default=engine.MAX_MATCHES_DEFAULT)
+    p.add_argument("--async", dest="use_async", action=argparse.BooleanOptionalAction, default=engine.ASYNC_PIPELINE_DEFAULT)
+    p.add_argument("--model-concurrency", default=engine.MODEL_CONCURRENCY_DEFAULT)
+    p.add_argument("--judge-cache", default=engine.JUDGE_CACHE_PATH_DEFAULT)
+    p.add_argument("--score-batch-size", type=int, default=engine.SCORE_BATCH_SIZE_DEFAULT)
+    p.add_argument("--rank-group-size", type=int, default=engine.RANK_GROUP_SIZE_DEFAULT)
+    p.add_argument("--rank-rounds", type=int, default=engine.RANK_ROUNDS_DEFAULT)
+    p.add_argument("--group-stage-size", type=int, default=engine.GROUP_STAGE_SIZE_DEFAULT)
+    p.add_argument("--group-advance", type=int, default=engine.GROUP_ADVANCE_DEFAULT, help="players promoted per group")
+    p.add_argument("--early-stop-confidence", type=float, default=engine.EARLY_STOP_CONFIDENCE_DEFAULT)
+    p.add_argument("--rpm", type=float, default=engine.REQUESTS_PER_MINUTE_DEFAULT, help="requests per minute per model")
+    p.add_argument("--tpm", type=float, default=engine.TOKENS_PER_MINUTE_DEFAULT, help="tokens per minute per model")
+    p.add_argument("--max-retries", type=int, default=engine.MAX_RETRIES_DEFAULT)
+    p.add_argument("--hedge-after", type=float, default=engine.HEDGE_AFTER_DEFAULT, help="seconds before a hedged request")
+    p.add_argument(
+        "--stream-generation", action=argparse.BooleanOptionalAction, default=engine.STREAM_GENERATION_DEFAULT
+    )
+    p.add_argument("--prompt-layout", choices=PROMPT_LAYOUTS, default=engine.PROMPT_LAYOUT_DEFAULT)
+    p.add_argument("--pairwise-order", choices=engine.PAIRWISE_ORDERS, default=engine.PAIRWISE_ORDER_DEFAULT)
+    p.add_argument(
+        "--dedup-threshold", type=float, default=engine.DEDUP_THRESHOLD_DEFAULT, help="0 = exact duplicates only"
+    )
+    p.add_argument("--token-budget", type=float, default=engine.TOKEN_BUDGET_DEFAULT, help="tokens per tournament")
+    p.add_argument("--cost-budget", type=float, default=engine.COST_BUDGET_DEFAULT, help="USD per tournament")
+    p.add_argument("--latency-target", type=float, default=engine.LATENCY_TARGET_DEFAULT, help="seconds per tournament")
+    p.add_argument("--cascade-model", default=engine.CASCADE_MODEL_DEFAULT, help="judge for close calls (blank = off)")
+    p.add_argument("--cascade-margin", type=float, default=engine.CASCADE_MARGIN_DEFAULT, help="score points around the cut")
+    p.add_argument("--shard-jobs", default=engine.SHARD_JOBS_PATH_DEFAULT, help="SQLite job table for shard workers")
+    p.add_argument(
+        "--shard-workers", type=int, default=engine.SHARD_WORKERS_DEFAULT, help="local worker processes per tournament"
+    )
+    p.add_argument(
+        "--structured-verdicts",
+        action=argparse.BooleanOptionalAction,
+        default=engine.STRUCTURED_VERDICTS_DEFAULT,
+        help="ask judges for JSON verdicts",
+    )
+    p.add_argument("--journal-dir", default="", help="journal each tournament's calls to <dir>/<id>.jsonl")
+    p.add_argument("--journal-mode", choices=JOURNAL_MODES, default=engine.JOURNAL_MODE_DEFAULT)
+    return p.parse_args(argv)
+
+
+def options_from_args(args) -> dict:
+    return {
+        "api_base": args.api_base,
+        "api_token": args.api_token,
+        "generate_model": args.generate_model,
+        "score_model": args.score_model,
+        "pairwise_model": args.pairwise_model,
+        "generate_temperature": args.generate_temperature,
+        "score_temperature": args.score_temperature,
+        "pairwise_temperature": args.pairwise_temperature,
+        "criteria_input": args.criteria,
+        "n_gen": args.n_gen,
+        "pool_size": args.pool_size,
+        "num_top_picks": args.top_picks,
+        "max_workers": args.max_workers,
+        "enable_score_filter": args.score_filter,
+        "enable_pairwise_filter": args.pairwise_filter,
+        "score_with_instruction": engine.SCORE_WITH_INSTRUCTION_DEFAULT,
+        "pairwise_with_instruction": engine.PAIRWISE_WITH_INSTRUCTION_DEFAULT,
+        "generate_thinking": engine.GENERATE_THINKING_DEFAULT,
+        "score_thinking": engine.SCORE_THINKING_DEFAULT,
+        "pairwise_thinking": engine.PAIRWISE_THINKING_DEFAULT,
+        "pairing_mode": args.pairing_mode,
+        "max_matches": args.max_matches,
+        "use_async": args.use_async,
+        "model_concurrency": args.model_concurrency,
+        "judge_cache_path": args.judge_cache,
+        "score_batch_size": args.score_batch_size,
+        "rank_group_size": args.rank_group_size,
+        "rank_rounds": args.rank_rounds,
+        "early_stop_confidence": args.early_stop_confidence,
+        "stream_generation": args.stream_generation,
+        "prompt_layout": args.prompt_layout,
+        "pairwise_order": args.pairwise_order,
+        "dedup_threshold": args.dedup_threshold,
+        "token_budget": args.token_budget,
+        "cost_budget": args.cost_budget,
+        "latency_target": args.latency_target,
+        "cascade_model": args.cascade_model,
+        "cascade_margin": args.cascade_margin,
+        "shard_jobs": args.shard_jobs,
+        "shard_workers": args.shard_workers,
+        "group_stage_size": args.group_stage_size,
+        "group_advance": args.group_advance,
+        "structured_verdicts": args.structured_verdicts,
+        "journal_dir": args.journal_dir,
+        "journal_mode": args.journal_mode,
+        # One dispatcher for the whole batch keeps every tournament within the same limits.
+        "dispatcher": Dispatcher(
+            args.rpm,
+            args.tpm,
+            max_retries=args.max_retries,
+            hedge_after=args.hedge_after,
+            # At most one hedge per call in flight across the concurrent tournaments.
+            hedge_workers=max(1, args.max_workers * args.concurrency),
+        ),
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    parquet = args.output.endswith(".parquet")
+    checkpoint = args.output + ".jsonl" if parquet else args.output
+    metrics = Metrics()
+    failures = run_batch(
+        load_instructions(args.input), options_from_args(args), checkpoint, args.concurrency, args.verbose, metrics
+    )
+    if metrics.totals().calls:
+        print(metrics.summary_table(), file=sys.stderr)
+    if args.prometheus:
+        with open(args.prometheus, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus())
+    if parquet:
+        write_parquet(checkpoint, args.output)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import hashlib
+import zlib
+
+import numpy as np
+
+
+# Mersenne prime for the universal hash family used by MinHash.
+_PRIME = (1 << 61) - 1
+
+
+def normalize(text: str) -> str:
+    """Text used for exact matching: whitespace runs collapsed."""
+    return " ".join(text.split())
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Lower-cased word ``size``-grams of ``text`` (the whole text if it is shorter)."""
+    words = text.lower().split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def _rows_per_band(num_perm: int, threshold: float) -> int:
+    """Rows per LSH band whose similarity cut-off ``(1 / bands) ** (1 / rows)`` is closest to ``threshold``."""
+    rows = [r for r in range(1, num_perm + 1) if num_perm % r == 0]
+    return min(rows, key=lambda r: abs((r / num_perm) ** (1 / r) - threshold))
+
+
+class DuplicateIndex:
+    """Find the exact and near duplicates of texts among those already indexed.
+
+    Exact duplicates (ignoring whitespace) are found by hash. With a
+    ``threshold`` between 0 and 1, texts whose word-shingle Jaccard
+    similarity, estimated from ``num_perm`` MinHash values, reaches the
+    threshold are merged too. Candidates are looked up through LSH bands,
+    so each :meth:`add` only compares against the few texts sharing a band
+    instead of every text seen so far.
+
+    The index only holds hashes, signatures and LSH buckets, keyed by the
+    id the caller gives each distinct text; the texts and how many
+    generations each one stands for are kept by
+    :class:`players.PlayerRegistry`. :attr:`exact` and :attr:`near` count
+    the duplicates found.
+    """
+
+    def __init__(self, threshold: float = 0.0, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.exact = 0
+        self.near = 0
+        self.distinct = 0
+        self._by_hash: dict[bytes, int] = {}
+        self._near = 0 < threshold < 1
+        if self._near:
+            rng = np.random.default_rng(seed)
+            # a, b < 2**32 and 32-bit shingle hashes keep a * x + b inside uint64.
+            self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+            self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+            self._rows = _rows_per_band(num_perm, threshold)
+            self._buckets: dict[tuple, list[int]] = {}
+            self._signatures: dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.distinct
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the shingles of ``text``."""
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)), dtype=np.uint64
+        )
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def add(self, text: str, pid: int) -> int:
+        """Index ``text`` under the new id ``pid``, unless it duplicates an indexed text.
+
+        Returns the id ``text`` belongs to: that of the text it duplicates, or
+        ``pid`` when it is new.
+        """
+        digest = hashlib.sha1(normalize(text).encode("utf-8")).digest()
+        other = self._by_hash.get(digest)
+        if other is not None:
+            self.exact += 1
+            return other
+        if self._near:
+            sig = self.signature(text)
+            keys = [(i, sig[i : i + self._rows].tobytes()) for i in range(0, len(sig), self._rows)]
+            for key in keys:
+                for other in self._buckets.get(key, ()):
+                    if np.mean(self._signatures[other] == sig) >= self.threshold:
+                        # Later exact copies of this text go to the same id.
+                        self._by_hash[digest] = other
+                        self.near += 1
+                        return other
+            for key in keys:
+                self._buckets.setdefault(key, []).append(pid)
+            self._signatures[pid] = sig
+        self._by_hash[digest] = pid
+        self.distinct += 1
+        return pid
@@ -0,0 +1,260 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors.
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+# litellm exception names for the same failures, so litellm need not be imported here.
+RETRYABLE_NAMES = {
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "RateLimitError",
+    "ServiceUnavailableError",
+    "Timeout",
+}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    return type(exc).__name__ in RETRYABLE_NAMES or isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def retry_after(exc: BaseException) -> float | None:
+    """Seconds the provider asked us to wait, from a ``Retry-After`` header."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket refilled at ``per_minute / 60`` per second.
+
+    The default ``burst`` of one spaces requests evenly; providers that
+    enforce their limit over a sliding window reject the bursts a larger
+    bucket would let through.
+
+    :meth:`reserve` takes its share immediately, even into debt, and returns
+    how long the caller has to wait for the bucket to cover it. Reserving
+    instead of polling keeps callers in arrival order and never wakes them
+    up for nothing. :meth:`charge` books usage that is only known afterwards,
+    such as the tokens of a finished completion.
+    """
+
+    def __init__(self, per_minute: float, burst: float | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else 1.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            self._refill()
+            self.level -= amount
+            return max(0.0, -self.level / self.rate)
+
+    def charge(self, amount: float) -> None:
+        with self._lock:
+            self._refill()
+            self.level -= amount
+
+
+class Dispatcher:
+    """Rate-limited, retrying front for model calls.
+
+    Each model gets its own buckets of ``rpm`` requests and ``tpm`` tokens
+    per minute (``0`` disables a limit). Tokens are charged from the usage
+    of finished calls, so a burst of large prompts slows the following
+    requests down. Retryable failures (rate limits, timeouts, server errors)
+    are retried up to ``max_retries`` times with exponential backoff and
+    full jitter, honouring ``Retry-After``. With ``hedge_after`` set, a call
+    still running after that many seconds gets a second identical request,
+    and whichever of the two answers first is used. Threaded calls run both
+    requests on a side pool sized for ``hedge_workers`` hedged calls in
+    flight at once (two threads each). The tokens of the request whose
+    answer is not used are charged all the same, and reported to the
+    ``on_lost`` callback of :meth:`call`.
+
+    One dispatcher is meant to be shared by every tournament in a process
+    so they all stay within the same provider limits.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 0,
+        tpm: float = 0,
+        *,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        hedge_after: float = 0,
+        hedge_workers: int | None = None,
+        sleep=time.sleep,
+        asleep=asyncio.sleep,
+    ):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.hedge_workers = hedge_workers
+        self._sleep = sleep
+        self._asleep = asleep
+        self._buckets: dict[str, tuple[TokenBucket | None, TokenBucket | None]] = {}
+        self._lock = threading.Lock()
+        self._hedge_pool: ThreadPoolExecutor | None = None
+
+    def _model_buckets(self, model: str):
+        with self._lock:
+            if model not in self._buckets:
+                self._buckets[model] = (
+                    TokenBucket(self.rpm) if self.rpm > 0 else None,
+                    TokenBucket(self.tpm, burst=max(1.0, self.tpm / 60.0)) if self.tpm > 0 else None,
+                )
+            return self._buckets[model]
+
+    def _admit_delay(self, model: str) -> float:
+        requests, tokens = self._model_buckets(model)
+        delay = requests.reserve() if requests is not None else 0.0
+        if tokens is not None:
+            delay = max(delay, tokens.reserve(0))
+        return delay
+
+    def _charge(self, model: str, result) -> None:
+        _, tokens = self._model_buckets(model)
+        usage = result[1] if isinstance(result, tuple) and len(result) == 2 else None
+        if tokens is None or not usage:
+            return
+        from metrics import usage_tokens
+
+        tokens.charge(sum(usage_tokens(usage)))
+
+    def backoff(self, attempt: int, exc: BaseException | None = None) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        hinted = retry_after(exc) if exc is not None else None
+        return max(delay, hinted) if hinted is not None else delay
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_pool is None:
+                workers = 2 * self.hedge_workers if self.hedge_workers else None
+                self._hedge_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+            return self._hedge_pool
+
+    def _wait_admission(self, model: str) -> None:
+        delay = self._admit_delay(model)
+        if delay > 0:
+            self._sleep(delay)
+
+    async def _await_admission(self, model: str) -> None:
+        delay = self._admit_delay(model)
+        if delay > 0:
+            await self._asleep(delay)
+
+    @staticmethod
+    def _timed(fn, args, kwargs):
+        start = time.monotonic()
+        return fn(*args, **kwargs), time.monotonic() - start
+
+    def _lost(self, model: str, request, on_lost) -> None:
+        """Book a request whose answer was not used: its tokens were spent all the same."""
+        if request.cancelled() or request.exception() is not None:
+            return
+        result, seconds = request.result()
+        self._charge(model, result)
+        if on_lost is not None:
+            on_lost(result, seconds)
+
+    def _attempt(self, model: str, fn, args, kwargs, on_lost=None):
+        self._wait_admission(model)
+        if self.hedge_after <= 0:
+            return fn(*args, **kwargs)
+        pool = self._hedge_executor()
+        requests = [pool.submit(self._timed, fn, args, kwargs)]
+        done, _ = wait(requests, timeout=self.hedge_after)
+        if not done:
+            self._wait_admission(model)
+            requests.append(pool.submit(self._timed, fn, args, kwargs))
+        error = None
+        pending = set(requests)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for request in done:
+                if request.exception() is None:
+                    # A request still queued is dropped; one already sent is paid for.
+                    for other in requests:
+                        if other is not request and not other.cancel():
+                            other.add_done_callback(lambda f: self._lost(model, f, on_lost))
+                    return request.result()[0]
+                error = request.exception()
+        raise error
+
+    def call(self, model: str, fn, /, *args, on_lost=None, **kwargs):
+        """Call ``fn(*args, **kwargs)`` within the limits of ``model``.
+
+        Returns ``(result, retries)``. The last error is raised once the
+        retries are used up; non-retryable errors are raised at once.
+        ``on_lost(result, seconds)`` is called for every request of a hedged
+        call that finished but whose answer was not used.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._attempt(model, fn, args, kwargs, on_lost)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                self._sleep(self.backoff(attempt, e))
+                continue
+            self._charge(model, result)
+            return result, attempt
+
+    async def _aattempt(self, model: str, fn, args, kwargs):
+        await self._await_admission(model)
+        if self.hedge_after <= 0:
+            return await fn(*args, **kwargs)
+        tasks = [asyncio.ensure_future(fn(*args, **kwargs))]
+        done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+        if not done:
+            await self._await_admission(model)
+            tasks.append(asyncio.ensure_future(fn(*args, **kwargs)))
+        error = None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, model: str, fn, /, *args, **kwargs):
+        """Async :meth:`call` for coroutine functions."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await self._aattempt(model, fn, args, kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                await self._asleep(self.backoff(attempt, e))
+                continue
+            self._charge(model, result)
+            return result, attempt
@@ -0,0 +1,1566 @@
+"""UI-free tournament engine shared by the Gradio app and the batch CLI."""
+import os, math, queue, random, threading
+from collections import Counter
+from contextlib import ExitStack
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tournament_utils import (
+    generate_players,
+    prompt_score,
+    prompt_score_batch,
+    prompt_pairwise,
+    prompt_rank,
+    agenerate_players,
+    aprompt_score,
+    aprompt_score_batch,
+    aprompt_pairwise,
+    parse_pairwise,
+    parse_ranking,
+    parse_verdict,
+    split_batch_scores,
+    verdict_scores,
+)
+from pairing import TIE, make_scheduler
+from metrics import Metrics
+from budget import SAMPLE_ANSWERS, Budget, BudgetExceeded, CallCosts, Planner, estimate_tokens
+import time
+
+
+class SimpleProgress:
+    """Minimal progress helper to compute ETA."""
+
+    def __init__(self, total: int, prefix: str = "Progress"):
+        self.total = total
+        self.prefix = prefix
+        self.start = time.time()
+        self.count = 0
+
+    def step(self) -> str:
+        self.count += 1
+        elapsed = time.time() - self.start
+        remaining = (elapsed / self.count) * (self.total - self.count) if self.count else 0
+        h, rem = divmod(int(remaining), 3600)
+        m, s = divmod(rem, 60)
+        if h:
+            eta = f"{h:d}:{m:02d}:{s:02d}"
+        else:
+            eta = f"{m:02d}:{s:02d}"
+        return f"{self.prefix} {self.count}/{self.total} - ETA {eta}"
+
+
+NUM_TOP_PICKS_DEFAULT = int(os.getenv("NUM_TOP_PICKS", 3))
+POOL_SIZE_DEFAULT = int(os.getenv("POOL_SIZE", 6))
+MAX_WORKERS_DEFAULT = int(os.getenv("MAX_WORKERS", 100))
+NUM_GENERATIONS_DEFAULT = int(os.getenv("NUM_GENERATIONS", 10))
+API_BASE_DEFAULT = os.getenv("OPENAI_API_BASE", "")
+API_TOKEN_DEFAULT = os.getenv("OPENAI_API_KEY", "")
+SCORE_FILTER_DEFAULT = os.getenv("ENABLE_SCORE_FILTER", "true").lower() == "true"
+PAIRWISE_FILTER_DEFAULT = os.getenv("ENABLE_PAIRWISE_FILTER", "true").lower() == "true"
+GENERATE_MODEL_DEFAULT = os.getenv("GENERATE_MODEL", "gpt-4o-mini")
+SCORE_MODEL_DEFAULT = os.getenv("SCORE_MODEL", "gpt-4o-mini")
+PAIRWISE_MODEL_DEFAULT = os.getenv("PAIRWISE_MODEL", "gpt-4o-mini")
+GENERATE_TEMPERATURE_DEFAULT = float(os.getenv("GENERATE_TEMPERATURE", "0.9"))
+SCORE_TEMPERATURE_DEFAULT = float(os.getenv("SCORE_TEMPERATURE", "0.6"))
+PAIRWISE_TEMPERATURE_DEFAULT = float(os.getenv("PAIRWISE_TEMPERATURE", "0.6"))
+SCORE_WITH_INSTRUCTION_DEFAULT = os.getenv("PASS_INSTRUCTION_TO_SCORE", "true").lower() == "true"
+PAIRWISE_WITH_INSTRUCTION_DEFAULT = os.getenv("PASS_INSTRUCTION_TO_PAIRWISE", "true").lower() == "true"
+GENERATE_THINKING_DEFAULT = os.getenv("ENABLE_GENERATE_THINKING", "false").lower() == "true"
+SCORE_THINKING_DEFAULT = os.getenv("ENABLE_SCORE_THINKING", "false").lower() == "true"
+PAIRWISE_THINKING_DEFAULT = os.getenv("ENABLE_PAIRWISE_THINKING", "false").lower() == "true"
+PAIRING_MODE_DEFAULT = os.getenv("PAIRING_MODE", "round_robin")
+MAX_MATCHES_DEFAULT = int(os.getenv("MAX_MATCHES", 0))
+ASYNC_PIPELINE_DEFAULT = os.getenv("ENABLE_ASYNC_PIPELINE", "false").lower() == "true"
+MODEL_CONCURRENCY_DEFAULT = os.getenv("MODEL_CONCURRENCY", "")
+RANK_GROUP_SIZE_DEFAULT = int(os.getenv("RANK_GROUP_SIZE", 4))
+RANK_ROUNDS_DEFAULT = int(os.getenv("RANK_ROUNDS", 3))
+EARLY_STOP_CONFIDENCE_DEFAULT = float(os.getenv("EARLY_STOP_CONFIDENCE", 0))
+SCORE_BATCH_SIZE_DEFAULT = int(os.getenv("SCORE_BATCH_SIZE", 1))
+STREAM_GENERATION_DEFAULT = os.getenv("STREAM_GENERATION", "false").lower() == "true"
+PROMPT_LAYOUT_DEFAULT = os.getenv("PROMPT_LAYOUT", "legacy")
+PAIRWISE_ORDER_DEFAULT = os.getenv("PAIRWISE_ORDER", "fixed")
+DEDUP_THRESHOLD_DEFAULT = float(os.getenv("DEDUP_THRESHOLD", 0))
+TOKEN_BUDGET_DEFAULT = float(os.getenv("TOKEN_BUDGET", 0))
+COST_BUDGET_DEFAULT = float(os.getenv("COST_BUDGET", 0))
+LATENCY_TARGET_DEFAULT = float(os.getenv("LATENCY_TARGET", 0))
+CASCADE_MODEL_DEFAULT = os.getenv("CASCADE_MODEL", "")
+CASCADE_MARGIN_DEFAULT = float(os.getenv("CASCADE_MARGIN", 0.5))
+SHARD_JOBS_PATH_DEFAULT = os.getenv("SHARD_JOBS_PATH", "")
+SHARD_WORKERS_DEFAULT = int(os.getenv("SHARD_WORKERS", 0))
+GROUP_STAGE_SIZE_DEFAULT = int(os.getenv("GROUP_STAGE_SIZE", 8))
+GROUP_ADVANCE_DEFAULT = int(os.getenv("GROUP_ADVANCE", 2))
+STRUCTURED_VERDICTS_DEFAULT = os.getenv("STRUCTURED_VERDICTS", "false").lower() == "true"
+JOURNAL_PATH_DEFAULT = os.getenv("JOURNAL_PATH", "")
+JOURNAL_MODE_DEFAULT = os.getenv("JOURNAL_MODE", "resume")
+JUDGE_CACHE_PATH_DEFAULT = os.getenv("JUDGE_CACHE_PATH", "")
+JUDGE_CACHE_MAX_ENTRIES_DEFAULT = int(os.getenv("JUDGE_CACHE_MAX_ENTRIES", 100_000))
+JUDGE_CACHE_TTL_DEFAULT = float(os.getenv("JUDGE_CACHE_TTL", 0)) or None
+REQUESTS_PER_MINUTE_DEFAULT = float(os.getenv("REQUESTS_PER_MINUTE", 0))
+TOKENS_PER_MINUTE_DEFAULT = float(os.getenv("TOKENS_PER_MINUTE", 0))
+MAX_RETRIES_DEFAULT = int(os.getenv("MAX_RETRIES", 4))
+HEDGE_AFTER_DEFAULT = float(os.getenv("HEDGE_AFTER", 0))
+CRITERIA_DEFAULT = "Factuality,Concise,Precision"
+
+# How the two players of a pairwise match are shown to the judge:
+# ``fixed`` in scheduling order, ``random`` in a random order per match and
+# ``both`` in both orders at once, cancelling the judge's position bias.
+PAIRWISE_ORDERS = ("fixed", "random", "both")
+
+
+def _swap_label(label: str | None) -> str | None:
+    """A pairwise label with players A and B exchanged; ties and unparsed labels stay as they are."""
+    return {"A": "B", "B": "A"}.get(label, label)
+
+
+def _combine_orderings(a, b, winners: list):
+    """Merge the verdicts on ``a`` vs ``b`` given for one or more orderings.
+
+    Each verdict is ``a``, ``b``, :data:`pairing.TIE` or ``None`` when it
+    could not be parsed. Unparsed verdicts are ignored and ``None`` is
+    returned if nothing else is left. The remaining verdicts are averaged
+    as points for ``a``, so two orderings that each prefer the player in
+    the same position make the match a tie.
+    """
+    points = [1.0 if w == a else 0.0 if w == b else 0.5 for w in winners if w is not None]
+    if not points:
+        return None
+    mean = sum(points) / len(points)
+    return a if mean > 0.5 else b if mean < 0.5 else TIE
+
+
+def _split_models(spec: str) -> list[str]:
+    """Models of a comma separated list, e.g. ``"gpt-4o-mini,claude-3-5-haiku"`` for an ensemble."""
+    return [m.strip() for m in spec.split(",") if m.strip()]
+
+
+def _combine_scores(results: list[tuple]) -> tuple:
+    """Average the ``(score, raw scores)`` several judges gave one player.
+
+    Judges without a verdict (``raw`` is ``None``) are ignored; the raw
+    scores are averaged per criterion when every judge used the same
+    criteria. Returns ``(None, None)`` when no judge gave a verdict.
+    """
+    parsed = [(avg, raw) for avg, raw in results if raw is not None]
+    if not parsed:
+        return None, None
+    if len(parsed) == 1:
+        return parsed[0]
+    avg = sum(a for a, _ in parsed) / len(parsed)
+    raws = [raw for _, raw in parsed]
+    if len({len(raw) for raw in raws}) > 1:
+        return avg, raws[0]
+    return avg, [sum(vals) / len(vals) for vals in zip(*raws)]
+
+
+def _close_call(winners: list) -> bool:
+    """Whether the verdicts on one match leave it open: none parsed, a tie or a disagreement."""
+    parsed = {w for w in winners if w is not None}
+    return len(parsed) != 1 or TIE in parsed
+
+
+def _near_cut(scores: dict, pool_size: int, margin: float) -> list:
+    """Players whose score is within ``margin`` of the line the score filter cuts at.
+
+    The line lies halfway between the last player kept and the first one
+    dropped; nothing is near it when every player is kept.
+    """
+    if len(scores) <= pool_size or pool_size <= 0:
+        return []
+    ranked = sorted(scores.values(), reverse=True)
+    line = (ranked[pool_size - 1] + ranked[pool_size]) / 2
+    return [p for p, s in scores.items() if abs(s - line) <= margin]
+
+
+_default_dispatcher = None
+_default_dispatcher_lock = threading.Lock()
+
+
+def default_dispatcher():
+    """The process-wide :class:`dispatch.Dispatcher` configured from the environment.
+
+    Tournaments share it so that concurrent runs stay within the same
+    provider rate limits.
+    """
+    global _default_dispatcher
+    with _default_dispatcher_lock:
+        if _default_dispatcher is None:
+            from dispatch import Dispatcher
+
+            _default_dispatcher = Dispatcher(
+                REQUESTS_PER_MINUTE_DEFAULT,
+                TOKENS_PER_MINUTE_DEFAULT,
+                max_retries=MAX_RETRIES_DEFAULT,
+                hedge_after=HEDGE_AFTER_DEFAULT,
+                hedge_workers=MAX_WORKERS_DEFAULT,
+            )
+        return _default_dispatcher
+
+
+class TournamentState:
+    """Everything a tournament run has produced so far.
+
+    :func:`tournament` fills it in as the stages finish: ``scores`` once the
+    score filter is done, ``rating`` once the pairwise stage is done and
+    ``top_picks`` at the very end.
+    """
+
+    def __init__(self):
+        self.instruction = ""
+        self.players: list[str] = []
+        self.scores: dict[str, float] | None = None
+        self.raw_scores: dict[str, list] = {}
+        self.pool: list[str] = []
+        self.rating: dict[str, float] | None = None
+        self.rating_err: dict[str, float] = {}
+        self.top_picks: list[str] = []
+        self.pairwise_outcomes: dict[str, int] = {}
+        self.multiplicity: dict[str, int] = {}
+        self.escalations: dict[str, int] = {}
+        self.parse_failures: dict[str, int] = {}
+        self.journal: dict[str, int] = {}
+        self.stages: list[dict] = []
+        self.budget: Budget | None = None
+        self.metrics = Metrics()
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.metrics.totals().prompt_tokens
+
+    @property
+    def completion_tokens(self) -> int:
+        return self.metrics.totals().completion_tokens
+
+    def usage_str(self) -> str:
+        total = self.metrics.totals()
+        text = (
+            f"Prompt tokens: {total.prompt_tokens}\n"
+            f"Completion tokens: {total.completion_tokens}\n"
+            f"Total tokens: {total.prompt_tokens + total.completion_tokens}"
+        )
+        if total.cached_tokens:
+            text += f"\nCached prompt tokens: {total.cached_tokens}"
+        if total.cost:
+            text += f"\nEstimated cost: ${total.cost:.4f}"
+        if self.budget is not None:
+            text += f"\n{self.budget.summary()}"
+        if total.calls:
+            text += "\n\n" + self.metrics.summary_table()
+        return text
+
+    def to_dict(self) -> dict:
+        """JSON-serialisable summary of the run."""
+        picks = []
+        for p in self.top_picks:
+            pick = {"text": p}
+            if p in self.multiplicity:
+                pick["count"] = self.multiplicity[p]
+            if self.scores is not None and p in self.scores:
+                pick["score"] = self.scores[p]
+            if p in self.raw_scores:
+                pick["raw_scores"] = self.raw_scores[p]
+            if self.rating is not None and p in self.rating:
+                pick["rating"] = self.rating[p]
+                if p in self.rating_err:
+                    pick["rating_stderr"] = self.rating_err[p]
+            picks.append(pick)
+        usage = {"prompt_tokens": self.prompt_tokens, "completion_tokens": self.completion_tokens}
+        cached = self.metrics.totals().cached_tokens
+        if cached:
+            usage["cached_tokens"] = cached
+        result = {
+            "instruction": self.instruction,
+            "top_picks": picks,
+            "num_players": len(self.players),
+            "num_generations": sum(self.multiplicity.values()) or len(self.players),
+            "pool_size": len(self.pool),
+            "usage": usage,
+            "metrics": [
+                {"stage": stage, "model": model, **stats.as_dict()}
+                for (stage, model), stats in self.metrics.snapshot().items()
+            ],
+        }
+        if self.pairwise_outcomes:
+            result["pairwise_outcomes"] = dict(self.pairwise_outcomes)
+        if self.escalations:
+            result["escalations"] = dict(self.escalations)
+        if self.parse_failures:
+            result["parse_failures"] = dict(self.parse_failures)
+        if self.journal:
+            result["journal"] = dict(self.journal)
+        if self.stages:
+            result["stages"] = [dict(stage) for stage in self.stages]
+        if self.budget is not None:
+            result["budget"] = self.budget.as_dict()
+        return result
+
+
+def _completion_line(prefix: str, text: str, player_id: int | str | None = None) -> str:
+    disp = text.replace("\n", " ")
+    if len(disp) > 1000:
+        disp = disp[:1000] + "…"
+    if player_id is not None:
+        prefix = f"{prefix}(ID {player_id}) "
+    return f"{prefix}{disp}"
+
+
+def _stage_line(number, stage, player_id) -> str:
+    """Summary of one finished group stage; ``player_id`` turns a player into the ID shown in the log."""
+    if "advanced" not in stage:
+        return f"Stage {number} (final): {stage['players']} players, {stage['matches']} matches"
+    return (
+        f"Stage {number}: {stage['players']} players in {stage['groups']} groups, {stage['matches']} matches, "
+        f"{len(stage['advanced'])} advance (IDs {', '.join(str(player_id(p)) for p in stage['advanced'])})"
+    )
+
+
+def _stage_summary(stage) -> dict:
+    summary = {k: stage[k] for k in ("players", "groups", "matches")}
+    if "advanced" in stage:
+        summary["advanced"] = len(stage["advanced"])
+    return summary
+
+
+class _Run:
+    """Settings and bookkeeping of one :func:`tournament` run.
+
+    The stage functions below take it as their first argument. Its methods
+    build the model calls and book their answers for both the threaded and
+    the async path, so each path only keeps how the calls are sent.
+    """
+
+    def __init__(self, settings: dict):
+        s = settings
+        self.instruction = s["instruction_input"].strip()
+        self.criteria_list = [c.strip() for c in s["criteria_input"].split(",") if c.strip()] or [
+            "Factuality",
+            "Instruction Following",
+            "Precision",
+        ]
+        self.criteria_block = "\n".join(f"{i + 1}) {c}" for i, c in enumerate(self.criteria_list))
+        self.n_gen = int(s["n_gen"])
+        self.num_top_picks = int(s["num_top_picks"])
+        self.pool_size = int(s["pool_size"])
+        self.max_workers = int(s["max_workers"])
+
+        def given(name, default):
+            return s[name] if s[name] is not None else default
+
+        self.generate_temperature = given("generate_temperature", GENERATE_TEMPERATURE_DEFAULT)
+        self.score_temperature = given("score_temperature", SCORE_TEMPERATURE_DEFAULT)
+        self.pairwise_temperature = given("pairwise_temperature", PAIRWISE_TEMPERATURE_DEFAULT)
+        self.api_base = s["api_base"] or API_BASE_DEFAULT
+        self.api_token = s["api_token"] or API_TOKEN_DEFAULT
+        self.generate_model = s["generate_model"] or GENERATE_MODEL_DEFAULT
+        self.score_models = _split_models(s["score_model"] or SCORE_MODEL_DEFAULT)
+        self.pairwise_models = _split_models(s["pairwise_model"] or PAIRWISE_MODEL_DEFAULT)
+        self.cascade_model = given("cascade_model", CASCADE_MODEL_DEFAULT).strip()
+        self.cascade_margin = float(given("cascade_margin", CASCADE_MARGIN_DEFAULT))
+        self.enable_score_filter = bool(s["enable_score_filter"])
+        self.enable_pairwise_filter = bool(s["enable_pairwise_filter"])
+        self.score_with_instruction = given("score_with_instruction", SCORE_WITH_INSTRUCTION_DEFAULT)
+        self.pairwise_with_instruction = given("pairwise_with_instruction", PAIRWISE_WITH_INSTRUCTION_DEFAULT)
+        self.generate_thinking = given("generate_thinking", GENERATE_THINKING_DEFAULT)
+        self.score_thinking = given("score_thinking", SCORE_THINKING_DEFAULT)
+        self.pairwise_thinking = given("pairwise_thinking", PAIRWISE_THINKING_DEFAULT)
+        self.score_explain = given("score_explain", False)
+        self.pairwise_explain = given("pairwise_explain", False)
+        self.pairing_mode = s["pairing_mode"] or PAIRING_MODE_DEFAULT
+        self.max_matches = int(given("max_matches", MAX_MATCHES_DEFAULT))
+        self.use_async = given("use_async", ASYNC_PIPELINE_DEFAULT)
+        self.model_concurrency = given("model_concurrency", MODEL_CONCURRENCY_DEFAULT)
+        self.judge_cache_path = given("judge_cache_path", JUDGE_CACHE_PATH_DEFAULT)
+        self.rank_group_size = int(given("rank_group_size", RANK_GROUP_SIZE_DEFAULT))
+        self.rank_rounds = int(given("rank_rounds", RANK_ROUNDS_DEFAULT))
+        self.group_stage_size = int(given("group_stage_size", GROUP_STAGE_SIZE_DEFAULT))
+        self.group_advance = int(given("group_advance", GROUP_ADVANCE_DEFAULT))
+        self.structured_verdicts = given("structured_verdicts", STRUCTURED_VERDICTS_DEFAULT)
+        self.journal_path = given("journal_path", JOURNAL_PATH_DEFAULT)
+        self.journal_mode = s["journal_mode"] or JOURNAL_MODE_DEFAULT
+        self.early_stop_confidence = float(given("early_stop_confidence", EARLY_STOP_CONFIDENCE_DEFAULT))
+        self.stream_generation = given("stream_generation", STREAM_GENERATION_DEFAULT)
+        self.prompt_layout = s["prompt_layout"] or PROMPT_LAYOUT_DEFAULT
+        self.pairwise_order = s["pairwise_order"] or PAIRWISE_ORDER_DEFAULT
+        if self.pairwise_order not in PAIRWISE_ORDERS:
+            raise ValueError(f"Unknown pairwise order: {self.pairwise_order!r}")
+        # Once the order varies the judge may call a tie instead of picking a side.
+        self.allow_tie = self.pairwise_order != "fixed"
+        # A tie from a first-pass judge is the signal to escalate the match.
+        self.first_pass_tie = self.allow_tie or bool(self.cascade_model)
+        self.dedup_threshold = float(given("dedup_threshold", DEDUP_THRESHOLD_DEFAULT))
+        self.score_batch_size = max(1, int(given("score_batch_size", SCORE_BATCH_SIZE_DEFAULT)))
+        self.token_budget = float(given("token_budget", TOKEN_BUDGET_DEFAULT))
+        self.cost_budget = float(given("cost_budget", COST_BUDGET_DEFAULT))
+        self.latency_target = float(given("latency_target", LATENCY_TARGET_DEFAULT))
+        self.shard_jobs = given("shard_jobs", SHARD_JOBS_PATH_DEFAULT)
+        self.shard_workers = int(given("shard_workers", SHARD_WORKERS_DEFAULT))
+        self.judge_cache = None
+        # Shard workers open the judge cache themselves.
+        if self.judge_cache_path and not self.shard_jobs:
+            from judge_cache import JudgeCache
+
+            self.judge_cache = JudgeCache(self.judge_cache_path, JUDGE_CACHE_MAX_ENTRIES_DEFAULT, JUDGE_CACHE_TTL_DEFAULT)
+
+        self.started = time.time()
+        self.state = s["state"] if s["state"] is not None else TournamentState()
+        self.state.instruction = self.instruction
+        self.metrics = self.state.metrics
+        self.dispatcher = s["dispatcher"] if s["dispatcher"] is not None else default_dispatcher()
+        self.score_outputs: list = []
+        self.pairwise_outputs: list[str] = []
+        self.rating_err: dict[int, float] = {}
+        self.outcomes: Counter = Counter()
+        self.outcome_lock = threading.Lock()
+        self.parse_failures: Counter = Counter()
+        self.order_rng = random.Random()
+        # Judge calls fanned out to an ensemble or to both orderings of a match
+        # run on their own pool, started on first use: waiting on a stage pool
+        # from inside one of its workers could deadlock.
+        self.judges: ThreadPoolExecutor | None = None
+        self.judges_lock = threading.Lock()
+        self.shards = None
+        self.journal = None
+        # Set up before the first call when a budget or latency target is given.
+        self.budget: Budget | None = None
+        self.planner: Planner | None = None
+        self.requested = self.pool_size, self.max_matches
+        # ``(text, seconds)`` of the answers generated before planning.
+        self.sample: list[tuple[str, float]] = []
+        # Played pairwise matches by player id, set up by the threaded pairwise stage.
+        self.matches = None
+
+        # numpy is only needed once a tournament runs, not to import the engine.
+        from players import PlayerRegistry
+        from rating import EarlyStop
+
+        # Players are judged and rated by id; the texts are only needed for the
+        # prompts and the final results. Duplicate answers get the id of their
+        # first copy, so they are judged once.
+        self.registry = PlayerRegistry(self.dedup_threshold)
+        self.stopper = (
+            EarlyStop(self.num_top_picks, self.early_stop_confidence, self.max_workers)
+            if self.early_stop_confidence > 0
+            else None
+        )
+
+    # Sending calls: the journal, the budget and the metrics around the transport.
+
+    def admit(self, stage: str, model: str, args):
+        """Book the estimated tokens of a call; raises :class:`BudgetExceeded` past the budget."""
+        if self.budget is None:
+            return None
+        return self.budget.admit(model, self.planner.costs.of_call(stage, args))
+
+    def replayed(self, stage: str, fn, args, kwargs):
+        """The journal key of a call and its recorded ``(text, usage, swapped)``, ``None`` when it has to be made."""
+        if self.journal is None:
+            return None, None
+        from journal import call_key
+
+        key = call_key(fn, args, kwargs)
+        answer = self.journal.take(key)
+        if answer is not None:
+            # A replayed answer costs nothing this time, like a judge cache hit.
+            self.metrics.record(stage, kwargs["model"], 0.0)
+        return key, answer
+
+    def hedge_lost(self, stage: str, model: str):
+        """Book a hedged request whose answer came second: it was paid for all the same."""
+
+        def lost(result, seconds):
+            self.metrics.record(stage, model, seconds, result[1])
+            if self.budget is not None:
+                self.budget.settle((0.0, 0.0), model, result[1])
+
+        return lost
+
+    def sharded(self, stage: str) -> bool:
+        """Whether calls of ``stage`` go to the shard workers; answers are always generated here."""
+        return self.shards is not None and stage != "generate"
+
+    def refund(self, ticket) -> None:
+        """Release the tokens booked for a call that failed."""
+        if ticket is not None:
+            self.budget.settle(ticket)
+
+    def booked(self, stage: str, model: str, key, ticket, start: float, answer, retries: int):
+        """Book a call that was made and return its ``(text, usage, swapped)``."""
+        text, usage = answer
+        if ticket is not None:
+            self.budget.settle(ticket, model, usage)
+        self.metrics.record(stage, model, time.perf_counter() - start, usage, retries=retries)
+        if self.journal is not None:
+            self.journal.record(key, stage, model, text, usage)
+        return text, usage, False
+
+    def request(self, stage: str, fn, args: tuple, kwargs: dict):
+        """Send the call ``fn(*args, **kwargs)`` through the dispatcher and record it under ``stage``.
+
+        Returns ``(text, usage, swapped)``: ``swapped`` is true when the answer
+        comes from the journal and was given with the two players of a
+        pairwise call the other way round. The text is kept as the judge wrote
+        it; :meth:`parse_winner` swaps the label it reads from it.
+        """
+        key, answer = self.replayed(stage, fn, args, kwargs)
+        if answer is not None:
+            return answer
+        model = kwargs["model"]
+        ticket = self.admit(stage, model, args)
+        start = time.perf_counter()
+        try:
+            if self.sharded(stage):
+                answer, retries = self.shards.call(fn, args, kwargs)
+            else:
+                answer, retries = self.dispatcher.call(model, fn, *args, on_lost=self.hedge_lost(stage, model), **kwargs)
+        except BaseException:
+            self.refund(ticket)
+            raise
+        return self.booked(stage, model, key, ticket, start, answer, retries)
+
+    async def arequest(self, stage: str, fn, args: tuple, kwargs: dict):
+        """Async variant of :meth:`request`."""
+        key, answer = self.replayed(stage, fn, args, kwargs)
+        if answer is not None:
+            return answer
+        model = kwargs["model"]
+        ticket = self.admit(stage, model, args)
+        start = time.perf_counter()
+        try:
+            if self.sharded(stage):
+                import asyncio
+
+                answer, retries = await asyncio.wrap_future(self.shards.submit(fn, args, kwargs))
+            else:
+                answer, retries = await self.dispatcher.acall(model, fn, *args, **kwargs)
+        except BaseException:
+            self.refund(ticket)
+            raise
+        return self.booked(stage, model, key, ticket, start, answer, retries)
+
+    def call(self, stage: str, fn, args: tuple, kwargs: dict):
+        """:meth:`request` for calls without two players to swap: ``(text, usage)``."""
+        text, usage, _ = self.request(stage, fn, args, kwargs)
+        return text, usage
+
+    async def acall(self, stage: str, fn, args: tuple, kwargs: dict):
+        text, usage, _ = await self.arequest(stage, fn, args, kwargs)
+        return text, usage
+
+    def fan_out(self, fn, jobs: list[tuple]) -> list:
+        """``fn(*job)`` for every job, in parallel on the judge pool when there is more than one."""
+        if len(jobs) == 1:
+            return [fn(*jobs[0])]
+        with self.judges_lock:
+            if self.judges is None:
+                self.judges = ThreadPoolExecutor(
+                    max_workers=self.max_workers * max(2, len(self.score_models), len(self.pairwise_models))
+                )
+        return [f.result() for f in [self.judges.submit(fn, *job) for job in jobs]]
+
+    def close_judges(self) -> None:
+        if self.judges is not None:
+            self.judges.shutdown(cancel_futures=True)
+
+    # Building calls: ``(fn, args, kwargs)`` for :meth:`request`; ``asynchronous`` picks the coroutine.
+
+    def generate_call(self, n: int, asynchronous: bool = False) -> tuple:
+        """The call asking for ``n`` answers at once."""
+        return (
+            agenerate_players if asynchronous else generate_players,
+            (self.instruction, n),
+            dict(
+                model=self.generate_model,
+                api_base=self.api_base,
+                api_key=self.api_token,
+                temperature=self.generate_temperature,
+                thinking=self.generate_thinking,
+                return_usage=True,
+            ),
+        )
+
+    def _judge_kwargs(self, model: str, stage: str) -> dict:
+        pairwise = stage == "pairwise"
+        return dict(
+            model=model,
+            api_base=self.api_base,
+            api_key=self.api_token,
+            temperature=self.pairwise_temperature if pairwise else self.score_temperature,
+            include_instruction=self.pairwise_with_instruction if pairwise else self.score_with_instruction,
+            thinking=self.pairwise_thinking if pairwise else self.score_thinking,
+            explain=self.pairwise_explain if pairwise else self.score_explain,
+            return_usage=True,
+            cache=self.judge_cache,
+            layout=self.prompt_layout,
+            structured=self.structured_verdicts,
+        )
+
+    def score_call(self, texts: list[str], model: str, asynchronous: bool = False) -> tuple:
+        """The call scoring ``texts``: one answer alone, several in one batch."""
+        if len(texts) == 1:
+            fn, players = (aprompt_score if asynchronous else prompt_score), texts[0]
+        else:
+            fn, players = (aprompt_score_batch if asynchronous else prompt_score_batch), texts
+        return fn, (self.instruction, self.criteria_list, self.criteria_block, players), self._judge_kwargs(model, "score")
+
+    def pairwise_call(self, a: str, b: str, model: str, tie: bool, asynchronous: bool = False) -> tuple:
+        """The call judging answer ``a`` against answer ``b``."""
+        return (
+            aprompt_pairwise if asynchronous else prompt_pairwise,
+            (self.instruction, self.criteria_block, a, b),
+            dict(self._judge_kwargs(model, "pairwise"), allow_tie=tie),
+        )
+
+    def rank_call(self, texts: list[str], model: str) -> tuple:
+        """The call ranking ``texts`` from best to worst."""
+        return prompt_rank, (self.instruction, self.criteria_block, texts), self._judge_kwargs(model, "pairwise")
+
+    def match_jobs(self, a, b, escalated: bool = False) -> list[tuple]:
+        """``(first, second, model, allow_tie)`` of every judge call on one match.
+
+        The first pass asks every pairwise model; an ``escalated`` match
+        asks the cascade model alone.
+        """
+        if escalated:
+            return [(x, y, self.cascade_model, self.allow_tie) for x, y in self.match_orderings(a, b)]
+        return [(x, y, m, self.first_pass_tie) for x, y in self.match_orderings(a, b) for m in self.pairwise_models]
+
+    def match_orderings(self, a, b):
+        if self.pairwise_order == "both":
+            return [(a, b), (b, a)]
+        if self.pairwise_order == "random" and self.order_rng.random() < 0.5:
+            return [(b, a)]
+        return [(a, b)]
+
+    # Booking answers.
+
+    def unparsed(self, kind: str) -> None:
+        with self.outcome_lock:
+            self.parse_failures[kind] += 1
+
+    def parse_score(self, text):
+        """``(mean score, scores)``, or ``(None, None)`` when the verdict holds no numbers."""
+        raw_vals = verdict_scores(parse_verdict(text))
+        if raw_vals is None:
+            self.unparsed("score")
+            return None, None
+        return sum(raw_vals) / len(raw_vals), raw_vals
+
+    def book_scores(self, batch: list[int], text: str):
+        """``(score, raw scores)`` per player of a scored ``batch``.
+
+        ``None`` when the verdict on a batch cannot be split per player: the
+        players are then scored one by one.
+        """
+        if len(batch) == 1:
+            self.score_outputs.append((batch[0] + 1, text))
+            return [self.parse_score(text)]
+        self.score_outputs.append((f"{batch[0] + 1}-{batch[-1] + 1}", text))
+        per_player = split_batch_scores(parse_verdict(text), len(batch))
+        if per_player is None:
+            self.unparsed("score_batch")
+            return None
+        return [(sum(v) / len(v), v) for v in per_player]
+
+    def escalation_batches(self, scores: dict) -> list[list]:
+        """The players scored near the cut line, in batches for the cascade model."""
+        near = _near_cut(scores, self.pool_size, self.cascade_margin)
+        if near:
+            self.state.escalations["score"] = len(near)
+        return [near[i : i + self.score_batch_size] for i in range(0, len(near), self.score_batch_size)]
+
+    def escalation_line(self, batches: list[list]) -> str:
+        return f"Escalating {sum(map(len, batches))} players scored near the cut line to {self.cascade_model}"
+
+    @staticmethod
+    def rescored(batch: list, results: list) -> list[tuple]:
+        """``(player, score, raw scores)`` of the escalated scores to keep.
+
+        A refused or unparsed escalation keeps the first-pass score.
+        """
+        return [(p, s_val, raw_val) for p, (s_val, raw_val) in zip(batch, results) if raw_val is not None]
+
+    def parse_winner(self, a, b, text, swapped=False):
+        """``a``, ``b``, ``TIE`` or ``None`` when the verdict cannot be parsed.
+
+        ``swapped`` reads a replayed answer given with ``b`` shown first.
+        """
+        label = parse_pairwise(parse_verdict(text))
+        if label is None:
+            self.unparsed("pairwise")
+        elif swapped:
+            label = _swap_label(label)
+        return {"A": a, "B": b, "tie": TIE}.get(label)
+
+    def book_verdict(self, a, b, answer):
+        """The winner of ``a`` vs ``b`` read from one judge's ``(text, usage, swapped)``."""
+        text, _, swapped = answer
+        self.pairwise_outputs.append(text)
+        return self.parse_winner(a, b, text, swapped)
+
+    def escalates(self, winners: list) -> bool:
+        """Whether a match the first-pass judges left open goes to the cascade model."""
+        return bool(self.cascade_model) and _close_call(winners)
+
+    def count_escalation(self) -> None:
+        with self.outcome_lock:
+            self.outcomes["escalated"] += 1
+
+    def settle(self, a, b, winners):
+        """Combine the verdicts of one match and count how it ended."""
+        winner = _combine_orderings(a, b, winners)
+        with self.outcome_lock:
+            if unparsed := sum(w is None for w in winners):
+                self.outcomes["unparsed"] += unparsed
+            if len({w for w in winners if w is not None}) > 1:
+                self.outcomes["order_disagreements"] += 1
+            self.outcomes["tie" if winner is TIE else "no_verdict" if winner is None else "decisive"] += 1
+        return winner
+
+    def book_ranking(self, group: list, text: str):
+        """``group`` ordered from best to worst, ``None`` when the ranking cannot be parsed."""
+        self.pairwise_outputs.append(text)
+        order = parse_ranking(parse_verdict(text), len(group))
+        if order is None:
+            self.unparsed("rank")
+            return None
+        return [group[i] for i in order]
+
+    # Planning and logging.
+
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.budget.exhausted
+
+    def replan(self, texts: list[str], done: set) -> str | None:
+        """Fit the pool and the matches to what is left, now that the answer lengths are known."""
+        if self.planner is None or not texts:
+            return None
+        self.planner.costs.answer_tokens = sum(map(estimate_tokens, texts)) / len(texts)
+        plan = self.planner.plan(
+            len(texts),
+            *self.requested,
+            done=done,
+            spent_tokens=self.budget.spent_tokens if self.budget is not None else 0,
+            spent_cost=self.budget.spent_cost if self.budget is not None else 0,
+        )
+        if plan is None:
+            return "The rest of the budget does not cover judging every player; calls beyond it will be refused"
+        self.pool_size, self.max_matches = plan.pool_size, plan.max_matches
+        return f"Re-planned for {self.planner.costs.answer_tokens:.0f} tokens per answer: {plan}"
+
+    def new_scheduler(self, players):
+        return make_scheduler(
+            self.pairing_mode, players, self.num_top_picks, stage_size=self.group_stage_size, advance=self.group_advance
+        )
+
+    def early_stop_line(self, total, played):
+        return (
+            f"Early stop: top {self.num_top_picks} settled at {self.early_stop_confidence:.0%} confidence "
+            f"after {played} matches, {max(0, total - played)} of {total} scheduled judge calls saved"
+        )
+
+    def outcomes_line(self):
+        outcomes = self.outcomes
+        return (
+            f"Pairwise outcomes: {outcomes['decisive']} decisive, {outcomes['tie']} ties, "
+            f"{outcomes['no_verdict']} without verdict ({outcomes['unparsed']} unparsed judge answers, "
+            f"{outcomes['order_disagreements']} order disagreements)"
+            + (f", {outcomes['escalated']} escalated to {self.cascade_model}" if self.cascade_model else "")
+        )
+
+    def parse_failures_line(self):
+        counts = ", ".join(f"{n} {kind.replace('_', ' ')}" for kind, n in sorted(self.parse_failures.items()))
+        return f"Judge answers without a parsable verdict: {counts}"
+
+
+def tournament(
+    api_base,
+    api_token,
+    generate_model,
+    score_model,
+    pairwise_model,
+    generate_temperature,
+    score_temperature,
+    pairwise_temperature,
+    instruction_input,
+    criteria_input,
+    n_gen,
+    pool_size,
+    num_top_picks,
+    max_workers,
+    enable_score_filter,
+    enable_pairwise_filter,
+    score_with_instruction,
+    pairwise_with_instruction,
+    generate_thinking,
+    score_thinking,
+    pairwise_thinking,
+    score_explain=None,
+    pairwise_explain=None,
+    pairing_mode=None,
+    max_matches=None,
+    use_async=None,
+    model_concurrency=None,
+    judge_cache_path=None,
+    score_batch_size=None,
+    rank_group_size=None,
+    rank_rounds=None,
+    early_stop_confidence=None,
+    stream_generation=None,
+    prompt_layout=None,
+    pairwise_order=None,
+    dedup_threshold=None,
+    token_budget=None,
+    cost_budget=None,
+    latency_target=None,
+    cascade_model=None,
+    cascade_margin=None,
+    shard_jobs=None,
+    shard_workers=None,
+    group_stage_size=None,
+    group_advance=None,
+    structured_verdicts=None,
+    journal_path=None,
+    journal_mode=None,
+    dispatcher=None,
+    state=None,
+):
+    """Run one tournament without any UI.
+
+    This is a generator: it yields progress messages and returns the
+    :class:`TournamentState` (also filled in place when ``state`` is passed)
+    once the tournament is finished. Use :func:`run` to simply get the result.
+
+    ``score_model`` and ``pairwise_model`` may list several models separated
+    by commas: every judge call then goes to all of them in parallel and
+    their verdicts are averaged. With a ``cascade_model`` those judges act
+    as the cheap first pass, and only players scored within
+    ``cascade_margin`` of the pool cut line and matches they leave open
+    are judged again by the cascade model, whose verdict replaces theirs.
+
+    With ``shard_jobs`` (the path of a :class:`shards.JobTable`) the judge
+    calls are posted to that table and run by worker processes, of which
+    ``shard_workers`` are started locally for this ctx.
+
+    The ``groups`` pairing mode plays round-robin groups of
+    ``group_stage_size`` players and promotes the best ``group_advance`` of
+    each group to the next stage (see :class:`pairing.GroupStage`).
+
+    ``structured_verdicts`` asks the judges for JSON verdicts in the
+    provider's JSON response mode. Either way, judge answers without a
+    verdict are counted per kind of call in ``state.parse_failures``.
+
+    With a ``journal_path`` every call is recorded in a :class:`journal.Journal`
+    and calls recorded there by an earlier run are answered from it, so an
+    interrupted run resumes without paying twice. ``journal_mode="replay"``
+    calls no model at all and refuses calls missing from the journal.
+    """
+    ctx = _Run(dict(locals()))
+    state, registry = ctx.state, ctx.registry
+    # Whatever stops the run, an error, a cancelled UI run closing this
+    # generator or its end, stops the judge pool and the shard workers and
+    # closes the journal.
+    cleanup = ExitStack()
+    cleanup.callback(ctx.close_judges)
+    if ctx.journal_path:
+        from journal import Journal
+
+        ctx.journal = Journal(ctx.journal_path, ctx.journal_mode)
+        cleanup.callback(ctx.journal.close)
+        ctx.journal.start(ctx.instruction)
+    try:
+        if ctx.journal is not None and len(ctx.journal):
+            yield f"Journal: {len(ctx.journal)} recorded calls in {ctx.journal_path} are answered from it"
+        if ctx.token_budget > 0 or ctx.cost_budget > 0 or ctx.latency_target > 0:
+            yield from _plan(ctx)
+        if ctx.shard_jobs:
+            yield from _open_shards(ctx, cleanup)
+
+        if ctx.use_async:
+            yield "Generating answers (async pipeline) …"
+            all_ids, top_players, rating = yield from _run_async(ctx)
+        else:
+            yield "Generating answers …"
+            all_ids = yield from (_stream_players(ctx) if ctx.stream_generation else _generate_players(ctx))
+        if registry.dedup.exact or registry.dedup.near:
+            yield registry.dedup_summary()
+        state.multiplicity = {p.text: p.count for p in registry.players}
+
+        if ctx.enable_score_filter:
+            yield "Histogram generating"
+            if not ctx.use_async:
+                yield from _score_players(ctx, all_ids)
+                top_players = registry.ranked(all_ids)[: ctx.pool_size]
+            yield from _score_report(ctx, all_ids, top_players)
+        else:
+            top_players = all_ids
+        if ctx.enable_pairwise_filter:
+            if not ctx.use_async or ctx.pairing_mode == "listwise":
+                rating = yield from _rate_pool(ctx, top_players)
+            top_k = yield from _pairwise_report(ctx, rating)
+        else:
+            top_k = top_players[: ctx.num_top_picks]
+        state.players = registry.texts(all_ids)
+        state.pool = registry.texts(top_players)
+        state.top_picks = registry.texts(top_k)
+        cleanup.close()
+        yield from _final_report(ctx)
+        return state
+    finally:
+        cleanup.close()
+
+
+def _plan(ctx: _Run):
+    """Size the tournament to the budget and latency target from a few sample answers."""
+    ctx.planner = Planner(
+        CallCosts(
+            ctx.instruction,
+            ctx.criteria_block,
+            score_with_instruction=ctx.score_with_instruction,
+            pairwise_with_instruction=ctx.pairwise_with_instruction,
+            score_explain=ctx.score_explain,
+            pairwise_explain=ctx.pairwise_explain,
+        ),
+        models={"generate": ctx.generate_model, "score": ctx.score_models, "pairwise": ctx.pairwise_models},
+        pairing_mode=ctx.pairing_mode,
+        num_top_picks=ctx.num_top_picks,
+        max_workers=ctx.max_workers,
+        max_tokens=ctx.token_budget,
+        max_cost=ctx.cost_budget,
+        latency_target=ctx.latency_target,
+        score_filter=ctx.enable_score_filter,
+        pairwise_filter=ctx.enable_pairwise_filter,
+        score_batch_size=ctx.score_batch_size,
+        calls_per_match=2 if ctx.pairwise_order == "both" else 1,
+        rank_group_size=ctx.rank_group_size,
+        rank_rounds=ctx.rank_rounds,
+        group_stage_size=ctx.group_stage_size,
+        group_advance=ctx.group_advance,
+    )
+    if ctx.token_budget > 0 or ctx.cost_budget > 0:
+        ctx.budget = ctx.state.budget = Budget(ctx.token_budget, ctx.cost_budget)
+    # Plan for the length of a few real answers instead of a guess; they
+    # are kept as the first players.
+    ctx.sample = sample = _sample_answers(ctx, min(ctx.n_gen, SAMPLE_ANSWERS))
+    if sample:
+        ctx.planner.costs.answer_tokens = sum(estimate_tokens(text) for text, _ in sample) / len(sample)
+    spent = (ctx.budget.spent_tokens, ctx.budget.spent_cost) if ctx.budget is not None else (0, 0)
+    plan = ctx.planner.plan(
+        ctx.n_gen, ctx.pool_size, ctx.max_matches, spent_tokens=spent[0], spent_cost=spent[1], generated=len(sample)
+    )
+    if plan is None:
+        smallest = ctx.planner.smallest(ctx.n_gen, ctx.pool_size, ctx.max_matches, generated=len(sample))
+        raise ValueError(
+            f"The budget and latency target do not allow even the smallest tournament of {smallest}"
+            + (f", after {spent[0]} tokens spent on {len(sample)} sample answers" if sample else "")
+        )
+    # The re-plan after generation may grow the pool back up to what was asked for.
+    ctx.requested = ctx.pool_size, ctx.max_matches
+    ctx.n_gen, ctx.pool_size, ctx.max_matches = plan.n_gen, plan.pool_size, plan.max_matches
+    yield f"Plan: {plan}"
+
+
+def _open_shards(ctx: _Run, cleanup: ExitStack):
+    from shards import Coordinator
+
+    ctx.shards = Coordinator(
+        ctx.shard_jobs,
+        processes=ctx.shard_workers,
+        threads=max(1, math.ceil(ctx.max_workers / max(1, ctx.shard_workers))),
+        api_base=ctx.api_base,
+        api_key=ctx.api_token,
+        judge_cache_path=ctx.judge_cache_path,
+    )
+    cleanup.callback(ctx.shards.close)
+    yield (
+        f"Judge calls go to the job table {ctx.shard_jobs}"
+        + (f" ({ctx.shard_workers} local worker processes)" if ctx.shard_workers else "; start workers with shards.py")
+    )
+
+
+def _generate(ctx: _Run, n: int) -> list[str]:
+    """``n`` answers from one generation request."""
+    texts, _ = ctx.call("generate", *ctx.generate_call(n))
+    return texts
+
+
+def _generate_one(ctx: _Run):
+    """One answer and its latency; ``None`` when the budget refused the call."""
+    start = time.perf_counter()
+    try:
+        players = _generate(ctx, 1)
+    except BudgetExceeded:
+        return None, time.perf_counter() - start
+    return (players[0] if players else ""), time.perf_counter() - start
+
+
+def _sample_answers(ctx: _Run, k: int) -> list[tuple[str, float]]:
+    """``k`` answers and their latency, requested the way the generation stage will request the rest."""
+    if ctx.stream_generation:
+        return [(text, seconds) for text, seconds in ctx.fan_out(_generate_one, [(ctx,)] * k) if text is not None]
+    start = time.perf_counter()
+    try:
+        texts = _generate(ctx, k)
+    except BudgetExceeded:
+        return []
+    return [(text, time.perf_counter() - start) for text in texts]
+
+
+def _generate_players(ctx: _Run):
+    """Generate the answers in one request; returns the ids of the distinct players."""
+    texts = [text for text, _ in ctx.sample]
+    if ctx.n_gen > len(texts):
+        texts += _generate(ctx, ctx.n_gen - len(texts))
+    yield f"{len(texts)} players generated"
+    ids = []
+    for i, text in enumerate(texts, 1):
+        player, new = ctx.registry.add(text)
+        yield _completion_line(f"Completion {i}: ", text, player.id + 1)
+        if new:
+            ids.append(player.id)
+    if (line := ctx.replan(ctx.registry.texts(ids), {"generate"})) is not None:
+        yield line
+    return ids
+
+
+def _score_batch_one(ctx: _Run, batch: list[int], model: str) -> list[tuple]:
+    """``(score, raw scores)`` of every player in ``batch`` by one judge model."""
+    try:
+        text, _ = ctx.call("score", *ctx.score_call(ctx.registry.texts(batch), model))
+    except BudgetExceeded:
+        # Scored like an answer without a verdict.
+        return [(None, None)] * len(batch)
+    results = ctx.book_scores(batch, text)
+    if results is None:
+        return [_score_batch_one(ctx, [pid], model)[0] for pid in batch]
+    return results
+
+
+def _score_batch(ctx: _Run, batch: list[int]) -> list[tuple]:
+    """Scores of the players in ``batch``, averaged over the score models."""
+    per_model = ctx.fan_out(_score_batch_one, [(ctx, batch, model) for model in ctx.score_models])
+    return [_combine_scores(list(results)) for results in zip(*per_model)]
+
+
+def _stream_players(ctx: _Run):
+    """Generate with one request per player and score each batch as soon as it is complete.
+
+    Returns the ids of the distinct players in the order they finished;
+    with the score filter enabled their scores are in the registry.
+    """
+    registry = ctx.registry
+    ids: list[int] = []
+    generated = 0
+    jobs = []
+    pending: list[int] = []
+
+    def timed_score_batch(batch):
+        return _score_batch(ctx, batch), time.time()
+
+    # Scoring has its own pool: on the generation pool a batch would
+    # only start once every generation request had been picked up.
+    with ThreadPoolExecutor(max_workers=ctx.max_workers) as ex, ThreadPoolExecutor(max_workers=ctx.max_workers) as scorer:
+
+        def answers():
+            yield from ctx.sample
+            for fut in as_completed([ex.submit(_generate_one, ctx) for _ in range(ctx.n_gen - len(ctx.sample))]):
+                yield fut.result()
+
+        for text, latency in answers():
+            if text is None:
+                continue
+            generated += 1
+            player, new = registry.add(text)
+            yield _completion_line(f"Completion {generated} ({latency:.1f}s): ", text, player.id + 1)
+            if not new:
+                continue
+            ids.append(player.id)
+            if ctx.enable_score_filter:
+                pending.append(player.id)
+                if len(pending) == ctx.score_batch_size:
+                    jobs.append((pending, scorer.submit(timed_score_batch, pending)))
+                    pending = []
+        yield f"{generated} players generated after {time.time() - ctx.started:.1f}s"
+        if pending:
+            jobs.append((pending, scorer.submit(timed_score_batch, pending)))
+        if ctx.enable_score_filter:
+            prog = SimpleProgress(len(ids), "Scoring")
+            first_score = None
+            futures = {fut: batch for batch, fut in jobs}
+            for fut in as_completed(futures):
+                results, done_at = fut.result()
+                first_score = done_at if first_score is None else min(first_score, done_at)
+                for pid, (s_val, raw_val) in zip(futures[fut], results):
+                    registry.set_score(pid, s_val, raw_val)
+                    yield prog.step()
+            if first_score is not None:
+                yield f"First score ready after {first_score - ctx.started:.1f}s"
+    if (line := ctx.replan(registry.texts(ids), {"generate", "score"})) is not None:
+        yield line
+    return ids
+
+
+def _score_players(ctx: _Run, ids: list[int]):
+    """Score the players not scored while streaming, then escalate those near the cut line."""
+    registry = ctx.registry
+    if not ctx.stream_generation:
+        batches = [ids[i : i + ctx.score_batch_size] for i in range(0, len(ids), ctx.score_batch_size)]
+        with ThreadPoolExecutor(max_workers=ctx.max_workers) as ex:
+            prog = SimpleProgress(len(ids), "Scoring")
+            for batch, results in zip(batches, ex.map(_score_batch, repeat(ctx), batches)):
+                for pid, (s_val, raw_val) in zip(batch, results):
+                    registry.set_score(pid, s_val, raw_val)
+                    yield prog.step()
+    if not ctx.cascade_model:
+        return
+    batches = ctx.escalation_batches({pid: registry.scores[pid] for pid in registry.scored(ids)})
+    if not batches:
+        return
+    yield ctx.escalation_line(batches)
+    with ThreadPoolExecutor(max_workers=ctx.max_workers) as ex:
+        for batch, results in zip(batches, ex.map(_score_batch_one, repeat(ctx), batches, repeat(ctx.cascade_model))):
+            for pid, s_val, raw_val in ctx.rescored(batch, results):
+                registry.set_score(pid, s_val, raw_val)
+
+
+def _score_report(ctx: _Run, ids: list[int], pool: list[int]):
+    registry = ctx.registry
+    # Players without a score verdict are left out of the cut and the scores.
+    ctx.state.scores = {registry.text(pid): registry.scores[pid] for pid in registry.scored(ids)}
+    ctx.state.raw_scores = {
+        registry.text(pid): registry.raw_scores[pid] for pid in ids if registry.raw_scores[pid] is not None
+    }
+    yield "Histogram generated"
+    yield f"Filtered to {len(pool)} players with best scores"
+    for i, (idx, txt) in enumerate(ctx.score_outputs, 1):
+        yield _completion_line(f"Score completion {i}: ", txt, idx)
+
+
+def _judge(ctx: _Run, a: int, b: int, model: str, tie: bool):
+    texts = ctx.registry.text(a), ctx.registry.text(b)
+    return ctx.book_verdict(a, b, ctx.request("pairwise", *ctx.pairwise_call(*texts, model, tie)))
+
+
+def _play(ctx: _Run, a: int, b: int):
+    if (a, b) in ctx.matches:
+        return ctx.matches.get(a, b)
+    try:
+        winners = ctx.fan_out(_judge, [(ctx, *job) for job in ctx.match_jobs(a, b)])
+        if ctx.escalates(winners):
+            winners = ctx.fan_out(_judge, [(ctx, *job) for job in ctx.match_jobs(a, b, escalated=True)])
+            ctx.count_escalation()
+    except BudgetExceeded:
+        # Not played: left out of the table and the ratings.
+        return None
+    winner = ctx.settle(a, b, winners)
+    ctx.matches.record(a, b, winner)
+    return winner
+
+
+def _rate(ctx: _Run, players: list[int], executor):
+    from rating import BradleyTerry
+
+    bt = BradleyTerry(players)
+    rating = {p: 1000.0 for p in players}
+    scheduler = ctx.new_scheduler(players)
+    total = scheduler.expected_matches()
+    if ctx.max_matches > 0:
+        total = min(total, ctx.max_matches)
+    prog = SimpleProgress(total, "Elo matches")
+    played = 0
+    stopped = False
+    stages = getattr(scheduler, "stages", [])
+    while not stopped:
+        pairs = scheduler.next_round(rating)
+        # A group stage is settled once the next one has been drawn.
+        for number, stage in enumerate(stages, 1):
+            if "standings" in stage and number > len(ctx.state.stages):
+                ctx.state.stages.append(_stage_summary(stage))
+                yield _stage_line(number, stage, lambda pid: pid + 1)
+        if ctx.max_matches > 0:
+            pairs = pairs[: ctx.max_matches - played]
+        if not pairs:
+            break
+        futures = {executor.submit(_play, ctx, a, b): (a, b) for a, b in pairs}
+        for fut in as_completed(list(futures)):
+            a, b = futures.pop(fut)
+            winner = fut.result()
+            bt.record(a, b, winner)
+            scheduler.record(a, b, winner)
+            played += 1
+            yield prog.step()
+            if ctx.over_budget() or (ctx.stopper is not None and ctx.stopper.result(bt)):
+                stopped = True
+                break
+        # Matches already running when the run stopped are paid
+        # for: wait for them and count them, cancel the rest.
+        running = {fut: pair for fut, pair in futures.items() if not fut.cancel()}
+        for fut, (a, b) in running.items():
+            winner = fut.result()
+            bt.record(a, b, winner)
+            scheduler.record(a, b, winner)
+            played += 1
+            yield prog.step()
+        # Refit on the accumulated win counts once per round so the
+        # result does not depend on the order matches finished in;
+        # a round shorter than a batch is checked for a stop here.
+        if ctx.stopper is not None and not stopped and played < total:
+            stopped = ctx.stopper.settled(bt)
+        else:
+            bt.fit()
+        rating = bt.as_dict()
+    ctx.rating_err.update(bt.stderr_dict())
+    if stopped and not ctx.over_budget():
+        yield ctx.early_stop_line(total, played)
+    return rating
+
+
+def _rank_one(ctx: _Run, group: list[int], model: str):
+    try:
+        text, _ = ctx.call("pairwise", *ctx.rank_call(ctx.registry.texts(group), model))
+    except BudgetExceeded:
+        return None
+    return ctx.book_ranking(group, text)
+
+
+def _rank(ctx: _Run, group: list[int]) -> list[list[int]]:
+    """The rankings of ``group`` by every pairwise model that gave one."""
+    return [order for order in ctx.fan_out(_rank_one, [(ctx, group, m) for m in ctx.pairwise_models]) if order]
+
+
+def _rate_listwise(ctx: _Run, players: list[int], executor):
+    from rating import plackett_luce
+
+    rating = {p: 1000.0 for p in players}
+    scheduler = make_scheduler(
+        "listwise", players, ctx.num_top_picks, group_size=ctx.rank_group_size, rounds=ctx.rank_rounds
+    )
+    total = scheduler.expected_matches()
+    if ctx.max_matches > 0:
+        total = min(total, ctx.max_matches)
+    prog = SimpleProgress(total, "Rankings")
+    rankings = []
+    calls = 0
+    while True:
+        groups = scheduler.next_round(rating)
+        if ctx.max_matches > 0:
+            groups = groups[: ctx.max_matches - calls]
+        if not groups or ctx.over_budget():
+            break
+        futures = [executor.submit(_rank, ctx, g) for g in groups]
+        for fut in as_completed(futures):
+            for ordered in fut.result():
+                rankings.append(ordered)
+                scheduler.record_ranking(ordered)
+            calls += 1
+            yield prog.step()
+        rating = plackett_luce(players, rankings)
+    return rating
+
+
+def _rate_pool(ctx: _Run, pool: list[int]):
+    """Play the pairwise stage on the threaded path; returns the rating by player id."""
+    from players import MatchTable
+
+    ctx.matches = MatchTable(len(ctx.registry))
+    yield f"Pairwise generating ({ctx.pairing_mode})"
+    with ThreadPoolExecutor(max_workers=ctx.max_workers) as ex:
+        if ctx.pairing_mode == "listwise":
+            return (yield from _rate_listwise(ctx, pool, ex))
+        return (yield from _rate(ctx, pool, ex))
+
+
+def _pairwise_report(ctx: _Run, rating: dict):
+    """Record the ratings and the match outcomes; returns the ids of the top picks."""
+    registry, state = ctx.registry, ctx.state
+    state.rating = {registry.text(pid): r for pid, r in rating.items()}
+    state.rating_err = {registry.text(pid): e for pid, e in ctx.rating_err.items()}
+    if ctx.outcomes:
+        state.pairwise_outcomes = dict(ctx.outcomes)
+        if ctx.outcomes["escalated"]:
+            state.escalations["pairwise"] = ctx.outcomes["escalated"]
+        yield ctx.outcomes_line()
+    top_k = sorted(rating, key=rating.get, reverse=True)[: ctx.num_top_picks]
+    for i, txt in enumerate(ctx.pairwise_outputs, 1):
+        yield _completion_line(f"Pairwise completion {i}: ", txt)
+    return top_k
+
+
+def _final_report(ctx: _Run):
+    state = ctx.state
+    if ctx.parse_failures:
+        state.parse_failures = dict(ctx.parse_failures)
+        yield ctx.parse_failures_line()
+    yield f"Finished after {time.time() - ctx.started:.1f}s"
+    totals = ctx.metrics.totals()
+    if totals.cached_tokens:
+        yield (
+            f"Prompt cache: {totals.cached_tokens} of {totals.prompt_tokens} prompt tokens cached "
+            f"({100 * totals.cached_tokens / max(1, totals.prompt_tokens):.0f}%)"
+        )
+    if ctx.budget is not None:
+        yield ctx.budget.summary()
+    if ctx.shards is not None:
+        yield ctx.shards.summary()
+    if ctx.journal is not None:
+        state.journal = ctx.journal.as_dict()
+        yield ctx.journal.summary()
+    if ctx.judge_cache is not None:
+        yield ctx.judge_cache.stats_str()
+
+
+def _run_async(ctx: _Run):
+    """Run generate → score → pairwise on an asyncio loop in a worker thread.
+
+    Progress messages come back through a queue so this generator keeps
+    yielding UI updates while the loop runs. Returns the ids of the
+    distinct players, the ids of the pool and the rating by id.
+    """
+    import asyncio
+
+    events: queue.Queue = queue.Queue()
+    result = {}
+
+    def worker():
+        try:
+            result["value"] = asyncio.run(_pipeline(ctx, events))
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            events.put(None)
+
+    threading.Thread(target=worker, daemon=True).start()
+    while (msg := events.get()) is not None:
+        yield msg
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+
+async def _pipeline(ctx: _Run, events: queue.Queue):
+    import asyncio
+    from async_pipeline import ConcurrencyLimiter, parse_model_limits, score_and_play
+    from players import MatchTable
+    from rating import BradleyTerry
+
+    registry, stopper = ctx.registry, ctx.stopper
+    limiter = ConcurrencyLimiter(ctx.max_workers, parse_model_limits(ctx.model_concurrency))
+    n_gen = ctx.n_gen
+    generated: list[asyncio.Future] = []
+    # Streaming numbers players by generation: ``ids`` maps those
+    # indices to registry ids and ``duplicates`` holds the copies.
+    duplicates: set[int] = set()
+    if ctx.stream_generation:
+        players = [""] * n_gen
+        ids = [0] * n_gen
+        finished = []
+
+        async def agenerate_one(i):
+            if i < len(ctx.sample):
+                players[i], latency = ctx.sample[i]
+            else:
+                async with limiter.slot(ctx.generate_model):
+                    start = time.perf_counter()
+                    try:
+                        out, _ = await ctx.acall("generate", *ctx.generate_call(1, asynchronous=True))
+                    except BudgetExceeded:
+                        # Left out like a duplicate: never scored or played.
+                        duplicates.add(i)
+                        finished.append(i)
+                        return
+                latency = time.perf_counter() - start
+                players[i] = out[0] if out else ""
+            player, new = registry.add(players[i])
+            ids[i] = player.id
+            if not new:
+                duplicates.add(i)
+            finished.append(i)
+            events.put(_completion_line(f"Completion {i + 1} ({latency:.1f}s): ", players[i], player.id + 1))
+            if len(finished) == n_gen:
+                events.put(f"{n_gen} players generated after {time.time() - ctx.started:.1f}s")
+
+        generated = [asyncio.ensure_future(agenerate_one(i)) for i in range(n_gen)]
+        if not ctx.enable_score_filter:
+            await asyncio.gather(*generated)
+            # Nothing to score, so go on with the distinct players only.
+            ids = list(range(len(registry)))
+            players = registry.texts(ids)
+            duplicates.clear()
+            if (line := ctx.replan(players, {"generate"})) is not None:
+                events.put(line)
+    else:
+        players = [text for text, _ in ctx.sample]
+        if n_gen > len(players):
+            async with limiter.slot(ctx.generate_model):
+                more, _ = await ctx.acall("generate", *ctx.generate_call(n_gen - len(players), asynchronous=True))
+            players += more
+        events.put(f"{len(players)} players generated")
+        for i, p in enumerate(players, 1):
+            events.put(_completion_line(f"Completion {i}: ", p, registry.add(p)[0].id + 1))
+        # Indices are ids from here on.
+        ids = list(range(len(registry)))
+        players = registry.texts(ids)
+        if (line := ctx.replan(players, {"generate"})) is not None:
+            events.put(line)
+
+    score_prog = SimpleProgress(len(players), "Scoring")
+    pool_n = min(ctx.pool_size, len(players)) if ctx.enable_score_filter else len(players)
+    total = ctx.new_scheduler(list(range(pool_n))).expected_matches()
+    match_prog = SimpleProgress(min(total, ctx.max_matches) if ctx.max_matches > 0 else total, "Elo matches")
+    rating: dict[int, float] = {}
+    rating_err: dict[int, float] = {}
+    matches = MatchTable(len(players))
+
+    async def ascore_batch_one(batch, model):
+        async with limiter.slot(model):
+            try:
+                text, _ = await ctx.acall("score", *ctx.score_call([players[i] for i in batch], model, asynchronous=True))
+            except BudgetExceeded:
+                return [(None, None)] * len(batch)
+        results = ctx.book_scores(batch, text)
+        if results is None:
+            singles = await asyncio.gather(*(ascore_batch_one([i], model) for i in batch))
+            return [single[0] for single in singles]
+        return results
+
+    async def ascore_batch(batch):
+        """Scores of the players in ``batch`` keyed by index; duplicates are left out."""
+        if generated:
+            # Streaming: each batch starts as soon as its own players exist.
+            await asyncio.gather(*(generated[i] for i in batch))
+            batch = [i for i in batch if i not in duplicates]
+        if not batch:
+            return {}
+        per_model = await asyncio.gather(*(ascore_batch_one(batch, m) for m in ctx.score_models))
+        return {i: _combine_scores(list(results)) for i, results in zip(batch, zip(*per_model))}
+
+    batch_tasks: dict[int, asyncio.Future] = {}
+
+    async def ascore(i):
+        size = ctx.score_batch_size
+        b = i // size
+        if b not in batch_tasks:
+            batch_tasks[b] = asyncio.ensure_future(ascore_batch(list(range(b * size, min(len(players), (b + 1) * size)))))
+        results = await batch_tasks[b]
+        if i not in results:
+            events.put(score_prog.step())
+            return None
+        avg, raw_vals = results[i]
+        registry.set_score(ids[i], avg, raw_vals)
+        if ctx.stream_generation and score_prog.count == 0:
+            events.put(f"First score ready after {time.time() - ctx.started:.1f}s")
+        events.put(score_prog.step())
+        return avg
+
+    async def ajudge(a, b, model, tie):
+        async with limiter.slot(model):
+            answer = await ctx.arequest("pairwise", *ctx.pairwise_call(players[a], players[b], model, tie, asynchronous=True))
+        return ctx.book_verdict(a, b, answer)
+
+    async def aplay(i, j):
+        if (i, j) not in matches:
+            try:
+                winners = await asyncio.gather(*(ajudge(*job) for job in ctx.match_jobs(i, j)))
+                if ctx.escalates(winners):
+                    winners = await asyncio.gather(*(ajudge(*job) for job in ctx.match_jobs(i, j, escalated=True)))
+                    ctx.count_escalation()
+            except BudgetExceeded:
+                # Not played: left out of the table and the ratings.
+                return None
+            matches.record(i, j, ctx.settle(i, j, winners))
+        return matches.get(i, j)
+
+    def replan_pool():
+        texts = [p for i, p in enumerate(players) if i not in duplicates]
+        if (line := ctx.replan(texts, {"generate", "score"})) is not None:
+            events.put(line)
+        return ctx.pool_size, ctx.max_matches
+
+    async def escalate(scores):
+        """Score the players near the cut line again with the cascade model."""
+        batches = ctx.escalation_batches(scores)
+        if not batches:
+            return
+        events.put(ctx.escalation_line(batches))
+        results = await asyncio.gather(*(ascore_batch_one(batch, ctx.cascade_model) for batch in batches))
+        for batch, batch_results in zip(batches, results):
+            for i, s_val, raw_val in ctx.rescored(batch, batch_results):
+                registry.set_score(ids[i], s_val, raw_val)
+                scores[i] = s_val
+
+    # Matches finished before the pool is known are replayed into the
+    # rating engine once scoring is done.
+    early_results = []
+    engine = {}
+
+    def on_match(i, j, winner):
+        if "bt" in engine:
+            engine["bt"].record(i, j, winner)
+        else:
+            early_results.append((i, j, winner))
+        events.put(match_prog.step())
+
+    def scheduler_for(pool):
+        bt = BradleyTerry(pool)
+        for result in early_results:
+            bt.record(*result)
+        engine["bt"] = bt
+        rating.update(bt.as_dict())
+        engine["scheduler"] = ctx.new_scheduler(pool)
+        return engine["scheduler"]
+
+    def refresh():
+        bt = engine["bt"]
+        bt.fit()
+        rating.update(bt.as_dict())
+        rating_err.update(bt.stderr_dict())
+
+    def should_stop():
+        if ctx.over_budget():
+            return True
+        if stopper is None or "bt" not in engine:
+            return False
+        engine["stopped"] = stopper.result(engine["bt"])
+        return engine["stopped"]
+
+    scores, pool = await score_and_play(
+        len(players),
+        score=ascore if ctx.enable_score_filter else None,
+        # Listwise ranking runs on the threaded path once scoring is done.
+        play=aplay if ctx.enable_pairwise_filter and ctx.pairing_mode != "listwise" else None,
+        on_match=on_match,
+        make_scheduler=scheduler_for,
+        rating=rating,
+        pool_size=ctx.pool_size,
+        max_matches=ctx.max_matches,
+        eager=ctx.pairing_mode == "round_robin",
+        refresh=refresh,
+        should_stop=should_stop,
+        rescore=escalate if ctx.cascade_model else None,
+        # Streamed players are only all known once they are scored.
+        replan=replan_pool if ctx.stream_generation and ctx.enable_score_filter and ctx.planner is not None else None,
+    )
+    if engine.get("stopped") and not ctx.over_budget():
+        events.put(ctx.early_stop_line(match_prog.total, match_prog.count))
+    for number, stage in enumerate(getattr(engine.get("scheduler"), "stages", []), 1):
+        if "standings" in stage:
+            events.put(_stage_line(number, stage, lambda i: ids[i] + 1))
+            ctx.state.stages.append(_stage_summary(stage))
+    ctx.rating_err = {ids[i]: e for i, e in rating_err.items()}
+    return (
+        [pid for i, pid in enumerate(ids) if i not in duplicates],
+        [ids[i] for i in pool],
+        {ids[i]: rating.get(i, 1000.0) for i in pool},
+    )
+
+
+def run(*args, on_log=None, **kwargs) -> TournamentState:
+    """Run :func:`tournament` to completion and return its state.
+
+    ``on_log(msg)``, when given, is called with every progress message.
+    """
+    steps = tournament(*args, **kwargs)
+    while True:
+        try:
+            msg = next(steps)
+        except StopIteration as stop:
+            return stop.value
+        if on_log is not None:
+            on_log(msg)
@@ -0,0 +1,171 @@
+"""Append-only journal of the model calls of a tournament, to resume or replay it.
+
+Every generation, score, pairwise and ranking call a tournament completes
+is appended to a JSONL file as one event: a hash of the request, the stage,
+the model and the answer text with its usage. A tournament started again
+with the same journal takes the answers of recorded calls from it instead
+of paying for them again, so a run that died half way resumes where it
+stopped. Identical requests, such as the one-player generation requests of
+stream generation, are answered in the order they were recorded; pairwise
+calls match whichever order the two players are shown in.
+
+In ``replay`` mode no model is called at all and nothing is written: calls
+the journal holds no answer for are refused like calls over a budget. A
+finished run can so be rated again offline under other settings (another
+pairing mode, pool size, number of top picks or early stop) from the
+verdicts it already paid for.
+
+Events are flushed as they are written, so they survive the process; a
+line cut short by a crash is skipped when the journal is read back.
+"""
+import hashlib, json, os, threading, time
+from collections import defaultdict, deque
+
+import tournament_utils
+from budget import BudgetExceeded
+from metrics import plain_usage
+
+
+JOURNAL_MODES = ("resume", "replay")
+# Keyword arguments that do not change the answer to a call.
+LOCAL_KWARGS = ("api_base", "api_key", "cache", "return_usage")
+# Calls that show two players, in the order of their third and fourth arguments.
+PAIRWISE_CALLS = ("prompt_pairwise",)
+
+
+class NotJournaled(BudgetExceeded):
+    """A replay needed the answer to a call the journal does not hold."""
+
+
+def call_name(fn) -> str:
+    """Name of a :mod:`tournament_utils` call; async variants share it with the sync one."""
+    name = fn.__name__
+    if name.startswith("a") and hasattr(tournament_utils, name[1:]):
+        return name[1:]
+    return name
+
+
+def call_key(fn, args, kwargs) -> tuple[str, bool]:
+    """Journal key of a call and whether the players of a pairwise call were swapped for it.
+
+    The two players of a pairwise call are put in a fixed order first, so a
+    match is found again when the resumed run shows them the other way round.
+    """
+    name = call_name(fn)
+    args = list(args)
+    swapped = name in PAIRWISE_CALLS and args[3] < args[2]
+    if swapped:
+        args[2], args[3] = args[3], args[2]
+    fields = {k: v for k, v in kwargs.items() if k not in LOCAL_KWARGS}
+    payload = json.dumps([name, args, fields], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest(), swapped
+
+
+class Journal:
+    """The call events of one tournament in a JSONL file.
+
+    ``take`` hands out the recorded answer of a call (each one once) and
+    ``record`` appends the answer of a call that was made. Both are safe to
+    use from several threads.
+    """
+
+    def __init__(self, path: str, mode: str = "resume"):
+        if mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.replayed = 0
+        self.recorded = 0
+        self.refused = 0
+        self._answers: dict[str, deque] = defaultdict(deque)
+        self._lock = threading.Lock()
+        self._file = None
+        if os.path.exists(path):
+            self._load()
+        elif mode == "replay":
+            raise FileNotFoundError(f"No journal to replay at {path}")
+        if mode == "resume":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "a+", encoding="utf-8")
+            # Start on a fresh line after a write the last run did not finish.
+            if self._file.tell() and not self._ends_with_newline():
+                self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if event.get("event") == "call":
+                    self._answers[event["key"]].append(event)
+
+    def __len__(self) -> int:
+        """Recorded answers not taken yet."""
+        with self._lock:
+            return sum(map(len, self._answers.values()))
+
+    def _write(self, event: dict) -> None:
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def start(self, instruction: str) -> None:
+        """Mark the start of a run; it makes the journal easier to read, replays skip it."""
+        if self._file is not None:
+            self._write({"event": "run", "instruction": instruction, "time": time.time()})
+
+    def take(self, key: tuple[str, bool]):
+        """The recorded answer for ``key`` as ``(text, usage, swapped)``, or ``None`` if there is none left.
+
+        ``swapped`` tells that the answer was given with the two players of a
+        pairwise call the other way round; the text is handed back as it was
+        written, so the caller swaps the verdict it reads from it. In replay
+        mode a call without an answer raises :class:`NotJournaled`.
+        """
+        digest, swapped = key
+        with self._lock:
+            answers = self._answers.get(digest)
+            if answers:
+                event = answers.popleft()
+                self.replayed += 1
+                return event["text"], event.get("usage"), event.get("swapped", False) != swapped
+            if self.mode == "replay":
+                self.refused += 1
+        if self.mode == "replay":
+            raise NotJournaled("The journal holds no answer for this call")
+        return None
+
+    def record(self, key: tuple[str, bool], stage: str, model: str, text, usage=None) -> None:
+        """Append the answer to a call that was made."""
+        if self._file is None:
+            return
+        digest, swapped = key
+        event = {"event": "call", "key": digest, "stage": stage, "model": model, "text": text}
+        if swapped:
+            event["swapped"] = True
+        if usage := plain_usage(usage):
+            event["usage"] = usage
+        self._write(event)
+        with self._lock:
+            self.recorded += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def as_dict(self) -> dict:
+        return {"replayed": self.replayed, "recorded": self.recorded, "refused": self.refused}
+
+    def summary(self) -> str:
+        if self.mode == "replay":
+            return f"Journal: {self.replayed} calls replayed, {self.refused} refused (not in the journal)"
+        return f"Journal: {self.replayed} calls replayed, {self.recorded} recorded in {self.path}"
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class JudgeCache:
+    """Content-addressed on-disk cache for judge completions.
+
+    Entries live in a SQLite file opened in WAL mode, so several threads and
+    worker processes can share one cache. Every thread gets its own
+    connection. Entries older than ``ttl`` seconds are ignored and removed,
+    and the least recently used entries are evicted once the cache holds
+    more than ``max_entries`` rows.
+    """
+
+    EVICT_EVERY = 64
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: float | None = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS judge_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS judge_cache_accessed ON judge_cache (accessed)")
+        self.evict()
+
+    @staticmethod
+    def key(**fields) -> str:
+        """Hash the request fields into a stable cache key."""
+        payload = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> str | None:
+        conn = self._conn()
+        row = conn.execute("SELECT value, created FROM judge_cache WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+            self._count(False)
+            return None
+        conn.execute("UPDATE judge_cache SET accessed = ? WHERE key = ?", (now, key))
+        self._count(True)
+        return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO judge_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+            (key, value, now, now),
+        )
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries and trim the cache to ``max_entries``."""
+        conn = self._conn()
+        if self.ttl is not None:
+            conn.execute("DELETE FROM judge_cache WHERE created < ?", (time.time() - self.ttl,))
+        if self.max_entries and self.max_entries > 0:
+            conn.execute(
+                "DELETE FROM judge_cache WHERE key IN ("
+                "SELECT key FROM judge_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM judge_cache").fetchone()[0]
+
+    def stats_str(self) -> str:
+        return f"Judge cache: {self.hits} hits, {self.misses} misses"
@@ -1,73 +1,95 @@
 from dotenv import load_dotenv
 load_dotenv("./local.env",override=True)
-import os, json, re, ast, gradio as gr
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os, queue, threading, time
+from collections import deque
 from tqdm import tqdm
-import matplotlib.pyplot as plt
-from tournament_utils import generate_players, prompt_score, prompt_pairwise
-import time
+from pairing import PAIRING_MODES
+from tournament_utils import PROMPT_LAYOUTS
+from journal import JOURNAL_MODES
+import charts
+from engine import (
+    TournamentState,
+    tournament,
+    NUM_TOP_PICKS_DEFAULT,
+    POOL_SIZE_DEFAULT,
+    MAX_WORKERS_DEFAULT,
+    NUM_GENERATIONS_DEFAULT,
+    API_BASE_DEFAULT,
+    SCORE_FILTER_DEFAULT,
+    PAIRWISE_FILTER_DEFAULT,
+    GENERATE_MODEL_DEFAULT,
+    SCORE_MODEL_DEFAULT,
+    PAIRWISE_MODEL_DEFAULT,
+    GENERATE_TEMPERATURE_DEFAULT,
+    SCORE_TEMPERATURE_DEFAULT,
+    PAIRWISE_TEMPERATURE_DEFAULT,
+    SCORE_WITH_INSTRUCTION_DEFAULT,
+    PAIRWISE_WITH_INSTRUCTION_DEFAULT,
+    GENERATE_THINKING_DEFAULT,
+    SCORE_THINKING_DEFAULT,
+    PAIRWISE_THINKING_DEFAULT,
+    PAIRING_MODE_DEFAULT,
+    MAX_MATCHES_DEFAULT,
+    ASYNC_PIPELINE_DEFAULT,
+    MODEL_CONCURRENCY_DEFAULT,
+    RANK_GROUP_SIZE_DEFAULT,
+    RANK_ROUNDS_DEFAULT,
+    EARLY_STOP_CONFIDENCE_DEFAULT,
+    SCORE_BATCH_SIZE_DEFAULT,
+    JUDGE_CACHE_PATH_DEFAULT,
+    STREAM_GENERATION_DEFAULT,
+    PROMPT_LAYOUT_DEFAULT,
+    PAIRWISE_ORDER_DEFAULT,
+    PAIRWISE_ORDERS,
+    DEDUP_THRESHOLD_DEFAULT,
+    TOKEN_BUDGET_DEFAULT,
+    COST_BUDGET_DEFAULT,
+    LATENCY_TARGET_DEFAULT,
+    CASCADE_MODEL_DEFAULT,
+    CASCADE_MARGIN_DEFAULT,
+    SHARD_JOBS_PATH_DEFAULT,
+    SHARD_WORKERS_DEFAULT,
+    GROUP_STAGE_SIZE_DEFAULT,
+    GROUP_ADVANCE_DEFAULT,
+    STRUCTURED_VERDICTS_DEFAULT,
+    JOURNAL_PATH_DEFAULT,
+    JOURNAL_MODE_DEFAULT,
+    CRITERIA_DEFAULT,
+)
 
+LOG_MAX_LINES = int(os.getenv("LOG_MAX_LINES", 2000))
+UI_REFRESH_INTERVAL = float(os.getenv("UI_REFRESH_INTERVAL", 0.25))
+TOP_PICKS_SEPARATOR = "\n\n\n=====================================================\n\n\n"
 
-class SimpleProgress:
-    """Minimal progress helper to compute ETA."""
 
-    def __init__(self, total: int, prefix: str = "Progress"):
-        self.total = total
-        self.prefix = prefix
-        self.start = time.time()
-        self.count = 0
+def format_top_picks(state: TournamentState) -> str:
+    if state.rating is None:
+        return TOP_PICKS_SEPARATOR.join(state.top_picks)
+    return TOP_PICKS_SEPARATOR.join(
+        f"{p}\nElo: {state.rating[p]:.1f}"
+        + (f" ± {1.96 * state.rating_err[p]:.1f}" if p in state.rating_err else "")
+        + (f"\nScore: {state.raw_scores.get(p)}" if p in state.raw_scores else "")
+        + (f"\nGenerated {state.multiplicity[p]} times" if state.multiplicity.get(p, 1) > 1 else "")
+        for p in state.top_picks
+    )
 
-    def step(self) -> str:
-        self.count += 1
-        elapsed = time.time() - self.start
-        remaining = (elapsed / self.count) * (self.total - self.count) if self.count else 0
-        h, rem = divmod(int(remaining), 3600)
-        m, s = divmod(rem, 60)
-        if h:
-            eta = f"{h:d}:{m:02d}:{s:02d}"
-        else:
-            eta = f"{m:02d}:{s:02d}"
-        return f"{self.prefix} {self.count}/{self.total} - ETA {eta}"
 
-NUM_TOP_PICKS_DEFAULT = int(os.getenv("NUM_TOP_PICKS", 3))
-POOL_SIZE_DEFAULT = int(os.getenv("POOL_SIZE", 6))
-MAX_WORKERS_DEFAULT = int(os.getenv("MAX_WORKERS", 100))
-NUM_GENERATIONS_DEFAULT = int(os.getenv("NUM_GENERATIONS", 10))
-API_BASE_DEFAULT = os.getenv("OPENAI_API_BASE", "")
-API_TOKEN_DEFAULT = os.getenv("OPENAI_API_KEY", "")
-SCORE_FILTER_DEFAULT = os.getenv("ENABLE_SCORE_FILTER", "true").lower() == "true"
-PAIRWISE_FILTER_DEFAULT = os.getenv("ENABLE_PAIRWISE_FILTER", "true").lower() == "true"
-GENERATE_MODEL_DEFAULT = os.getenv("GENERATE_MODEL", "gpt-4o-mini")
-SCORE_MODEL_DEFAULT = os.getenv("SCORE_MODEL", "gpt-4o-mini")
-PAIRWISE_MODEL_DEFAULT = os.getenv("PAIRWISE_MODEL", "gpt-4o-mini")
-GENERATE_TEMPERATURE_DEFAULT = float(os.getenv("GENERATE_TEMPERATURE", "0.9"))
-SCORE_TEMPERATURE_DEFAULT = float(os.getenv("SCORE_TEMPERATURE", "0.6"))
-PAIRWISE_TEMPERATURE_DEFAULT = float(os.getenv("PAIRWISE_TEMPERATURE", "0.6"))
-SCORE_WITH_INSTRUCTION_DEFAULT = os.getenv("PASS_INSTRUCTION_TO_SCORE", "true").lower() == "true"
-PAIRWISE_WITH_INSTRUCTION_DEFAULT = os.getenv("PASS_INSTRUCTION_TO_PAIRWISE", "true").lower() == "true"
-GENERATE_THINKING_DEFAULT = os.getenv("ENABLE_GENERATE_THINKING", "false").lower() == "true"
-SCORE_THINKING_DEFAULT = os.getenv("ENABLE_SCORE_THINKING", "false").lower() == "true"
-PAIRWISE_THINKING_DEFAULT = os.getenv("ENABLE_PAIRWISE_THINKING", "false").lower() == "true"
-CRITERIA_DEFAULT = "Factuality,Concise,Precision"
+class LogBuffer:
+    """The last ``max_lines`` lines of the process log (all of them if ``max_lines <= 0``)."""
 
-# Regex used to capture the final verdict from judge output
-FINAL_VERDICT_RE = re.compile(r"(?im)^final verdict:\s*(.*)$")
+    def __init__(self, max_lines: int = LOG_MAX_LINES):
+        self.lines: deque[str] = deque(maxlen=max_lines if max_lines > 0 else None)
+        self.total = 0
 
+    def append(self, line: str) -> None:
+        self.lines.append(line)
+        self.total += 1
+
+    def render(self, *extra: str) -> str:
+        dropped = self.total - len(self.lines)
+        head = [f"… {dropped} earlier lines not shown (the console has the full log)"] if dropped else []
+        return "\n".join([*head, *self.lines, *extra])
 
-def _parse_verdict(txt: str) -> dict:
-    """Extract verdict information from judge output."""
-    txt = re.sub(r"^```.*?\n|```$", "", txt, flags=re.DOTALL).strip()
-    match = FINAL_VERDICT_RE.search(txt)
-    if not match:
-        return {}
-    verdict = match.group(1).strip()
-    try:
-        verdict_val = ast.literal_eval(verdict)
-    except Exception:
-        verdict_val = verdict
-    if isinstance(verdict_val, list):
-        return {"scores": verdict_val}
-    return {"winner": str(verdict_val)}
 
 def run_tournament(
     api_base,
@@ -93,268 +115,198 @@ def run_tournament(
     pairwise_thinking,
     score_explain=None,
     pairwise_explain=None,
+    pairing_mode=None,
+    max_matches=None,
+    use_async=None,
+    model_concurrency=None,
+    judge_cache_path=None,
+    score_batch_size=None,
+    rank_group_size=None,
+    rank_rounds=None,
+    early_stop_confidence=None,
+    stream_generation=None,
+    prompt_layout=None,
+    pairwise_order=None,
+    dedup_threshold=None,
+    token_budget=None,
+    cost_budget=None,
+    latency_target=None,
+    cascade_model=None,
+    cascade_margin=None,
+    shard_jobs=None,
+    shard_workers=None,
+    group_stage_size=None,
+    group_advance=None,
+    structured_verdicts=None,
+    journal_path=None,
+    journal_mode=None,
 ):
-    instruction = instruction_input.strip()
-    criteria_list = [c.strip() for c in criteria_input.split(",") if c.strip()] or ["Factuality", "Instruction Following", "Precision"]
-    n_gen = int(n_gen)
-    num_top_picks = int(num_top_picks)
-    pool_size = int(pool_size)
-    max_workers = int(max_workers)
-    if generate_temperature is None:
-        generate_temperature = GENERATE_TEMPERATURE_DEFAULT
-    if score_temperature is None:
-        score_temperature = SCORE_TEMPERATURE_DEFAULT
-    if pairwise_temperature is None:
-        pairwise_temperature = PAIRWISE_TEMPERATURE_DEFAULT
-    if not api_base:
-        api_base = API_BASE_DEFAULT
-    if not api_token:
-        api_token = API_TOKEN_DEFAULT
-    if not generate_model:
-        generate_model = GENERATE_MODEL_DEFAULT
-    if not score_model:
-        score_model = SCORE_MODEL_DEFAULT
-    if not pairwise_model:
-        pairwise_model = PAIRWISE_MODEL_DEFAULT
-    enable_score_filter = bool(enable_score_filter)
-    enable_pairwise_filter = bool(enable_pairwise_filter)
-    if score_with_instruction is None:
-        score_with_instruction = SCORE_WITH_INSTRUCTION_DEFAULT
-    if pairwise_with_instruction is None:
-        pairwise_with_instruction = PAIRWISE_WITH_INSTRUCTION_DEFAULT
-    if generate_thinking is None:
-        generate_thinking = GENERATE_THINKING_DEFAULT
-    if score_thinking is None:
-        score_thinking = SCORE_THINKING_DEFAULT
-    if pairwise_thinking is None:
-        pairwise_thinking = PAIRWISE_THINKING_DEFAULT
-    if score_explain is None:
-        score_explain = False
-    if pairwise_explain is None:
-        pairwise_explain = False
-
-    process_log = []
-    hist_fig = None
-    elo_fig = None
-    top_picks_str = ""
-    prompt_tokens = 0
-    completion_tokens = 0
-    score_outputs: list[str] = []
-    raw_scores: dict[str, list] = {}
-    pairwise_outputs: list[str] = []
-    match_cache: dict[tuple[str, str], str] = {}
+    """Gradio adapter around :func:`engine.tournament`.
 
-    def add_usage(usage):
-        nonlocal prompt_tokens, completion_tokens
-        if not usage:
-            return
-        pt = getattr(usage, "prompt_tokens", None)
-        if pt is None and isinstance(usage, dict):
-            pt = usage.get("prompt_tokens")
-        ct = getattr(usage, "completion_tokens", None)
-        if ct is None and isinstance(usage, dict):
-            ct = usage.get("completion_tokens")
-        if pt:
-            prompt_tokens += pt
-        if ct:
-            completion_tokens += ct
+    Takes the values of the interface's inputs, in their order, and hands
+    them to the engine. Yields ``(log, histogram, elo chart, top picks,
+    token usage)`` after every progress message. Each chart is rendered on
+    the shared chart thread (see :mod:`charts`) once its stage is done and
+    appears with the first message after it is ready.
+    """
+    settings = dict(locals())
+    state = TournamentState()
+    log = LogBuffer(LOG_MAX_LINES)
+    hist_fig = elo_fig = None
+    hist_job = elo_job = None
+    last_refresh = None
 
-    def usage_str():
-        return (
-            f"Prompt tokens: {prompt_tokens}\n"
-            f"Completion tokens: {completion_tokens}\n"
-            f"Total tokens: {prompt_tokens + completion_tokens}"
-        )
+    def draw(wait: bool = False) -> bool:
+        """Start rendering the charts whose stage just finished; return ``True`` if one became ready."""
+        nonlocal hist_fig, elo_fig, hist_job, elo_job
+        if hist_job is None and state.scores is not None:
+            hist_job = charts.submit(charts.histogram_data(list(state.scores.values())))
+        if elo_job is None and state.rating is not None:
+            elo_job = charts.submit(charts.elo_data(state.rating, state.rating_err))
+        ready = False
+        if hist_fig is None and hist_job is not None and (wait or hist_job.done()):
+            hist_fig, ready = hist_job.result(), True
+        if elo_fig is None and elo_job is not None and (wait or elo_job.done()):
+            elo_fig, ready = elo_job.result(), True
+        return ready
 
-    def log_completion(prefix: str, text: str, player_id: int | None = None):
-        disp = text.replace("\n", " ")
-        if len(disp) > 1000:
-            disp = disp[:1000] + "…"
-        if player_id is not None:
-            prefix = f"{prefix}(ID {player_id}) "
-        return log(f"{prefix}{disp}")
-    def log(msg):
-        process_log.append(msg)
-        tqdm.write(msg)
-        yield "\n".join(process_log), hist_fig, elo_fig, top_picks_str, usage_str()
-    yield from log("Generating answers …")
-    all_players, usage = generate_players(
-        instruction,
-        n_gen,
-        model=generate_model,
-        api_base=api_base,
-        api_key=api_token,
-        temperature=generate_temperature,
-        thinking=generate_thinking,
-        return_usage=True,
-    )
-    add_usage(usage)
-    yield from log(f"{len(all_players)} players generated")
-    for i, p in enumerate(all_players, 1):
-        yield from log_completion(f"Completion {i}: ", p, i)
-    def criteria_block():
-        return "\n".join(f"{i + 1}) {c}" for i, c in enumerate(criteria_list))
+    # The tournament runs on a worker thread so a refresh held back by the
+    # throttle is still sent once the interval is over, even when the next
+    # message is a slow step away.
+    events: queue.Queue = queue.Queue()
+    result = {}
+    stop = threading.Event()
 
-    if enable_score_filter:
-        players_with_ids = list(enumerate(all_players, 1))
+    def worker():
+        steps = tournament(**settings, state=state)
+        try:
+            for msg in steps:
+                events.put(msg)
+                if stop.is_set():
+                    break
+        except BaseException as e:
+            result["error"] = e
+        finally:
+            # Closing the generator here lets a cancelled run release what it holds.
+            steps.close()
+            events.put(None)
 
-        def score(item):
-            idx, player = item
-            text, usage = prompt_score(
-                instruction,
-                criteria_list,
-                criteria_block(),
-                player,
-                model=score_model,
-                api_base=api_base,
-                api_key=api_token,
-                temperature=score_temperature,
-                include_instruction=score_with_instruction,
-                thinking=score_thinking,
-                explain=score_explain,
-                return_usage=True,
-            )
-            add_usage(usage)
-            score_outputs.append((idx, text))
-            data = _parse_verdict(text)
-            raw_vals = None
-            if "scores" in data and isinstance(data["scores"], list):
-                raw_vals = data["scores"]
-                avg = sum(raw_vals) / len(raw_vals) if raw_vals else 0.0
+    threading.Thread(target=worker, daemon=True).start()
+    pending = False
+    try:
+        while True:
+            # Every refresh re-sends the whole Process box, so refresh at most
+            # once per interval instead of once per message.
+            timeout = max(0.0, last_refresh + UI_REFRESH_INTERVAL - time.monotonic()) if pending else None
+            try:
+                msg = events.get(timeout=timeout)
+            except queue.Empty:
+                draw()
+                last_refresh, pending = time.monotonic(), False
+                yield log.render(), hist_fig, elo_fig, "", state.usage_str()
+                continue
+            if msg is None:
+                break
+            new_chart = draw()
+            log.append(msg)
+            tqdm.write(msg)
+            now = time.monotonic()
+            if new_chart or last_refresh is None or now - last_refresh >= UI_REFRESH_INTERVAL:
+                last_refresh, pending = now, False
+                yield log.render(), hist_fig, elo_fig, "", state.usage_str()
             else:
-                try:
-                    avg = float(data.get("score", 0))
-                    raw_vals = [avg]
-                except Exception:
-                    avg = 0.0
-                    raw_vals = None
-            return avg, raw_vals
+                pending = True
+    finally:
+        stop.set()
+    if "error" in result:
+        raise result["error"]
+    draw(wait=True)
+    yield log.render("Done"), hist_fig, elo_fig, format_top_picks(state), state.usage_str()
 
-        yield from log("Histogram generating")
-        with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            prog = SimpleProgress(len(all_players), "Scoring")
-            scores = {}
-            for (idx, p), (s_val, raw_val) in zip(players_with_ids, ex.map(score, players_with_ids)):
-                scores[p] = s_val
-                if raw_val is not None:
-                    raw_scores[p] = raw_val
-                yield from log(prog.step())
-        hist_fig = plt.figure()
-        plt.hist(list(scores.values()), bins=10)
-        yield from log("Histogram generated")
-        top_players = sorted(all_players, key=scores.get, reverse=True)[:pool_size]
-        yield from log(f"Filtered to {len(top_players)} players with best scores")
-        for i, (idx, txt) in enumerate(score_outputs, 1):
-            yield from log_completion(f"Score completion {i}: ", txt, idx)
-    else:
-        top_players = all_players
-    if enable_pairwise_filter:
-        def play(a, b):
-            key = tuple(sorted((a, b)))
-            if key in match_cache:
-                return match_cache[key]
-            text, usage = prompt_pairwise(
-                instruction,
-                criteria_block(),
-                a,
-                b,
-                model=pairwise_model,
-                api_base=api_base,
-                api_key=api_token,
-                temperature=pairwise_temperature,
-                include_instruction=pairwise_with_instruction,
-                thinking=pairwise_thinking,
-                explain=pairwise_explain,
-                return_usage=True,
-            )
-            add_usage(usage)
-            pairwise_outputs.append(text)
-            winner_label = _parse_verdict(text).get("winner", "A")
-            winner = a if winner_label == "A" else b
-            match_cache[key] = winner
-            return winner
 
-        def all_pairs(players):
-            for i in range(len(players)):
-                for j in range(i + 1, len(players)):
-                    yield players[i], players[j]
+def chart_output(gr, label: str):
+    """The output component showing charts of the configured ``CHART_FORMAT``."""
+    if charts.CHART_FORMAT_DEFAULT == "json":
+        return gr.JSON(label=label)
+    if charts.CHART_FORMAT_DEFAULT == "svg":
+        return gr.HTML(label=label)
+    return gr.Plot(label=label)
 
-        def rate(players, executor):
-            rating = {p: 1000.0 for p in players}
-            pairs = list(all_pairs(players))
-            futures = {executor.submit(play, a, b): (a, b) for a, b in pairs}
-            prog = SimpleProgress(len(futures), "Elo matches")
-            K = 32
-            for fut in as_completed(futures):
-                a, b = futures[fut]
-                winner = fut.result()
-                loser = b if winner == a else a
-                ra, rb = rating[a], rating[b]
-                ea = 1 / (1 + 10 ** ((rb - ra) / 400))
-                eb = 1 - ea
-                if winner == a:
-                    rating[a] = ra + K * (1 - ea)
-                    rating[b] = rb + K * (0 - eb)
-                else:
-                    rating[a] = ra + K * (0 - ea)
-                    rating[b] = rb + K * (1 - eb)
-                yield from log(prog.step())
-            return rating
 
-        yield from log("Pairwise generating")
-        with ThreadPoolExecutor(max_workers=max_workers) as ex:
-            rating = yield from rate(top_players, ex)
-        elo_fig = plt.figure()
-        players_sorted = sorted(rating, key=rating.get, reverse=True)
-        plt.bar(range(len(players_sorted)), [rating[p] for p in players_sorted])
-        plt.xticks(range(len(players_sorted)), [str(i + 1) for i in range(len(players_sorted))])
-        top_k = players_sorted[:num_top_picks]
-        for i, txt in enumerate(pairwise_outputs, 1):
-            yield from log_completion(f"Pairwise completion {i}: ", txt)
-        top_picks_str = "\n\n\n=====================================================\n\n\n".join(
-            f"{p}\nElo: {rating[p]:.1f}" + (f"\nScore: {raw_scores.get(p)}" if p in raw_scores else "") for p in top_k
-        )
-    else:
-        top_k = top_players[:num_top_picks]
-        top_picks_str = "\n\n\n=====================================================\n\n\n".join(top_k)
-    yield "\n".join(process_log + ["Done"]), hist_fig, elo_fig, top_picks_str, usage_str()
+def build_demo():
+    """Build the Gradio interface (only the app needs it, not the engine)."""
+    import gradio as gr
+
+    return gr.Interface(
+        fn=run_tournament,
+        inputs=[
+            gr.Textbox(value=API_BASE_DEFAULT, label="API Base Path"),
+            gr.Textbox(value="", label="API Token", type="password"),
+            gr.Textbox(value=GENERATE_MODEL_DEFAULT, label="Generation Model"),
+            gr.Textbox(value=SCORE_MODEL_DEFAULT, label="Score Model (comma separated for an ensemble)"),
+            gr.Textbox(value=PAIRWISE_MODEL_DEFAULT, label="Pairwise Model (comma separated for an ensemble)"),
+            gr.Number(value=GENERATE_TEMPERATURE_DEFAULT, label="Generation Temperature"),
+            gr.Number(value=SCORE_TEMPERATURE_DEFAULT, label="Score Temperature"),
+            gr.Number(value=PAIRWISE_TEMPERATURE_DEFAULT, label="Pairwise Temperature"),
+            gr.Textbox(lines=10, label="Instruction"),
+            gr.Textbox(value=CRITERIA_DEFAULT, lines=5, label="Criteria (comma separated)"),
+            gr.Number(value=NUM_GENERATIONS_DEFAULT, label="Number of Generations"),
+            gr.Number(value=POOL_SIZE_DEFAULT, label="Top Picks Score Filter"),
+            gr.Number(value=NUM_TOP_PICKS_DEFAULT, label="Top Picks Pairwise"),
+            gr.Number(value=MAX_WORKERS_DEFAULT, label="Max Workers"),
+            gr.Checkbox(value=SCORE_FILTER_DEFAULT, label="Enable Score Filter"),
+            gr.Checkbox(value=PAIRWISE_FILTER_DEFAULT, label="Enable Pairwise Filter"),
+            gr.Checkbox(value=SCORE_WITH_INSTRUCTION_DEFAULT, label="Pass Instruction to Score Model"),
+            gr.Checkbox(value=PAIRWISE_WITH_INSTRUCTION_DEFAULT, label="Pass Instruction to Pairwise Model"),
+            gr.Checkbox(value=GENERATE_THINKING_DEFAULT, label="Enable Thinking (Generate)"),
+            gr.Checkbox(value=SCORE_THINKING_DEFAULT, label="Enable Thinking (Score)"),
+            gr.Checkbox(value=PAIRWISE_THINKING_DEFAULT, label="Enable Thinking (Pairwise)"),
+            gr.Checkbox(value=False, label="Enable Explain (Score)"),
+            gr.Checkbox(value=False, label="Enable Explain (Pairwise)"),
+            gr.Dropdown(choices=list(PAIRING_MODES), value=PAIRING_MODE_DEFAULT, label="Pairing Mode"),
+            gr.Number(value=MAX_MATCHES_DEFAULT, label="Max Matches (0 = unlimited)"),
+            gr.Checkbox(value=ASYNC_PIPELINE_DEFAULT, label="Async Pipeline"),
+            gr.Textbox(value=MODEL_CONCURRENCY_DEFAULT, label="Per-model Concurrency (model=limit, …)"),
+            gr.Textbox(value=JUDGE_CACHE_PATH_DEFAULT, label="Judge Cache Path (blank = disabled)"),
+            gr.Number(value=SCORE_BATCH_SIZE_DEFAULT, label="Score Batch Size"),
+            gr.Number(value=RANK_GROUP_SIZE_DEFAULT, label="Listwise Group Size"),
+            gr.Number(value=RANK_ROUNDS_DEFAULT, label="Listwise Rounds"),
+            gr.Number(value=EARLY_STOP_CONFIDENCE_DEFAULT, label="Early Stop Confidence (0 = off)"),
+            gr.Checkbox(value=STREAM_GENERATION_DEFAULT, label="Stream Generation"),
+            gr.Dropdown(choices=list(PROMPT_LAYOUTS), value=PROMPT_LAYOUT_DEFAULT, label="Judge Prompt Layout"),
+            gr.Dropdown(choices=list(PAIRWISE_ORDERS), value=PAIRWISE_ORDER_DEFAULT, label="Pairwise Order"),
+            gr.Number(value=DEDUP_THRESHOLD_DEFAULT, label="Near-duplicate Threshold (0 = exact only)"),
+            gr.Number(value=TOKEN_BUDGET_DEFAULT, label="Token Budget (0 = unlimited)"),
+            gr.Number(value=COST_BUDGET_DEFAULT, label="Cost Budget in USD (0 = unlimited)"),
+            gr.Number(value=LATENCY_TARGET_DEFAULT, label="Latency Target in Seconds (0 = none)"),
+            gr.Textbox(value=CASCADE_MODEL_DEFAULT, label="Cascade Judge Model (blank = no cascade)"),
+            gr.Number(value=CASCADE_MARGIN_DEFAULT, label="Cascade Score Margin"),
+            gr.Textbox(value=SHARD_JOBS_PATH_DEFAULT, label="Shard Job Table (blank = judge in this process)"),
+            gr.Number(value=SHARD_WORKERS_DEFAULT, label="Local Shard Worker Processes"),
+            gr.Number(value=GROUP_STAGE_SIZE_DEFAULT, label="Group Stage Size"),
+            gr.Number(value=GROUP_ADVANCE_DEFAULT, label="Players Advancing per Group"),
+            gr.Checkbox(value=STRUCTURED_VERDICTS_DEFAULT, label="Structured (JSON) Verdicts"),
+            gr.Textbox(value=JOURNAL_PATH_DEFAULT, label="Event Journal Path (blank = disabled)"),
+            gr.Dropdown(choices=list(JOURNAL_MODES), value=JOURNAL_MODE_DEFAULT, label="Journal Mode"),
+        ],
+        outputs=[
+            gr.Textbox(lines=10, label="Process"),
+            chart_output(gr, "Score Distribution"),
+            chart_output(gr, "Elo Ratings"),
+            gr.Textbox(lines=50, label="Top picks"),
+            gr.Textbox(lines=5, label="Token Usage"),
+        ],
+        description="Generate multiple completions and use score and pairwise filters to find the best answers.",
+    )
+
+
+def __getattr__(name):
+    # ``gradio main.py`` and older callers look up ``main.demo``; build it on first access.
+    if name == "demo":
+        globals()["demo"] = build_demo()
+        return globals()["demo"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-demo = gr.Interface(
-    fn=run_tournament,
-    inputs=[
-        gr.Textbox(value=API_BASE_DEFAULT, label="API Base Path"),
-        gr.Textbox(value="", label="API Token", type="password"),
-        gr.Textbox(value=GENERATE_MODEL_DEFAULT, label="Generation Model"),
-        gr.Textbox(value=SCORE_MODEL_DEFAULT, label="Score Model"),
-        gr.Textbox(value=PAIRWISE_MODEL_DEFAULT, label="Pairwise Model"),
-        gr.Number(value=GENERATE_TEMPERATURE_DEFAULT, label="Generation Temperature"),
-        gr.Number(value=SCORE_TEMPERATURE_DEFAULT, label="Score Temperature"),
-        gr.Number(value=PAIRWISE_TEMPERATURE_DEFAULT, label="Pairwise Temperature"),
-        gr.Textbox(lines=10, label="Instruction"),
-        gr.Textbox(value=CRITERIA_DEFAULT, lines=5, label="Criteria (comma separated)"),
-        gr.Number(value=NUM_GENERATIONS_DEFAULT, label="Number of Generations"),
-        gr.Number(value=POOL_SIZE_DEFAULT, label="Top Picks Score Filter"),
-        gr.Number(value=NUM_TOP_PICKS_DEFAULT, label="Top Picks Pairwise"),
-        gr.Number(value=MAX_WORKERS_DEFAULT, label="Max Workers"),
-        gr.Checkbox(value=SCORE_FILTER_DEFAULT, label="Enable Score Filter"),
-        gr.Checkbox(value=PAIRWISE_FILTER_DEFAULT, label="Enable Pairwise Filter"),
-        gr.Checkbox(value=SCORE_WITH_INSTRUCTION_DEFAULT, label="Pass Instruction to Score Model"),
-        gr.Checkbox(value=PAIRWISE_WITH_INSTRUCTION_DEFAULT, label="Pass Instruction to Pairwise Model"),
-        gr.Checkbox(value=GENERATE_THINKING_DEFAULT, label="Enable Thinking (Generate)"),
-        gr.Checkbox(value=SCORE_THINKING_DEFAULT, label="Enable Thinking (Score)"),
-        gr.Checkbox(value=PAIRWISE_THINKING_DEFAULT, label="Enable Thinking (Pairwise)"),
-        gr.Checkbox(value=False, label="Enable Explain (Score)"),
-        gr.Checkbox(value=False, label="Enable Explain (Pairwise)"),
-    ],
-    outputs=[
-        gr.Textbox(lines=10, label="Process"),
-        gr.Plot(label="Score Distribution"),
-        gr.Plot(label="Elo Ratings"),
-        gr.Textbox(lines=50, label="Top picks"),
-        gr.Textbox(lines=5, label="Token Usage"),
-    ],
-    description="Generate multiple completions and use score and pairwise filters to find the best answers.",
-)
 
 if __name__ == "__main__":
-    demo.launch()
+    build_demo().launch()
@@ -0,0 +1,257 @@
+import threading
+
+
+STAGES = ("generate", "score", "pairwise")
+
+
+def usage_tokens(usage) -> tuple[int, int]:
+    """Return ``(prompt_tokens, completion_tokens)`` from a litellm usage object or dict."""
+    if not usage:
+        return 0, 0
+    pt = getattr(usage, "prompt_tokens", None)
+    if pt is None and isinstance(usage, dict):
+        pt = usage.get("prompt_tokens")
+    ct = getattr(usage, "completion_tokens", None)
+    if ct is None and isinstance(usage, dict):
+        ct = usage.get("completion_tokens")
+    return pt or 0, ct or 0
+
+
+def _field(obj, name):
+    value = getattr(obj, name, None)
+    if value is None and isinstance(obj, dict):
+        value = obj.get(name)
+    return value
+
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens served from the provider's prompt cache.
+
+    OpenAI-style usage reports them in ``prompt_tokens_details.cached_tokens``,
+    Anthropic-style usage in ``cache_read_input_tokens``.
+    """
+    if not usage:
+        return 0
+    details = _field(usage, "prompt_tokens_details")
+    cached = _field(details, "cached_tokens") if details else None
+    if cached is None:
+        cached = _field(usage, "cache_read_input_tokens")
+    return cached if isinstance(cached, int) else 0
+
+
+def plain_usage(usage) -> dict | None:
+    """The parts of a usage object :mod:`metrics` reads, as JSON."""
+    if not usage:
+        return None
+    prompt, completion = usage_tokens(usage)
+    plain = {"prompt_tokens": prompt, "completion_tokens": completion}
+    if cached := cached_tokens(usage):
+        plain["prompt_tokens_details"] = {"cached_tokens": cached}
+    return plain
+
+
+_cost_lookup = None
+
+
+def _cost_per_token():
+    """litellm's ``cost_per_token`` and the errors it raises for unpriced models, resolved once."""
+    global _cost_lookup
+    if _cost_lookup is None:
+        try:
+            import litellm
+
+            errors = tuple(
+                e for e in (getattr(litellm, "NotFoundError", None), getattr(litellm, "BadRequestError", None))
+                if isinstance(e, type)
+            )
+            _cost_lookup = litellm.cost_per_token, errors + (KeyError, ValueError)
+        except (ImportError, AttributeError):
+            _cost_lookup = None, ()
+    return _cost_lookup
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a call from litellm's price table; 0 for models it does not know."""
+    if not (prompt_tokens or completion_tokens):
+        return 0.0
+    cost_per_token, lookup_errors = _cost_per_token()
+    if cost_per_token is None:
+        return 0.0
+    try:
+        prompt_cost, completion_cost = cost_per_token(
+            model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens
+        )
+    except lookup_errors:
+        return 0.0
+    return prompt_cost + completion_cost
+
+
+class CallStats:
+    """Counters for the calls of one stage to one model."""
+
+    __slots__ = (
+        "calls",
+        "latency",
+        "latency_max",
+        "prompt_tokens",
+        "completion_tokens",
+        "cached_tokens",
+        "retries",
+        "cost",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.latency = 0.0
+        self.latency_max = 0.0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_tokens = 0
+        self.retries = 0
+        self.cost = 0.0
+
+    def add(self, other: "CallStats") -> None:
+        self.calls += other.calls
+        self.latency += other.latency
+        self.latency_max = max(self.latency_max, other.latency_max)
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.retries += other.retries
+        self.cost += other.cost
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Metrics:
+    """Per-stage, per-model call metrics that worker threads record without locking.
+
+    Every thread writes to its own shard of :class:`CallStats`; a lock is only
+    taken the first time a thread records. :meth:`snapshot` merges the shards,
+    so totals read while calls are still running may lag by the calls in
+    progress but are exact once the workers are done.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._register = threading.Lock()
+
+    def _stats(self, stage: str, model: str) -> CallStats:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._register:
+                self._shards.append(shard)
+        stats = shard.get((stage, model))
+        if stats is None:
+            stats = shard[(stage, model)] = CallStats()
+        return stats
+
+    def record(
+        self,
+        stage: str,
+        model: str,
+        latency: float,
+        usage=None,
+        *,
+        retries: int = 0,
+        cost: float | None = None,
+    ) -> None:
+        """Record one finished call; ``cost`` is estimated from the usage when not given."""
+        pt, ct = usage_tokens(usage)
+        stats = self._stats(stage, model)
+        stats.calls += 1
+        stats.latency += latency
+        stats.latency_max = max(stats.latency_max, latency)
+        stats.prompt_tokens += pt
+        stats.completion_tokens += ct
+        stats.cached_tokens += cached_tokens(usage)
+        stats.retries += retries
+        stats.cost += estimate_cost(model, pt, ct) if cost is None else cost
+
+    def merge(self, other: "Metrics") -> None:
+        """Add everything ``other`` recorded to this instance."""
+        for (stage, model), stats in other.snapshot().items():
+            self._stats(stage, model).add(stats)
+
+    def snapshot(self) -> dict[tuple[str, str], CallStats]:
+        """Merged counters keyed by ``(stage, model)``, ordered by stage."""
+        merged: dict[tuple[str, str], CallStats] = {}
+        with self._register:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, stats in list(shard.items()):
+                merged.setdefault(key, CallStats()).add(stats)
+        order = {s: i for i, s in enumerate(STAGES)}
+        return dict(sorted(merged.items(), key=lambda kv: (order.get(kv[0][0], len(order)), kv[0])))
+
+    def totals(self) -> CallStats:
+        total = CallStats()
+        for stats in self.snapshot().values():
+            total.add(stats)
+        return total
+
+    def summary_table(self) -> str:
+        """Plain-text table with one row per stage and model."""
+        header = (
+            "stage",
+            "model",
+            "calls",
+            "prompt tok",
+            "compl tok",
+            "cached tok",
+            "retries",
+            "cost $",
+            "mean s",
+            "max s",
+            "total s",
+        )
+        rows = [
+            (
+                stage,
+                model,
+                str(s.calls),
+                str(s.prompt_tokens),
+                str(s.completion_tokens),
+                str(s.cached_tokens),
+                str(s.retries),
+                f"{s.cost:.4f}",
+                f"{s.latency / s.calls:.2f}" if s.calls else "-",
+                f"{s.latency_max:.2f}",
+                f"{s.latency:.1f}",
+            )
+            for (stage, model), s in self.snapshot().items()
+        ]
+        widths = [max(len(r[i]) for r in [header, *rows]) for i in range(len(header))]
+        return "\n".join(
+            "  ".join(cell.ljust(w) if i < 2 else cell.rjust(w) for i, (cell, w) in enumerate(zip(row, widths)))
+            for row in [header, *rows]
+        )
+
+    def prometheus(self, prefix: str = "llm_tournament") -> str:
+        """Prometheus text exposition of the counters, labelled by stage and model."""
+        series = (
+            ("calls_total", "counter", "Model calls.", lambda s: s.calls),
+            ("latency_seconds_sum", "counter", "Total call latency in seconds.", lambda s: s.latency),
+            ("latency_seconds_max", "gauge", "Slowest call in seconds.", lambda s: s.latency_max),
+            ("prompt_tokens_total", "counter", "Prompt tokens.", lambda s: s.prompt_tokens),
+            ("completion_tokens_total", "counter", "Completion tokens.", lambda s: s.completion_tokens),
+            ("cached_tokens_total", "counter", "Prompt tokens served from the provider cache.", lambda s: s.cached_tokens),
+            ("retries_total", "counter", "Retried calls.", lambda s: s.retries),
+            ("cost_usd_total", "counter", "Estimated cost in USD.", lambda s: s.cost),
+        )
+        snapshot = self.snapshot()
+        lines = []
+        for name, kind, help_text, value in series:
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for (stage, model), stats in snapshot.items():
+                labels = f'stage="{_escape_label(stage)}",model="{_escape_label(model)}"'
+                lines.append(f"{prefix}_{name}{{{labels}}} {value(stats)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,355 @@
+import math
+
+
+PAIRING_MODES = ("round_robin", "swiss", "knockout", "active", "listwise", "groups")
+
+
+class _Tie:
+    def __repr__(self) -> str:
+        return "TIE"
+
+
+# Result of a drawn match, passed as ``winner`` where a player would be. A
+# match without any usable verdict is passed as ``None``.
+TIE = _Tie()
+
+
+def _log2_ceil(n: int) -> int:
+    return max(1, math.ceil(math.log2(n))) if n > 1 else 0
+
+
+class PairingScheduler:
+    """Base class for pairwise match schedulers.
+
+    A scheduler hands out rounds of ``(a, b)`` pairs via :meth:`next_round`.
+    Matches of one round may be played concurrently; results are fed back
+    with :meth:`record` before the next round is requested. The ``winner`` is
+    ``a``, ``b``, :data:`TIE` or ``None`` when the judge gave no verdict. An
+    empty round means the tournament is finished.
+    """
+
+    def __init__(self, players: list):
+        self.players = list(players)
+        self.index = {p: i for i, p in enumerate(self.players)}
+        self.played: set[frozenset] = set()
+        self.games: dict = {p: 0 for p in self.players}
+
+    def expected_matches(self) -> int:
+        """Upper bound of matches the scheduler will hand out."""
+        raise NotImplementedError
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        raise NotImplementedError
+
+    def record(self, a, b, winner) -> None:
+        self.played.add(frozenset((a, b)))
+        self.games[a] += 1
+        self.games[b] += 1
+
+    def _standings(self, rating: dict, players=None) -> list:
+        players = self.players if players is None else players
+        return sorted(players, key=lambda p: (-rating.get(p, 0.0), self.index[p]))
+
+    def _pair_adjacent(self, ordered: list) -> list[tuple]:
+        """Greedily pair each player with the next one it has not met yet."""
+        pairs = []
+        free = list(ordered)
+        while len(free) > 1:
+            a = free.pop(0)
+            for j, b in enumerate(free):
+                if frozenset((a, b)) not in self.played:
+                    pairs.append((a, b))
+                    free.pop(j)
+                    break
+        return pairs
+
+
+class RoundRobin(PairingScheduler):
+    """Every player meets every other player once (``n * (n - 1) / 2`` matches)."""
+
+    def __init__(self, players: list):
+        super().__init__(players)
+        self._done = False
+
+    def expected_matches(self) -> int:
+        n = len(self.players)
+        return n * (n - 1) // 2
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        if self._done:
+            return []
+        self._done = True
+        return [
+            (self.players[i], self.players[j])
+            for i in range(len(self.players))
+            for j in range(i + 1, len(self.players))
+        ]
+
+
+class Swiss(PairingScheduler):
+    """Swiss rounds: players with similar ratings meet, nobody meets twice.
+
+    ``ceil(log2(n)) + 1`` rounds of ``n // 2`` matches are enough to separate
+    the leaders, so the total number of matches is ``O(n log n)``.
+    """
+
+    def __init__(self, players: list, rounds: int | None = None):
+        super().__init__(players)
+        self.rounds = rounds if rounds is not None else _log2_ceil(len(self.players)) + 1
+        self._round = 0
+
+    def expected_matches(self) -> int:
+        return min(self.rounds * (len(self.players) // 2), len(self.players) * (len(self.players) - 1) // 2)
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        if self._round >= self.rounds:
+            return []
+        self._round += 1
+        return self._pair_adjacent(self._standings(rating))
+
+
+class Knockout(PairingScheduler):
+    """Single elimination bracket seeded by the current rating.
+
+    The best seed meets the worst one; with an odd field the top seed gets a
+    bye. ``n - 1`` matches decide the winner. A tie or a match without a
+    verdict keeps the higher seed, which is always ``a``.
+    """
+
+    def __init__(self, players: list):
+        super().__init__(players)
+        self.alive = list(self.players)
+
+    def expected_matches(self) -> int:
+        return max(0, len(self.players) - 1)
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        seeded = self._standings(rating, self.alive)
+        if len(seeded) < 2:
+            return []
+        if len(seeded) % 2:
+            seeded = seeded[1:]
+        half = len(seeded) // 2
+        return [(seeded[i], seeded[-1 - i]) for i in range(half)]
+
+    def record(self, a, b, winner) -> None:
+        super().record(a, b, winner)
+        loser = a if winner == b else b
+        if loser in self.alive:
+            self.alive.remove(loser)
+
+
+class Active(PairingScheduler):
+    """Only play matches that can still change the top-k set.
+
+    Each player carries an Elo uncertainty that shrinks with the number of
+    games played. After a Swiss warm-up round, only players whose interval
+    ``rating ± z * sigma`` overlaps the boundary between rank ``k`` and
+    ``k + 1`` are paired, adjacent in rating. The run stops when no such pair
+    is left or after ``max_rounds`` rounds.
+    """
+
+    def __init__(
+        self,
+        players: list,
+        top_k: int,
+        *,
+        sigma0: float = 200.0,
+        z: float = 1.0,
+        max_rounds: int | None = None,
+    ):
+        super().__init__(players)
+        self.top_k = max(1, int(top_k))
+        self.sigma0 = sigma0
+        self.z = z
+        self.max_rounds = max_rounds if max_rounds is not None else 2 * _log2_ceil(len(self.players)) + 1
+        self._round = 0
+
+    def sigma(self, player) -> float:
+        return self.sigma0 / math.sqrt(1 + self.games[player])
+
+    def expected_matches(self) -> int:
+        n = len(self.players)
+        return min(self.max_rounds * (n // 2), n * (n - 1) // 2)
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        if self._round >= self.max_rounds or self.top_k >= len(self.players):
+            return []
+        self._round += 1
+        ordered = self._standings(rating)
+        if self._round == 1:
+            return self._pair_adjacent(ordered)
+        boundary = (rating[ordered[self.top_k - 1]] + rating[ordered[self.top_k]]) / 2
+        contested = [
+            p for p in ordered
+            if rating[p] - self.z * self.sigma(p) <= boundary <= rating[p] + self.z * self.sigma(p)
+        ]
+        return self._pair_adjacent(contested)
+
+
+class Listwise(PairingScheduler):
+    """Hand out groups of ``group_size`` players for a listwise ranking judge.
+
+    Every round covers every player exactly once. The first round deals the
+    players out like cards so each group mixes strong and weak seeds; later
+    rounds group neighbours in the current rating, moving the group
+    boundaries by half a group every other round so adjacent groups overlap.
+    """
+
+    def __init__(self, players: list, group_size: int = 4, rounds: int = 3):
+        super().__init__(players)
+        self.group_size = max(2, int(group_size))
+        # A pool that fits into one group is settled by a single ranking.
+        self.rounds = max(1, int(rounds)) if len(self.players) > self.group_size else 1
+        self._round = 0
+
+    def _num_groups(self) -> int:
+        return math.ceil(len(self.players) / self.group_size)
+
+    def expected_matches(self) -> int:
+        return self.rounds * (self._num_groups() + 1) if len(self.players) > 1 else 0
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        if self._round >= self.rounds or len(self.players) < 2:
+            return []
+        self._round += 1
+        ordered = self._standings(rating)
+        groups_n = self._num_groups()
+        if self._round == 1:
+            groups = [ordered[g::groups_n] for g in range(groups_n)]
+        else:
+            offset = self.group_size // 2 if self._round % 2 else 0
+            starts = [0] + list(range(offset or self.group_size, len(ordered), self.group_size))
+            groups = [ordered[a:b] for a, b in zip(starts, starts[1:] + [len(ordered)])]
+        # Fold single leftovers into a neighbouring group so everyone is ranked.
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            last = groups.pop()
+            groups[-1] = groups[-1] + last
+        if len(groups) > 1 and len(groups[0]) == 1:
+            first = groups.pop(0)
+            groups[0] = first + groups[0]
+        return [tuple(g) for g in groups if len(g) > 1]
+
+    def record_ranking(self, ordered: list) -> None:
+        """Record a ranking (best first) returned by the judge for one group."""
+        for i, a in enumerate(ordered):
+            for b in ordered[i + 1:]:
+                self.record(a, b, a)
+
+
+class GroupStage(PairingScheduler):
+    """Group stages for large pools: round-robin groups, the group winners advance.
+
+    Each stage deals the field into groups of at most ``stage_size``
+    players like cards, so every group mixes strong and weak seeds, and
+    plays a round-robin inside every group; all groups of a stage form one
+    round. The best ``advance`` players of each group, by points in the
+    group (a win is 1, a tie 0.5) and then by rating, make up the next
+    field, seeded group winners first. Once the field fits into one group
+    a final round-robin decides.
+    With fixed group sizes the number of matches grows linearly with the
+    number of players. :attr:`stages` describes every stage played so far.
+    """
+
+    def __init__(self, players: list, stage_size: int = 8, advance: int = 2):
+        super().__init__(players)
+        self.stage_size = max(2, int(stage_size))
+        self.advance = min(max(1, int(advance)), self.stage_size - 1)
+        self.field = list(self.players)
+        self.groups: list[list] = []
+        self.points: dict = {}
+        self.stages: list[dict] = []
+        self._final = False
+
+    def _deal(self, field: list) -> list[list]:
+        if len(field) <= self.stage_size:
+            return [list(field)]
+        groups_n = math.ceil(len(field) / self.stage_size)
+        return [field[g::groups_n] for g in range(groups_n)]
+
+    def _next_field(self, groups: list[list], standings, rating: dict) -> list:
+        ranked = [standings(group) for group in groups]
+        # Group winners are seeded first, then the runners-up and so on, each place by rating.
+        promoted = [
+            p
+            for place in range(self.advance)
+            for p in self._standings(rating, [r[place] for r in ranked if place < len(r)])
+        ]
+        # A field that cannot shrink any further goes straight to the final.
+        return promoted if len(promoted) < sum(map(len, groups)) else []
+
+    def expected_matches(self) -> int:
+        field, total = list(self.players), 0
+        while len(field) > 1:
+            groups = self._deal(field)
+            total += sum(len(g) * (len(g) - 1) // 2 for g in groups)
+            if len(groups) == 1:
+                break
+            field = self._next_field(groups, lambda group: group, {}) or field[: self.stage_size]
+        return total
+
+    def _group_standings(self, rating: dict):
+        def standings(group):
+            return sorted(group, key=lambda p: (-self.points.get(p, 0.0), -rating.get(p, 0.0), self.index[p]))
+
+        return standings
+
+    def next_round(self, rating: dict) -> list[tuple]:
+        if self.groups:
+            standings = self._group_standings(rating)
+            self.stages[-1]["standings"] = [standings(group) for group in self.groups]
+            if self._final:
+                self.groups = []
+                return []
+            field = self._next_field(self.groups, standings, rating)
+            self.stages[-1]["advanced"] = field or self._standings(rating, self.field)[: self.stage_size]
+            self.field = self.stages[-1]["advanced"]
+        elif self._final or len(self.field) < 2:
+            return []
+        else:
+            # The first field is seeded in the order of the current rating.
+            self.field = self._standings(rating, self.field)
+        self.groups = self._deal(self.field)
+        self._final = len(self.groups) == 1
+        self.points = {}
+        pairs = [(g[i], g[j]) for g in self.groups for i in range(len(g)) for j in range(i + 1, len(g))]
+        self.stages.append({"players": len(self.field), "groups": len(self.groups), "matches": len(pairs)})
+        return pairs
+
+    def record(self, a, b, winner) -> None:
+        super().record(a, b, winner)
+        if winner is TIE:
+            self.points[a] = self.points.get(a, 0.0) + 0.5
+            self.points[b] = self.points.get(b, 0.0) + 0.5
+        elif winner in (a, b):
+            self.points[winner] = self.points.get(winner, 0.0) + 1.0
+
+
+def make_scheduler(
+    mode: str,
+    players: list,
+    top_k: int = 1,
+    *,
+    group_size: int = 4,
+    rounds: int = 3,
+    stage_size: int = 8,
+    advance: int = 2,
+) -> PairingScheduler:
+    """Return the scheduler for ``mode`` (one of :data:`PAIRING_MODES`).
+
+    ``group_size`` and ``rounds`` only apply to the ``listwise`` mode,
+    ``stage_size`` and ``advance`` only to the ``groups`` mode.
+    """
+    if mode == "round_robin":
+        return RoundRobin(players)
+    if mode == "swiss":
+        return Swiss(players)
+    if mode == "knockout":
+        return Knockout(players)
+    if mode == "active":
+        return Active(players, top_k)
+    if mode == "listwise":
+        return Listwise(players, group_size, rounds)
+    if mode == "groups":
+        return GroupStage(players, stage_size, advance)
+    raise ValueError(f"Unknown pairing mode: {mode!r}")
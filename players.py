@@ -0,0 +1,125 @@
+import math
+from array import array
+
+import numpy as np
+
+from dedup import DuplicateIndex
+from pairing import TIE
+
+
+class Player:
+    """A distinct answer: its id, its text and how many generations it stands for."""
+
+    __slots__ = ("id", "text", "count")
+
+    def __init__(self, id: int, text: str, count: int = 1):
+        self.id = id
+        self.text = text
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"Player({self.id}, count={self.count})"
+
+
+class PlayerRegistry:
+    """The distinct answers of a tournament, numbered from 0 as they arrive.
+
+    The engine passes these integer ids around instead of the answer texts,
+    which can be many kilobytes long; the texts are only looked up to build
+    judge prompts and the final results. Duplicates are merged on
+    :meth:`add` (see :class:`dedup.DuplicateIndex`). Scores are stored in an
+    array indexed by id, NaN until the player is scored.
+    """
+
+    def __init__(self, dedup_threshold: float = 0.0):
+        self.dedup = DuplicateIndex(dedup_threshold)
+        self.players: list[Player] = []
+        self.scores = array("d")
+        self.raw_scores: list[list | None] = []
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __getitem__(self, pid: int) -> Player:
+        return self.players[pid]
+
+    def text(self, pid: int) -> str:
+        return self.players[pid].text
+
+    def add(self, text: str) -> tuple[Player, bool]:
+        """Register a generated answer; return its player and whether it is new."""
+        pid = self.dedup.add(text, len(self.players))
+        if pid < len(self.players):
+            player = self.players[pid]
+            player.count += 1
+            return player, False
+        player = Player(pid, text)
+        self.players.append(player)
+        self.scores.append(math.nan)
+        self.raw_scores.append(None)
+        return player, True
+
+    def dedup_summary(self) -> str:
+        generations = sum(player.count for player in self.players)
+        return (
+            f"Collapsed {generations} generations into {len(self)} distinct answers "
+            f"({self.dedup.exact} exact and {self.dedup.near} near duplicates)"
+        )
+
+    def set_score(self, pid: int, score: float | None, raw: list | None = None) -> None:
+        """Store the score of a player; ``None`` (no verdict) leaves it unscored."""
+        if score is None:
+            return
+        self.scores[pid] = score
+        if raw is not None:
+            self.raw_scores[pid] = raw
+
+    def scored(self, ids) -> list[int]:
+        """The players of ``ids`` that have a score."""
+        return [pid for pid in ids if not math.isnan(self.scores[pid])]
+
+    def ranked(self, ids) -> list[int]:
+        """The scored players of ``ids`` by score, best first; equal scores keep their order."""
+        return sorted(self.scored(ids), key=lambda pid: -self.scores[pid])
+
+    def texts(self, ids) -> list[str]:
+        return [self.players[pid].text for pid in ids]
+
+
+class MatchTable:
+    """Results of pairwise matches between ids ``0..n-1``.
+
+    One ``int8`` cell per unordered pair replaces a dict keyed by pairs of
+    answers, so both orderings of a match share an entry and the table
+    costs ``n * n`` bytes whatever the length of the answers.
+    """
+
+    UNPLAYED, LOW_WINS, HIGH_WINS, DRAW, NO_VERDICT = range(5)
+
+    def __init__(self, n: int):
+        self.codes = np.zeros((n, n), dtype=np.int8)
+
+    def __contains__(self, pair) -> bool:
+        i, j = sorted(pair)
+        return self.codes[i, j] != self.UNPLAYED
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.codes))
+
+    def get(self, i: int, j: int):
+        """The winner id, :data:`pairing.TIE` or ``None`` for a match without verdict."""
+        lo, hi = sorted((i, j))
+        code = self.codes[lo, hi]
+        if code == self.UNPLAYED:
+            raise KeyError((i, j))
+        return {self.LOW_WINS: lo, self.HIGH_WINS: hi, self.DRAW: TIE}.get(int(code))
+
+    def record(self, i: int, j: int, winner) -> None:
+        lo, hi = sorted((i, j))
+        if winner is None:
+            code = self.NO_VERDICT
+        elif winner is TIE:
+            code = self.DRAW
+        else:
+            code = self.LOW_WINS if winner == lo else self.HIGH_WINS
+        self.codes[lo, hi] = code
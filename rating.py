@@ -0,0 +1,204 @@
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from pairing import TIE
+
+
+ELO_SCALE = 400.0 / math.log(10)
+
+
+class BradleyTerry:
+    """Batch Bradley-Terry rating over a win-count matrix.
+
+    ``wins[i, j]`` counts how often player ``i`` beat player ``j`` (a tie
+    adds half a win to both sides). :meth:`fit` runs Hunter's MM iterations
+    vectorized over the whole matrix, so the result only depends on the
+    counts and not on the order in which matches finished. Each fit starts
+    from the previous strengths, so refreshing after a few new results only
+    needs a handful of iterations.
+
+    Every player also wins and loses ``prior`` games against a virtual
+    opponent of strength 1, which keeps the strengths finite for players
+    that never win or never lose. Ratings are reported on the Elo scale:
+    centred on 1000, 400 points per factor of ten in strength.
+
+    ``players`` are the keys used by :meth:`record` and :meth:`as_dict`;
+    :meth:`add` and :meth:`add_many` work on positions in that list.
+    """
+
+    def __init__(self, players: list, prior: float = 1.0):
+        self.players = list(players)
+        self.index = {p: i for i, p in enumerate(self.players)}
+        n = len(self.players)
+        self.prior = prior
+        self.wins = np.zeros((n, n))
+        self.strength = np.ones(n)
+
+    def record(self, a, b, winner) -> None:
+        """Record that ``winner`` (``a``, ``b`` or :data:`pairing.TIE`) won the match ``a`` vs ``b``.
+
+        A ``winner`` of ``None`` (no usable verdict) leaves the counts unchanged.
+        """
+        if winner is None:
+            return
+        outcome = 0.5 if winner is TIE else 1.0 if winner == a else 0.0
+        self.add(self.index[a], self.index[b], outcome)
+
+    def add(self, i: int, j: int, outcome: float = 1.0) -> None:
+        """Record one match; ``outcome`` is 1 if ``i`` won, 0 if ``j`` won, 0.5 for a tie."""
+        self.wins[i, j] += outcome
+        self.wins[j, i] += 1.0 - outcome
+
+    def add_many(self, i, j, outcome) -> None:
+        """Vectorized :meth:`add` over arrays of matches."""
+        i = np.asarray(i, dtype=int)
+        j = np.asarray(j, dtype=int)
+        outcome = np.broadcast_to(np.asarray(outcome, dtype=float), i.shape)
+        np.add.at(self.wins, (i, j), outcome)
+        np.add.at(self.wins, (j, i), 1.0 - outcome)
+
+    @property
+    def games(self) -> np.ndarray:
+        return self.wins.sum(axis=1) + self.wins.sum(axis=0)
+
+    def fit(self, max_iter: int = 1000, tol: float = 1e-6) -> np.ndarray:
+        """Run MM iterations until the strengths converge and return them."""
+        games = self.wins + self.wins.T
+        # Iterate over the played pairs only; the matrix is mostly empty for
+        # sparse schedules such as Swiss rounds.
+        rows, cols = np.nonzero(games)
+        counts = games[rows, cols]
+        total_wins = self.wins.sum(axis=1) + self.prior
+        n = len(self.players)
+        p = self.strength
+        for _ in range(max_iter):
+            denom = np.bincount(rows, counts / (p[rows] + p[cols]), minlength=n) + 2 * self.prior / (p + 1.0)
+            new = total_wins / denom
+            done = np.max(np.abs(new - p) / p, initial=0.0) < tol
+            p = new
+            if done:
+                break
+        self.strength = p
+        return p
+
+    def ratings(self) -> np.ndarray:
+        """Elo-scale ratings of the current strengths."""
+        theta = np.log(self.strength)
+        if not theta.size:
+            return theta
+        return 1000.0 + ELO_SCALE * (theta - theta.mean())
+
+    def stderr(self) -> np.ndarray:
+        """Standard error of each rating (Elo points) from the Fisher information."""
+        p = self.strength
+        games = self.wins + self.wins.T
+        pair = p[:, None] * p[None, :] / (p[:, None] + p[None, :]) ** 2
+        info = (games * pair).sum(axis=1) + 2 * self.prior * p / (p + 1.0) ** 2
+        return ELO_SCALE / np.sqrt(info)
+
+    def intervals(self, z: float = 1.96) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(low, high)`` confidence bounds of the ratings."""
+        r = self.ratings()
+        half = z * self.stderr()
+        return r - half, r + half
+
+    def as_dict(self) -> dict:
+        """Ratings keyed by player."""
+        return dict(zip(self.players, self.ratings().tolist()))
+
+    def stderr_dict(self) -> dict:
+        """Rating standard errors keyed by player."""
+        return dict(zip(self.players, self.stderr().tolist()))
+
+
+def plackett_luce(players: list, rankings: list[list], max_iter: int = 200, tol: float = 1e-9) -> dict:
+    """Fit Plackett-Luce strengths to partial rankings and return Elo-scale ratings keyed by player.
+
+    Uses Hunter's MM algorithm, vectorized over all rankings at once: they
+    are padded into one matrix of player positions, so an iteration is a few
+    array operations whatever the number and length of the rankings. Every
+    player also wins and loses once against a virtual opponent of strength
+    1, so players that never win (or never lose) keep a finite rating.
+    Ratings are on the same scale as :meth:`BradleyTerry.ratings`.
+    """
+    if not players:
+        return {}
+    index = {p: i for i, p in enumerate(players)}
+    n = len(players)
+    width = max((len(order) for order in rankings), default=0)
+    # pos[r, t] is the player ranked t-th in ranking r, padded with 0 where ``mask`` is off.
+    pos = np.zeros((len(rankings), width), dtype=int)
+    mask = np.zeros((len(rankings), width), dtype=bool)
+    for r, order in enumerate(rankings):
+        pos[r, : len(order)] = [index[p] for p in order]
+        mask[r, : len(order)] = True
+    # Only the last player of a ranking is never picked ahead of the rest.
+    lengths = mask.sum(axis=1)
+    picked = mask & (np.arange(width) < (lengths - 1)[:, None])
+    wins = np.bincount(pos[picked], minlength=n) + 1.0
+    gamma = np.ones(n)
+    for _ in range(max_iter):
+        g = np.where(mask, gamma[pos], 0.0)
+        # Strength still in the running when each position is picked.
+        remaining = np.cumsum(g[:, ::-1], axis=1)[:, ::-1]
+        inv = np.divide(1.0, remaining, out=np.zeros_like(remaining), where=picked)
+        # A player takes part in every pick up to its own (the last one in all of them).
+        acc = np.cumsum(inv, axis=1)
+        denom = np.bincount(pos[mask], acc[mask], minlength=n) + 2.0 / (gamma + 1.0)
+        new = wins / denom
+        done = np.max(np.abs(new - gamma), initial=0.0) < tol
+        gamma = new
+        if done:
+            break
+    theta = np.log(gamma)
+    return dict(zip(players, (1000.0 + ELO_SCALE * (theta - theta.mean())).tolist()))
+
+
+def top_k_separated(ratings, stderr, k: int, z: float) -> bool:
+    """Return ``True`` when the top ``k`` ratings are separated from the rest.
+
+    The set is separated when the lowest lower bound ``rating - z * stderr``
+    inside the top ``k`` is above the highest upper bound outside it. With
+    ``k`` covering the whole pool there is nothing to separate and the
+    result is ``False``.
+    """
+    ratings = np.asarray(ratings, dtype=float)
+    stderr = np.asarray(stderr, dtype=float)
+    if k <= 0 or k >= ratings.size:
+        return False
+    order = np.argsort(-ratings, kind="stable")
+    top, rest = order[:k], order[k:]
+    return bool(np.min(ratings[top] - z * stderr[top]) > np.max(ratings[rest] + z * stderr[rest]))
+
+
+class EarlyStop:
+    """Tell the tournament when the top-k set is settled.
+
+    ``confidence`` is the two-sided level of the rating intervals compared
+    by :func:`top_k_separated`. A refit costs ``O(n²)`` for ``n`` players,
+    so :meth:`result` only checks once per batch of results: about a round
+    in which every player plays once (``n // 2`` matches), and at least
+    ``every`` matches, e.g. one per worker.
+    """
+
+    def __init__(self, top_k: int, confidence: float = 0.95, every: int = 1):
+        self.top_k = top_k
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.every = max(1, every)
+        self.unchecked = 0
+
+    def result(self, bt: BradleyTerry) -> bool:
+        """Count one more result in ``bt`` and check :meth:`settled` once a batch is complete."""
+        self.unchecked += 1
+        if self.unchecked < max(self.every, len(bt.players) // 2):
+            return False
+        return self.settled(bt)
+
+    def settled(self, bt: BradleyTerry) -> bool:
+        """Refit ``bt`` and tell whether its top ``top_k`` are separated from the rest."""
+        self.unchecked = 0
+        bt.fit()
+        return top_k_separated(bt.ratings(), bt.stderr(), self.top_k, self.z)
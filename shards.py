@@ -0,0 +1,348 @@
+"""Run judge calls in worker processes, on this machine or on others, through a SQLite job table.
+
+Usage::
+
+    python shards.py jobs.db --threads 16
+
+A tournament started with ``shard_jobs="jobs.db"`` posts every score,
+pairwise and ranking call to the table instead of sending it itself, and
+waits for the answer. Workers claim pending jobs, send them through their
+own :class:`dispatch.Dispatcher` and write back the judge text, usage and
+retries; the tournament parses the verdicts and keeps the one rating
+state. ``shard_workers`` starts that many local worker processes for the
+run; workers on other machines run this module against the same file
+(the directory must be shared with working file locks). One table can
+serve several tournaments at once.
+
+Workers read ``OPENAI_API_BASE``/``OPENAI_API_KEY`` and the rate limit
+settings from their own environment; local workers get the API settings
+of the tournament. Every worker process paces its own calls, so split
+``REQUESTS_PER_MINUTE`` between them.
+"""
+import argparse, itertools, json, os, socket, sqlite3, sys, threading, time, uuid, weakref
+from concurrent.futures import Future
+
+from metrics import plain_usage
+
+
+# tournament_utils functions a job may name; the async variants map to the same jobs.
+JOB_FUNCTIONS = ("prompt_score", "prompt_score_batch", "prompt_pairwise", "prompt_rank")
+# Keyword arguments that belong to the process sending the call, not to the job.
+LOCAL_KWARGS = ("api_base", "api_key", "cache", "return_usage")
+# Jobs claimed longer ago than this go back to the queue (their worker is presumed dead).
+LEASE_SECONDS = float(os.getenv("SHARD_LEASE", 600))
+POLL_INTERVAL = 0.02
+IDLE_INTERVAL = 0.5
+
+
+class ShardJobError(RuntimeError):
+    """A worker could not complete a job; carries the worker's error message."""
+
+
+def job_name(fn) -> str | None:
+    """The job a judge function becomes, or ``None`` if it must run locally."""
+    name = getattr(fn, "__name__", "")
+    if name in JOB_FUNCTIONS:
+        return name
+    if name.startswith("a") and name[1:] in JOB_FUNCTIONS:
+        return name[1:]
+    return None
+
+
+class JobTable:
+    """Pending, running and finished judge calls in a SQLite file.
+
+    The file is opened in WAL mode with one connection per thread, like
+    :class:`judge_cache.JudgeCache`. Claims run in an immediate
+    transaction, so every job goes to exactly one worker.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, run TEXT NOT NULL, fn TEXT NOT NULL, payload TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', worker TEXT, claimed REAL, result TEXT)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_run ON jobs (run, status)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def post(self, run: str, fn: str, args, kwargs: dict) -> int:
+        payload = json.dumps({"args": list(args), "kwargs": kwargs}, ensure_ascii=False)
+        cur = self._conn().execute("INSERT INTO jobs (run, fn, payload) VALUES (?, ?, ?)", (run, fn, payload))
+        return cur.lastrowid
+
+    def claim(self, worker: str) -> tuple[int, str, dict] | None:
+        """Take the oldest pending job: its id, function name and payload."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id, fn, payload FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, claimed = ? WHERE id = ?",
+                    (worker, time.time(), row[0]),
+                )
+        finally:
+            conn.execute("COMMIT")
+        return None if row is None else (row[0], row[1], json.loads(row[2]))
+
+    def finish(self, job_id: int, result: dict) -> None:
+        status = "failed" if "error" in result else "done"
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ? WHERE id = ? AND status = 'running'",
+            (status, json.dumps(result, ensure_ascii=False), job_id),
+        )
+
+    def collect(self, run: str) -> list[tuple[int, str, dict]]:
+        """Remove the finished jobs of ``run`` and return their ids, workers and results."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, worker, result FROM jobs WHERE run = ? AND status IN ('done', 'failed')", (run,)
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(r[0],) for r in rows])
+        finally:
+            conn.execute("COMMIT")
+        return [(job_id, worker, json.loads(result)) for job_id, worker, result in rows]
+
+    def requeue_stale(self, run: str, lease: float = LEASE_SECONDS) -> int:
+        """Put the jobs of ``run`` claimed more than ``lease`` seconds ago back in the queue."""
+        cur = self._conn().execute(
+            "UPDATE jobs SET status = 'pending', worker = NULL, claimed = NULL "
+            "WHERE run = ? AND status = 'running' AND claimed < ?",
+            (run, time.time() - lease),
+        )
+        return cur.rowcount
+
+    def drop(self, run: str) -> None:
+        self._conn().execute("DELETE FROM jobs WHERE run = ?", (run,))
+
+    def counts(self) -> dict[str, int]:
+        return dict(self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+def run_job(fn: str, payload: dict, dispatcher, *, api_base: str = "", api_key: str = "", cache=None) -> dict:
+    """Send one job through ``dispatcher`` and describe the outcome as JSON."""
+    import tournament_utils
+
+    if fn not in JOB_FUNCTIONS:
+        return {"error": f"unknown job function {fn!r}"}
+    kwargs = dict(payload["kwargs"], api_base=api_base, api_key=api_key, cache=cache, return_usage=True)
+    try:
+        (text, usage), retries = dispatcher.call(kwargs["model"], getattr(tournament_utils, fn), *payload["args"], **kwargs)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"text": text, "usage": plain_usage(usage), "retries": retries}
+
+
+def work(
+    path: str,
+    *,
+    threads: int = 4,
+    stop=None,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    judge_cache_path: str = "",
+    dispatcher=None,
+    name: str | None = None,
+) -> int:
+    """Claim and run jobs from the table at ``path`` on ``threads`` threads until ``stop`` is set.
+
+    ``stop`` is any object with ``is_set()`` (a threading or multiprocessing
+    event); without one the worker runs until interrupted. Returns the
+    number of jobs run.
+    """
+    import engine
+
+    table = JobTable(path)
+    if dispatcher is None:
+        dispatcher = engine.default_dispatcher()
+    api_base = engine.API_BASE_DEFAULT if api_base is None else api_base
+    api_key = engine.API_TOKEN_DEFAULT if api_key is None else api_key
+    cache = None
+    if judge_cache_path:
+        from judge_cache import JudgeCache
+
+        cache = JudgeCache(judge_cache_path, engine.JUDGE_CACHE_MAX_ENTRIES_DEFAULT, engine.JUDGE_CACHE_TTL_DEFAULT)
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    done = itertools.count()
+
+    def loop():
+        idle = POLL_INTERVAL
+        while stop is None or not stop.is_set():
+            job = table.claim(name)
+            if job is None:
+                time.sleep(idle)
+                idle = min(IDLE_INTERVAL, idle * 2)
+                continue
+            idle = POLL_INTERVAL
+            job_id, fn, payload = job
+            table.finish(job_id, run_job(fn, payload, dispatcher, api_base=api_base, api_key=api_key, cache=cache))
+            next(done)
+
+    pool = [threading.Thread(target=loop, daemon=True) for _ in range(max(1, threads))]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return next(done)
+
+
+class Coordinator:
+    """Send the judge calls of one tournament to a job table and wait for the answers.
+
+    A poller thread collects finished jobs and resolves their futures. With
+    ``processes`` > 0 that many local worker processes are started; they stop
+    when :meth:`close` is called (or this object is garbage collected).
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        processes: int = 0,
+        threads: int = 4,
+        api_base: str = "",
+        api_key: str = "",
+        judge_cache_path: str = "",
+    ):
+        self.path = path
+        self.table = JobTable(path)
+        self.run = uuid.uuid4().hex
+        self.jobs_by_worker: dict[str, int] = {}
+        self.requeued = 0
+        self._pending: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._poller = threading.Thread(target=self._poll, daemon=True)
+        self._poller.start()
+        self._processes = []
+        if processes > 0:
+            import multiprocessing
+
+            # Spawned, not forked: the tournament process already runs threads.
+            ctx = multiprocessing.get_context("spawn")
+            self._stop = ctx.Event()
+            for _ in range(processes):
+                proc = ctx.Process(
+                    target=work,
+                    args=(path,),
+                    kwargs=dict(
+                        threads=threads,
+                        stop=self._stop,
+                        api_base=api_base,
+                        api_key=api_key,
+                        judge_cache_path=judge_cache_path,
+                    ),
+                    daemon=True,
+                )
+                proc.start()
+                self._processes.append(proc)
+            self._finalizer = weakref.finalize(self, self._stop.set)
+
+    def submit(self, fn, args, kwargs: dict) -> Future:
+        """Post a call of the judge function ``fn``; the future resolves to ``((text, usage), retries)``."""
+        name = job_name(fn)
+        if name is None:
+            raise ValueError(f"{fn!r} cannot run on a shard worker")
+        future: Future = Future()
+        job = {k: v for k, v in kwargs.items() if k not in LOCAL_KWARGS}
+        with self._lock:
+            self._pending[self.table.post(self.run, name, args, job)] = future
+        return future
+
+    def call(self, fn, args, kwargs: dict):
+        return self.submit(fn, args, kwargs).result()
+
+    def _poll(self) -> None:
+        last_requeue = time.monotonic()
+        while not self._closed.is_set():
+            with self._lock:
+                waiting = bool(self._pending)
+            if not waiting:
+                self._closed.wait(POLL_INTERVAL)
+                continue
+            for job_id, worker, result in self.table.collect(self.run):
+                with self._lock:
+                    future = self._pending.pop(job_id, None)
+                    self.jobs_by_worker[worker] = self.jobs_by_worker.get(worker, 0) + 1
+                if future is None or not future.set_running_or_notify_cancel():
+                    continue
+                if "error" in result:
+                    future.set_exception(ShardJobError(result["error"]))
+                else:
+                    future.set_result(((result["text"], result["usage"]), result["retries"]))
+            if self._processes and not any(proc.is_alive() for proc in self._processes):
+                self._fail_pending(ShardJobError("every local shard worker has exited"))
+            if time.monotonic() - last_requeue > LEASE_SECONDS / 10:
+                self.requeued += self.table.requeue_stale(self.run)
+                last_requeue = time.monotonic()
+            self._closed.wait(POLL_INTERVAL)
+
+    def summary(self) -> str:
+        jobs = sum(self.jobs_by_worker.values())
+        text = f"Shards: {jobs} judge calls on {len(self.jobs_by_worker)} workers"
+        if self.requeued:
+            text += f", {self.requeued} requeued after a worker stopped answering"
+        return text
+
+    def close(self) -> None:
+        """Stop polling and the local workers, and drop whatever is left of this run."""
+        self._closed.set()
+        self._poller.join()
+        if self._processes:
+            self._stop.set()
+            for proc in self._processes:
+                proc.join(timeout=5)
+        self.table.drop(self.run)
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+
+    def _fail_pending(self, error: Exception) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+
+def parse_args(argv=None):
+    import engine
+
+    p = argparse.ArgumentParser(description="Run judge calls posted to a shard job table.")
+    p.add_argument("jobs", help="SQLite job table shared with the tournaments")
+    p.add_argument("--threads", type=int, default=4, help="calls this worker runs at the same time")
+    p.add_argument("--judge-cache", default=engine.JUDGE_CACHE_PATH_DEFAULT)
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        work(args.jobs, threads=args.threads, judge_cache_path=args.judge_cache)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv("./local.env", override=True)
+    sys.exit(main())
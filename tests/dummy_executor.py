@@ -0,0 +1,26 @@
+"""Executor that runs every submitted call inline when its result is asked for."""
+
+
+class DummyFuture:
+    def __init__(self, func, *args):
+        self._func = func
+        self._args = args
+    def result(self):
+        return self._func(*self._args)
+    def cancel(self):
+        return True
+
+class DummyExecutor:
+    def __init__(self, *args, **kwargs):
+        pass
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc, tb):
+        pass
+    def submit(self, func, *args):
+        return DummyFuture(func, *args)
+    def map(self, func, *iterables):
+        for items in zip(*iterables):
+            yield func(*items)
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
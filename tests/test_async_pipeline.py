@@ -0,0 +1,128 @@
+import sys, os
+import asyncio
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import async_pipeline as ap
+from pairing import make_scheduler
+
+
+def test_parse_model_limits():
+    assert ap.parse_model_limits('gpt-4o=2, openai/gpt-4o-mini=10,bad') == {'gpt-4o': 2, 'openai/gpt-4o-mini': 10}
+    assert ap.parse_model_limits('') == {}
+
+
+def test_certain_survivors():
+    # Two players still unscored: only the leader is safe in a pool of three.
+    assert ap.certain_survivors({0: 9, 1: 8}, 4, 3) == [0]
+    assert ap.certain_survivors({0: 9, 1: 8, 2: 1, 3: 0}, 4, 3) == [0, 1, 2]
+
+
+def test_limiter_bounds_concurrency_per_model():
+    active = {'m': 0, 'peak': 0}
+
+    async def main():
+        limiter = ap.ConcurrencyLimiter(10, {'m': 2})
+
+        async def call():
+            async with limiter.slot('m'):
+                active['m'] += 1
+                active['peak'] = max(active['peak'], active['m'])
+                await asyncio.sleep(0.01)
+                active['m'] -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert active['peak'] == 2
+
+
+def test_pairwise_starts_while_stragglers_score():
+    values = [9, 8, 7, 0]
+
+    async def main():
+        first_match = asyncio.Event()
+        rating = {}
+        order = []
+
+        async def score(i):
+            if i == 3:
+                # The straggler only finishes once a match has started.
+                await asyncio.wait_for(first_match.wait(), timeout=1)
+            order.append(('score', i))
+            return values[i]
+
+        async def play(i, j):
+            first_match.set()
+            order.append(('match', i, j))
+            return min(i, j)
+
+        def on_match(i, j, winner):
+            rating.setdefault(i, 1000.0)
+            rating.setdefault(j, 1000.0)
+            rating[winner] += 1
+
+        scores, pool = await ap.score_and_play(
+            4,
+            score=score,
+            play=play,
+            on_match=on_match,
+            make_scheduler=lambda pool: make_scheduler('round_robin', pool),
+            rating=rating,
+            pool_size=3,
+        )
+        return scores, pool, order
+
+    scores, pool, order = asyncio.run(main())
+    assert pool == [0, 1, 2]
+    assert order.index(('match', 0, 1)) < order.index(('score', 3))
+    matches = [o for o in order if o[0] == 'match']
+    assert len(matches) == 3
+
+
+def test_should_stop_cancels_pending_matches():
+    async def main():
+        matches = []
+
+        async def play(i, j):
+            await asyncio.sleep(0.01 * (i + j))
+            return i
+
+        scores, pool = await ap.score_and_play(
+            5,
+            score=None,
+            play=play,
+            on_match=lambda i, j, winner: matches.append((i, j)),
+            make_scheduler=lambda pool: make_scheduler('round_robin', pool),
+            rating={i: 1000.0 for i in range(5)},
+            pool_size=5,
+            should_stop=lambda: len(matches) >= 1,
+        )
+        return matches
+
+    matches = asyncio.run(main())
+    assert matches == [(0, 1)]
+
+
+def test_players_scored_none_are_left_out_of_the_pool():
+    async def main():
+        async def score(i):
+            return None if i == 1 else 10 - i
+
+        async def play(i, j):
+            return i
+
+        return await ap.score_and_play(
+            4,
+            score=score,
+            play=play,
+            on_match=lambda i, j, winner: None,
+            make_scheduler=lambda pool: make_scheduler('round_robin', pool),
+            rating={},
+            pool_size=3,
+        )
+
+    scores, pool = asyncio.run(main())
+    assert 1 not in scores
+    assert pool == [0, 2, 3]
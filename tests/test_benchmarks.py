@@ -0,0 +1,64 @@
+import sys, os, types
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Provide dummy litellm module so import succeeds
+fake_litellm = types.ModuleType('litellm')
+sys.modules.setdefault('litellm', fake_litellm)
+
+import tournament_utils
+from benchmarks import run as bench
+from benchmarks.fake_llm import FakeLLM, RateLimitError, quality
+from dispatch import is_retryable, retry_after
+
+
+def test_fake_judge_without_noise_prefers_the_better_answer():
+    backend = FakeLLM(judge_noise=0, time_scale=0)
+    with backend.installed():
+        good, bad = sorted(tournament_utils.generate_players("q", 2), key=quality, reverse=True)
+        assert tournament_utils.prompt_pairwise("q", "1) Factuality", bad, good) == 'Final verdict: B'
+        assert tournament_utils.prompt_pairwise("q", "1) Factuality", good, bad, layout="split") == 'Final verdict: A'
+        verdict = tournament_utils.prompt_rank("q", "1) Factuality", [bad, good])
+    assert verdict == 'Final verdict: [2, 1]'
+    assert tournament_utils.completion is not backend.completion
+    assert backend.calls == {'generate': 1, 'pairwise': 2, 'rank': 1}
+
+
+def test_fake_generation_is_deterministic_and_caps_n():
+    streamed = FakeLLM(seed=3, time_scale=0)
+    batched = FakeLLM(seed=3, time_scale=0)
+    capped = FakeLLM(seed=3, time_scale=0, n_cap=2)
+    with streamed.installed():
+        one_by_one = [tournament_utils.generate_players("q", 1)[0] for _ in range(4)]
+    with batched.installed():
+        assert tournament_utils.generate_players("q", 4) == one_by_one
+    with capped.installed():
+        assert len(tournament_utils.generate_players("q", 4)) == 2
+
+
+def test_fake_rate_limit_is_retryable():
+    backend = FakeLLM(time_scale=1, rpm=1, latency=None)
+    backend.latency.median = 0
+    backend.latency.per_token = 0
+    backend.latency.tail_prob = 0
+    backend.completion(model='m', messages=[{'role': 'user', 'content': 'q'}])
+    with pytest.raises(RateLimitError) as err:
+        backend.completion(model='m', messages=[{'role': 'user', 'content': 'q'}])
+    assert is_retryable(err.value)
+    assert 0 < retry_after(err.value) <= 60
+    assert backend.rejected == 1
+
+
+def test_benchmark_run_measures_recall_and_compares_files():
+    settings = vars(bench.parse_args(['--time-scale', '0', '--judge-noise', '0']))
+    config = {'strategy': 'round_robin', 'pipeline': 'threads', 'workers': 4, 'pool_size': 6, 'seed': 0}
+    row = bench.run_config(config, settings)
+    assert row['recall'] == 1.0 and row['top1']
+    assert row['calls']['generate'] == 1 and row['judge_calls'] == row['calls']['score'] + row['calls']['pairwise']
+    assert row['tokens'] > 0
+    slower = dict(row, wall_s=row['wall_s'] * 2 + 1)
+    report = bench.compare_table({'commit': 'a', 'runs': [row]}, {'commit': 'b', 'runs': [slower]})
+    assert 'round_robin' in report and ' !' in report
@@ -0,0 +1,145 @@
+import sys, os, types
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Provide dummy litellm module so import succeeds
+fake_litellm = types.ModuleType('litellm')
+sys.modules.setdefault('litellm', fake_litellm)
+
+import engine
+from benchmarks.fake_llm import FakeLLM
+from budget import Budget, BudgetExceeded, CallCosts, Planner
+from dispatch import Dispatcher
+
+
+def make_planner(**kwargs):
+    costs = CallCosts('Explain the claim.', '1) Factuality\n2) Precision', answer_tokens=100)
+    settings = dict(
+        models={'generate': 'g', 'score': 's', 'pairwise': 'p'},
+        pairing_mode='round_robin',
+        num_top_picks=2,
+        max_workers=10,
+    )
+    settings.update(kwargs)
+    return Planner(costs, **settings)
+
+
+def test_budget_refuses_calls_beyond_the_limit_and_charges_real_usage():
+    budget = Budget(max_tokens=100)
+    first = budget.admit('m', (40, 20))
+    # The first call is still in flight, so its estimate counts against the second.
+    with pytest.raises(BudgetExceeded):
+        budget.admit('m', (30, 20))
+    budget.settle(first, 'm', {'prompt_tokens': 30, 'completion_tokens': 10})
+    budget.settle(budget.admit('m', (30, 20)), 'm', None)
+    assert budget.spent_tokens == 40 and budget.refused == 1 and budget.exhausted
+    assert budget.summary() == 'Budget: 40 of 100 tokens used, 1 calls refused'
+
+
+def test_planner_keeps_the_requested_tournament_when_it_fits():
+    plan = make_planner(max_tokens=1e9).plan(10, 5)
+    assert (plan.n_gen, plan.pool_size, plan.max_matches, plan.matches) == (10, 5, 0, 10)
+
+
+def test_planner_shrinks_generations_and_pool_together_before_capping_matches():
+    planner = make_planner()
+    full = planner.estimate(10, 5, 10)[0]
+    planner.max_tokens = full - 1
+    plan = planner.plan(10, 5)
+    assert plan.n_gen < 10 and plan.pool_size < 5 and plan.max_matches == 0
+    assert plan.matches == planner.scheduled_matches(plan.pool_size) and plan.tokens <= full - 1
+    # Only the smallest tournament fits.
+    planner.max_tokens = planner.estimate(2, 2, 1)[0]
+    plan = planner.plan(10, 5)
+    assert (plan.n_gen, plan.pool_size, plan.matches) == (2, 2, 1)
+    planner.max_tokens = 10
+    assert planner.plan(10, 5) is None
+
+
+def test_planner_meets_the_latency_target_with_fewer_waves():
+    planner = make_planner(max_workers=1, latency_target=30)
+    plan = planner.plan(20, 10)
+    assert plan.seconds <= 30 and plan.matches < planner.scheduled_matches(10)
+    assert make_planner(max_workers=100, latency_target=30).plan(20, 10).matches == 45
+
+
+def test_planner_replans_pool_and_matches_after_generation():
+    planner = make_planner(max_tokens=5000)
+    plan = planner.plan(10, 10, done={'generate'}, spent_tokens=1500)
+    assert plan.n_gen == 10 and plan.tokens <= 3500
+
+
+def run_with_backend(backend, **kwargs):
+    args = dict(
+        api_base='', api_token='', generate_model='g', score_model='s', pairwise_model='p',
+        generate_temperature=0.9, score_temperature=0.5, pairwise_temperature=0.5,
+        instruction_input='Explain the claim.', criteria_input='Factuality,Precision',
+        n_gen=12, pool_size=8, num_top_picks=2, max_workers=4, enable_score_filter=True,
+        enable_pairwise_filter=True, score_with_instruction=True, pairwise_with_instruction=True,
+        generate_thinking=False, score_thinking=False, pairwise_thinking=False, dispatcher=Dispatcher(),
+    )
+    args.update(kwargs)
+    logs = []
+    with backend.installed():
+        state = engine.run(on_log=logs.append, **args)
+    return state, logs
+
+
+@pytest.mark.parametrize('options', [{}, {'use_async': True, 'stream_generation': True}])
+def test_engine_plans_within_the_token_budget(options):
+    state, logs = run_with_backend(FakeLLM(time_scale=0), token_budget=6000, **options)
+    assert any(line.startswith('Plan: ') for line in logs)
+    assert any(line.startswith('Re-planned for ') for line in logs)
+    assert state.budget.spent_tokens <= 6000 and state.budget.refused == 0
+    # Planned for the sampled answers, not for the much longer guess.
+    assert state.budget.spent_tokens > 3000 and len(state.players) > 3
+    assert state.to_dict()['budget']['spent_tokens'] == state.budget.spent_tokens
+    assert 'Budget: ' in state.usage_str()
+
+
+class GrowingLLM(FakeLLM):
+    """Answers after the first two are ten times longer, so the sample misleads the plan."""
+
+    def _answer(self, prompt, slot):
+        text = super()._answer(prompt, slot)
+        return text if slot < 2 else text + (' ' + text.split(' ', 1)[1]) * 9
+
+
+def test_engine_refuses_calls_once_the_budget_is_spent():
+    backend = GrowingLLM(time_scale=0)
+    state, logs = run_with_backend(backend, token_budget=15000, use_async=True, stream_generation=True)
+    assert 'The rest of the budget does not cover judging every player; calls beyond it will be refused' in logs
+    assert state.budget.refused > 0 and state.budget.spent_tokens <= 15000
+    assert backend.calls['pairwise'] < 28
+    assert state.top_picks
+
+
+def test_engine_rejects_a_budget_too_small_for_any_tournament():
+    with pytest.raises(ValueError, match='do not allow even the smallest tournament of 2 generations'):
+        run_with_backend(FakeLLM(time_scale=0), token_budget=100)
+
+
+def test_planner_reports_the_smallest_tournament_it_would_accept():
+    planner = make_planner()
+    smallest = planner.smallest(10, 5)
+    # One match per pool player, not none.
+    assert (smallest.n_gen, smallest.pool_size, smallest.matches) == (2, 2, 1)
+    planner.max_tokens = smallest.tokens
+    assert planner.plan(10, 5) is not None
+    planner.max_tokens = smallest.tokens - 1
+    assert planner.plan(10, 5) is None
+    # Sampled answers are paid for and kept.
+    sampled = planner.plan(10, 5, generated=4, spent_tokens=0)
+    assert sampled is None or sampled.n_gen >= 4
+    assert planner.smallest(10, 5, generated=4).n_gen == 4
+    assert planner.estimate(10, 5, 10, generated=4)[0] < planner.estimate(10, 5, 10)[0]
+
+
+def test_planner_charges_every_model_of_an_ensemble():
+    single = make_planner().estimate(10, 5, 10)[0]
+    ensemble = make_planner(models={'generate': 'g', 'score': ['s1', 's2'], 'pairwise': ['p1', 'p2']})
+    assert ensemble.estimate(10, 5, 10)[0] > single
+    assert ensemble.estimate(10, 5, 10, done={'generate'})[0] == 2 * make_planner().estimate(10, 5, 10, done={'generate'})[0]
@@ -0,0 +1,39 @@
+import sys, os
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import charts
+
+
+def test_histogram_data_counts_scores_in_equal_bins():
+    data = charts.histogram_data([1.0, 2.0, 2.5, 10.0], bins=3)
+    assert data == {'kind': 'histogram', 'edges': [1.0, 4.0, 7.0, 10.0], 'counts': [3, 0, 1]}
+    assert charts.histogram_data([5.0, 5.0], bins=2)['counts'] == [0, 2]
+    assert charts.histogram_data([])['counts'] == []
+
+
+def test_elo_data_ranks_best_first():
+    data = charts.elo_data({'a': 990.04, 'b': 1010.0}, {'a': 12.0, 'b': 8.0})
+    assert data == {'kind': 'elo', 'ratings': [1010.0, 990.0], 'stderr': [8.0, 12.0]}
+    assert 'stderr' not in charts.elo_data({'a': 1000.0}, {})
+
+
+def test_json_charts_are_rendered_on_the_chart_thread_without_matplotlib():
+    data = charts.elo_data({'a': 1000.0})
+    assert charts.submit(data, 'json').result(timeout=10) is data
+    with pytest.raises(ValueError, match='Unknown chart format'):
+        charts.render(data, 'png')
+
+
+def test_figures_and_svg_use_their_own_figure():
+    pytest.importorskip('matplotlib.figure')
+    import matplotlib.pyplot as plt
+
+    open_before = plt.get_fignums()
+    fig = charts.submit(charts.histogram_data([1.0, 2.0, 3.0]), 'figure').result(timeout=30)
+    assert fig.axes and plt.get_fignums() == open_before
+    svg = charts.render(charts.elo_data({'a': 1000.0, 'b': 1020.0}, {'a': 5.0, 'b': 5.0}), 'svg')
+    assert svg.startswith('<svg') and plt.get_fignums() == open_before
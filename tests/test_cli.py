@@ -0,0 +1,105 @@
+import sys, os, types, json
+from unittest.mock import patch, MagicMock, AsyncMock
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Provide dummy litellm module so import succeeds
+fake_litellm = types.ModuleType('litellm')
+fake_litellm.completion = MagicMock()
+fake_litellm.acompletion = AsyncMock()
+sys.modules.setdefault('litellm', fake_litellm)
+
+# Provide dummy dotenv module
+fake_dotenv = types.ModuleType('dotenv')
+fake_dotenv.load_dotenv = MagicMock()
+sys.modules.setdefault('dotenv', fake_dotenv)
+
+import cli
+import engine
+
+
+def fake_run(**kwargs):
+    state = engine.TournamentState()
+    state.instruction = kwargs['instruction_input']
+    state.top_picks = [f"best for {kwargs['instruction_input']}"]
+    state.metrics.record('generate', 'gm', 0.5, {'prompt_tokens': kwargs['n_gen'], 'completion_tokens': 1})
+    return state
+
+
+def write_jsonl(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write((row if isinstance(row, str) else json.dumps(row)) + '\n')
+
+
+def read_jsonl(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_cli_runs_batch_with_per_line_overrides(tmp_path):
+    src = tmp_path / 'in.jsonl'
+    out = tmp_path / 'out.jsonl'
+    write_jsonl(src, [{'id': 'a', 'instruction': 'q1'}, {'instruction': 'q2', 'n_gen': 7, 'bogus': 1}])
+    with patch('cli.engine.run', side_effect=lambda on_log=None, **kw: fake_run(**kw)) as mock_run:
+        code = cli.main([str(src), '-o', str(out), '--n-gen', '3', '--concurrency', '2'])
+
+    assert code == 0
+    rows = {r['id']: r for r in read_jsonl(out)}
+    assert set(rows) == {'a', 2}
+    assert rows['a']['top_picks'] == [{'text': 'best for q1'}]
+    assert rows['a']['usage']['prompt_tokens'] == 3
+    assert rows[2]['usage']['prompt_tokens'] == 7
+    assert all('bogus' not in c.kwargs for c in mock_run.call_args_list)
+
+
+def test_cli_resumes_from_checkpoint_and_retries_failures(tmp_path):
+    src = tmp_path / 'in.jsonl'
+    out = tmp_path / 'out.jsonl'
+    write_jsonl(src, [{'id': i, 'instruction': f'q{i}'} for i in range(4)])
+    write_jsonl(out, [
+        {'id': 0, 'top_picks': []},
+        {'id': 1, 'error': 'RuntimeError: boom'},
+        '{"id": 2, "top_pi',
+    ])
+    with patch('cli.engine.run', side_effect=lambda on_log=None, **kw: fake_run(**kw)) as mock_run:
+        code = cli.main([str(src), '-o', str(out)])
+
+    assert code == 0
+    assert sorted(c.kwargs['instruction_input'] for c in mock_run.call_args_list) == ['q1', 'q2', 'q3']
+    assert cli.completed_ids(str(out)) == {0, 1, 2, 3}
+
+
+def test_cli_records_errors_and_exit_code(tmp_path):
+    src = tmp_path / 'in.jsonl'
+    out = tmp_path / 'out.jsonl'
+    write_jsonl(src, [{'id': 'x', 'instruction': 'q'}])
+    with patch('cli.engine.run', side_effect=RuntimeError('rate limited')):
+        code = cli.main([str(src), '-o', str(out)])
+
+    assert code == 1
+    assert read_jsonl(out) == [{'id': 'x', 'instruction': 'q', 'error': 'RuntimeError: rate limited'}]
+
+
+def test_cli_writes_merged_prometheus_metrics(tmp_path):
+    src = tmp_path / 'in.jsonl'
+    out = tmp_path / 'out.jsonl'
+    prom = tmp_path / 'metrics.prom'
+    write_jsonl(src, [{'instruction': 'q1'}, {'instruction': 'q2'}])
+    with patch('cli.engine.run', side_effect=lambda on_log=None, **kw: fake_run(**kw)):
+        cli.main([str(src), '-o', str(out), '--n-gen', '3', '--prometheus', str(prom)])
+
+    text = prom.read_text()
+    assert 'llm_tournament_calls_total{stage="generate",model="gm"} 2' in text
+    assert 'llm_tournament_prompt_tokens_total{stage="generate",model="gm"} 6' in text
+
+
+def test_cli_keeps_one_journal_per_instruction(tmp_path):
+    src = tmp_path / 'in.jsonl'
+    write_jsonl(src, [{'id': 'a', 'instruction': 'q1'}, {'id': 'b', 'instruction': 'q2'}])
+    with patch('cli.engine.run', side_effect=lambda on_log=None, **kw: fake_run(**kw)) as mock_run:
+        cli.main([str(src), '-o', str(tmp_path / 'out.jsonl'), '--journal-dir', str(tmp_path / 'journals')])
+    paths = sorted(c.kwargs['journal_path'] for c in mock_run.call_args_list)
+    assert paths == [str(tmp_path / 'journals' / 'a.jsonl'), str(tmp_path / 'journals' / 'b.jsonl')]
+    assert all('journal_dir' not in c.kwargs and c.kwargs['journal_mode'] == 'resume' for c in mock_run.call_args_list)
@@ -0,0 +1,36 @@
+import sys, os
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dedup import DuplicateIndex, shingles
+
+BASE = (
+    "Paris is the capital of France. It lies on the Seine and has been the political and cultural "
+    "centre of the country for centuries, home to the Louvre and the Eiffel Tower."
+)
+
+
+def test_exact_duplicates_collapse_ignoring_whitespace():
+    index = DuplicateIndex()
+    assert index.add(BASE, 0) == 0
+    assert index.add(BASE.replace(" ", "  ") + "\n", 1) == 0
+    assert index.add(BASE.replace("Paris", "Lyon"), 1) == 1
+    assert len(index) == 2
+    assert (index.exact, index.near) == (1, 0)
+
+
+def test_near_duplicates_collapse_above_threshold():
+    index = DuplicateIndex(0.7)
+    other = "Berlin is the capital of Germany and its largest city, famous for its history and museums."
+    # Ids are the caller's; they need not start at 0.
+    assert index.add(BASE, 7) == 7
+    assert index.add(BASE.replace("centuries", "many centuries"), 8) == 7
+    assert index.add(other, 8) == 8
+    assert len(index) == 2
+    assert (index.exact, index.near) == (0, 1)
+
+
+def test_shingles_of_short_texts():
+    assert shingles("Yes", 3) == {"yes"}
+    assert shingles("a b c d", 3) == {"a b c", "b c d"}
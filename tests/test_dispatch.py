@@ -0,0 +1,181 @@
+import sys, os, time, asyncio, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dispatch import Dispatcher, TokenBucket, is_retryable
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f'status {status_code}')
+        self.status_code = status_code
+        self.response = type('Response', (), {'headers': headers or {}})()
+
+
+class FakeServer:
+    """In-process stand-in for a completion endpoint with a requests-per-second limit."""
+
+    def __init__(self, per_second=0, fail_first=0, status=429, delays=()):
+        self.per_second = per_second
+        self.fail_first = fail_first
+        self.status = status
+        # Seconds the n-th call takes to answer.
+        self.delays = list(delays)
+        self.calls = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, model=None):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 1.0:
+                self._recent.popleft()
+            if self.calls <= self.fail_first or (self.per_second and len(self._recent) >= self.per_second):
+                self.rejected += 1
+                raise APIError(self.status)
+            self._recent.append(now)
+            delay = self.delays[self.calls - 1] if self.calls <= len(self.delays) else 0
+        time.sleep(delay)
+        return f'answer to {prompt}', {'prompt_tokens': 10, 'completion_tokens': 5}
+
+
+def test_retries_rate_limits_with_backoff():
+    delays = []
+    server = FakeServer(fail_first=3)
+    d = Dispatcher(max_retries=4, base_delay=0.5, sleep=delays.append)
+    (text, usage), retries = d.call('m', server, 'q', model='m')
+    assert text == 'answer to q'
+    assert retries == 3
+    assert len(delays) == 3
+    assert all(0 <= delay <= 0.5 * 2**i for i, delay in enumerate(delays))
+
+
+def test_honours_retry_after():
+    d = Dispatcher(base_delay=0.01)
+    assert d.backoff(0, APIError(429, {'retry-after': '7'})) >= 7
+
+
+def test_gives_up_after_max_retries_and_on_fatal_errors():
+    d = Dispatcher(max_retries=2, sleep=lambda s: None)
+    server = FakeServer(fail_first=10)
+    with pytest.raises(APIError):
+        d.call('m', server, 'q', model='m')
+    assert server.calls == 3
+
+    fatal = FakeServer(fail_first=10, status=401)
+    with pytest.raises(APIError):
+        d.call('m', fatal, 'q', model='m')
+    assert fatal.calls == 1
+    assert not is_retryable(APIError(400))
+    assert is_retryable(TimeoutError())
+
+
+def test_request_bucket_keeps_throughput_under_the_limit():
+    server = FakeServer(per_second=45)
+    d = Dispatcher(rpm=40 * 60, max_retries=0)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        list(ex.map(lambda i: d.call('m', server, i, model='m'), range(40)))
+    elapsed = time.monotonic() - start
+    # Paced at 40/s: no 429s, and no slower than the limit requires.
+    assert server.rejected == 0
+    assert 0.9 <= elapsed < 2
+
+
+def test_token_bucket_charges_usage_after_the_fact():
+    bucket = TokenBucket(per_minute=60 * 100, burst=100)
+    assert bucket.reserve(0) == 0
+    bucket.charge(300)
+    assert bucket.reserve(0) == pytest.approx(2.0, abs=0.05)
+
+
+def test_hedge_answers_before_a_slow_first_request():
+    server = FakeServer(delays=[1.0, 0.1])
+    lost = []
+    d = Dispatcher(hedge_after=0.1, hedge_workers=1)
+    start = time.monotonic()
+    (text, _), retries = d.call('m', server, 'q', model='m', on_lost=lambda result, seconds: lost.append(seconds))
+    elapsed = time.monotonic() - start
+    # hedge_after plus the hedge's own latency, not the second of the first request.
+    assert text == 'answer to q' and retries == 0 and server.calls == 2
+    assert 0.2 <= elapsed < 0.5
+    assert not lost
+    time.sleep(1.0)
+    # The slow first request was paid for all the same.
+    assert len(lost) == 1 and lost[0] >= 0.9
+
+
+def test_hedge_stands_in_for_a_failing_first_request():
+    calls = []
+
+    def stalled_then_failed(prompt, model=None):
+        calls.append(prompt)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            raise APIError(503)
+        time.sleep(0.5)
+        return 'hedged', None
+
+    d = Dispatcher(hedge_after=0.05, hedge_workers=1, sleep=lambda _: None)
+    (text, _), retries = d.call('m', stalled_then_failed, 'q', model='m')
+    # The hedge covers the failure; no retry was needed.
+    assert (text, retries) == ('hedged', 0) and len(calls) == 2
+
+
+def test_losing_hedge_is_charged():
+    calls = []
+    lost = []
+    booked = threading.Event()
+
+    def server(prompt, model=None):
+        calls.append(prompt)
+        if len(calls) == 1:
+            time.sleep(0.15)
+            return 'first', {'prompt_tokens': 60, 'completion_tokens': 0}
+        time.sleep(0.2)
+        return 'hedge', {'prompt_tokens': 40, 'completion_tokens': 0}
+
+    d = Dispatcher(tpm=60 * 10, hedge_after=0.05, hedge_workers=1)
+    (text, _), _ = d.call('m', server, 'q', model='m', on_lost=lambda result, seconds: lost.append(result) or booked.set())
+    assert text == 'first' and len(calls) == 2
+    assert booked.wait(2)
+    assert lost == [('hedge', {'prompt_tokens': 40, 'completion_tokens': 0})]
+    # Both answers were paid for: about 9 seconds of debt at 10 tokens per second, not 5.
+    assert d._model_buckets('m')[1].reserve(0) > 7
+    # A fast first request sends no hedge at all.
+    (text, _), _ = d.call('n', lambda prompt, model=None: ('quick', None), 'q', model='n')
+    assert text == 'quick' and len(calls) == 2
+
+
+def test_async_hedge_and_retry():
+    state = {'calls': 0}
+
+    async def server(prompt, model=None):
+        state['calls'] += 1
+        if state['calls'] == 1:
+            raise APIError(503)
+        if state['calls'] == 2:
+            await asyncio.sleep(1.0)
+            return 'slow', None
+        return 'fast', None
+
+    async def no_sleep(_):
+        return None
+
+    d = Dispatcher(hedge_after=0.05, asleep=no_sleep)
+
+    async def main():
+        # asyncio.wait needs a real timeout, so only the backoff sleeps are skipped.
+        return await d.acall('m', server, 'q', model='m')
+
+    start = time.monotonic()
+    (text, _), retries = asyncio.run(main())
+    assert (text, retries) == ('fast', 1)
+    assert time.monotonic() - start < 0.5
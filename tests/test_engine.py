@@ -0,0 +1,453 @@
+import sys, os, types, threading, time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Provide dummy litellm module so import succeeds
+fake_litellm = types.ModuleType('litellm')
+fake_litellm.completion = MagicMock()
+fake_litellm.acompletion = AsyncMock()
+sys.modules.setdefault('litellm', fake_litellm)
+
+import engine
+from dummy_executor import DummyExecutor
+
+
+def test_combine_orderings_cancels_position_bias():
+    assert engine._combine_orderings('x', 'y', ['x', 'x']) == 'x'
+    # Each ordering picked the player shown first.
+    assert engine._combine_orderings('x', 'y', ['x', 'y']) is engine.TIE
+    assert engine._combine_orderings('x', 'y', [None, 'y']) == 'y'
+    assert engine._combine_orderings('x', 'y', [None, None]) is None
+
+
+def test_run_returns_structured_result_without_ui():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 2}
+    logs = []
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_score') as mock_score, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: futs):
+        mock_gen.return_value = (['p1', 'p2', 'p3'], usage)
+        mock_score.side_effect = lambda instr, cl, block, player, **kw: (
+            {'p1': "Final verdict: [3]", 'p2': "Final verdict: [9]", 'p3': "Final verdict: [6]"}[player], usage
+        )
+        mock_pair.side_effect = lambda instr, block, a, b, **kw: (
+            "Final verdict: A" if (a, b) == ('p2', 'p3') else "Final verdict: B", usage
+        )
+        state = engine.run(
+            api_base='b',
+            api_token='k',
+            generate_model='gm',
+            score_model='sm',
+            pairwise_model='pm',
+            generate_temperature=1,
+            score_temperature=1,
+            pairwise_temperature=1,
+            instruction_input=' instr ',
+            criteria_input='c1',
+            n_gen=3,
+            pool_size=2,
+            num_top_picks=1,
+            max_workers=1,
+            enable_score_filter=True,
+            enable_pairwise_filter=True,
+            score_with_instruction=True,
+            pairwise_with_instruction=True,
+            generate_thinking=False,
+            score_thinking=False,
+            pairwise_thinking=False,
+            on_log=logs.append,
+        )
+
+    assert state.pool == ['p2', 'p3']
+    assert state.top_picks == ['p2']
+    assert '3 players generated' in logs
+    result = state.to_dict()
+    assert result['instruction'] == 'instr'
+    assert result['num_players'] == 3
+    assert result['top_picks'][0]['text'] == 'p2'
+    assert result['top_picks'][0]['score'] == 9
+    assert 'rating' in result['top_picks'][0]
+    assert result['usage'] == {'prompt_tokens': 5, 'completion_tokens': 10}
+    calls = {(row['stage'], row['model']): row['calls'] for row in result['metrics']}
+    assert calls == {('generate', 'gm'): 1, ('score', 'sm'): 3, ('pairwise', 'pm'): 1}
+
+
+def stream_kwargs(**overrides):
+    kwargs = dict(
+        api_base='b',
+        api_token='k',
+        generate_model='gm',
+        score_model='sm',
+        pairwise_model='pm',
+        generate_temperature=1,
+        score_temperature=1,
+        pairwise_temperature=1,
+        instruction_input='instr',
+        criteria_input='c1',
+        n_gen=4,
+        pool_size=2,
+        num_top_picks=2,
+        max_workers=4,
+        enable_score_filter=True,
+        enable_pairwise_filter=False,
+        score_with_instruction=True,
+        pairwise_with_instruction=True,
+        generate_thinking=False,
+        score_thinking=False,
+        pairwise_thinking=False,
+        stream_generation=True,
+    )
+    kwargs.update(overrides)
+    return kwargs
+
+
+def test_early_stop_counts_the_matches_still_running():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    players = [f'p{i}' for i in range(8)]
+    judged = []
+    release = threading.Event()
+    lock = threading.Lock()
+
+    def pairwise(instr, block, a, b, **kw):
+        with lock:
+            judged.append((a, b))
+            first = len(judged) == 1
+        # The first match settles the run while the other workers are busy.
+        if not first:
+            release.wait(5)
+        return "Final verdict: A", usage
+
+    class Settled:
+        def __init__(self, *args):
+            pass
+
+        def result(self, bt):
+            # Let the busy workers finish once the queued matches are cancelled.
+            threading.Timer(0.1, release.set).start()
+            return True
+
+    logs = []
+    with patch('engine.generate_players', return_value=(players, usage)), \
+         patch('engine.prompt_pairwise', side_effect=pairwise), \
+         patch('rating.EarlyStop', Settled):
+        state = engine.run(
+            **stream_kwargs(
+                n_gen=8, pool_size=8, num_top_picks=1, enable_score_filter=False, enable_pairwise_filter=True,
+                stream_generation=False, early_stop_confidence=0.5,
+            ),
+            on_log=logs.append,
+        )
+
+    line = next(l for l in logs if l.startswith('Early stop'))
+    played = len(judged)
+    assert 1 < played < 28
+    assert f'after {played} matches, {28 - played} of 28 scheduled judge calls saved' in line
+    assert state.metrics.totals().calls == played + 1
+
+
+def test_stream_generation_fans_out_single_completions():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    outputs = iter(['p1', 'p2', 'p3', 'p4'])
+    logs = []
+    with patch('engine.generate_players', side_effect=lambda *a, **kw: ([next(outputs)], usage)) as mock_gen, \
+         patch('engine.prompt_score') as mock_score, \
+         patch('engine.prompt_score_batch') as mock_batch, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: list(futs)):
+        mock_score.side_effect = lambda instr, cl, block, player, **kw: (f"Final verdict: [{player[1]}]", usage)
+        mock_batch.side_effect = lambda instr, cl, block, players, **kw: (
+            f"Final verdict: {[[int(p[1])] for p in players]}", usage
+        )
+        state = engine.run(**stream_kwargs(score_batch_size=3), on_log=logs.append)
+
+    assert [c.args[1] for c in mock_gen.call_args_list] == [1, 1, 1, 1]
+    # p1-p3 fill one batch as they arrive, p4 is scored on its own.
+    assert [c.args[3] for c in mock_batch.call_args_list] == [['p1', 'p2', 'p3']]
+    assert [c.args[3] for c in mock_score.call_args_list] == ['p4']
+    assert state.pool == ['p4', 'p3']
+    assert any(l.startswith('Completion 1 (') and 's): (ID 1) p1' in l for l in logs)
+    assert any(l.startswith('First score ready after') for l in logs)
+    assert state.prompt_tokens == 6
+
+
+def test_stream_generation_scores_while_generations_are_still_queued():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    counter = iter(range(100))
+    generated, scored = [], []
+
+    def generate(*args, **kwargs):
+        generated.append(time.perf_counter())
+        time.sleep(0.02)
+        return [f'p{next(counter)}'], usage
+
+    def score(instr, cl, block, player, **kw):
+        scored.append(time.perf_counter())
+        return "Final verdict: [5]", usage
+
+    with patch('engine.generate_players', side_effect=generate), patch('engine.prompt_score', side_effect=score):
+        engine.run(**stream_kwargs(n_gen=12, pool_size=4, max_workers=2, score_batch_size=1))
+
+    assert len(generated) == len(scored) == 12
+    # The first player is scored before the last generation request even starts.
+    assert min(scored) < max(generated)
+
+
+def test_stream_generation_async_scores_each_player_once_generated():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    outputs = iter(['p1', 'p2', 'p3'])
+    logs = []
+
+    async def fake_generate(*args, **kwargs):
+        return [next(outputs)], usage
+
+    async def fake_score(instr, cl, block, player, **kw):
+        return f"Final verdict: [{player[1]}]", usage
+
+    with patch('engine.agenerate_players', side_effect=fake_generate) as mock_gen, \
+         patch('engine.aprompt_score', side_effect=fake_score) as mock_score:
+        state = engine.run(**stream_kwargs(n_gen=3, use_async=True), on_log=logs.append)
+
+    assert [c.args[1] for c in mock_gen.call_args_list] == [1, 1, 1]
+    assert mock_score.call_count == 3
+    assert sorted(state.scores.values()) == [1, 2, 3]
+    assert state.pool == ['p3', 'p2']
+    assert '3 players generated after' in ' '.join(logs)
+    assert any(l.startswith('First score ready after') for l in logs)
+
+
+def test_transient_judge_errors_are_retried_and_counted():
+    from dispatch import Dispatcher
+
+    class RateLimited(Exception):
+        status_code = 429
+
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    failed = []
+
+    def flaky_score(instr, cl, block, player, **kw):
+        if player == 'p2' and not failed:
+            failed.append(player)
+            raise RateLimited()
+        return f"Final verdict: [{player[1]}]", usage
+
+    with patch('engine.generate_players', return_value=(['p1', 'p2', 'p3'], usage)), \
+         patch('engine.prompt_score', side_effect=flaky_score), \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()):
+        state = engine.run(**stream_kwargs(
+            n_gen=3, stream_generation=False, dispatcher=Dispatcher(sleep=lambda s: None),
+        ))
+
+    assert state.pool == ['p3', 'p2']
+    assert state.metrics.snapshot()[('score', 'sm')].retries == 1
+
+
+def test_both_orderings_turn_position_bias_into_ties():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    logs = []
+
+    def first_wins_unless_p3(instr, block, a, b, **kw):
+        assert kw['allow_tie'] is True
+        if 'p3' in (a, b):
+            return "I cannot decide.", usage
+        return "Final verdict: A", usage
+
+    with patch('engine.generate_players', return_value=(['p1', 'p2', 'p3'], usage)), \
+         patch('engine.prompt_pairwise', side_effect=first_wins_unless_p3) as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: list(futs)):
+        state = engine.run(**stream_kwargs(
+            n_gen=3, pool_size=3, num_top_picks=1, stream_generation=False, enable_score_filter=False,
+            enable_pairwise_filter=True, pairwise_order='both',
+        ), on_log=logs.append)
+
+    orders = [c.args[2:4] for c in mock_pair.call_args_list]
+    assert ('p1', 'p2') in orders and ('p2', 'p1') in orders
+    assert len(orders) == 6
+    assert state.pairwise_outcomes == {'tie': 1, 'order_disagreements': 1, 'unparsed': 4, 'no_verdict': 2}
+    # A tie and two matches without a verdict leave every rating equal.
+    assert max(state.rating.values()) - min(state.rating.values()) < 1e-6
+    assert state.to_dict()['pairwise_outcomes']['tie'] == 1
+    assert any(l.startswith('Pairwise outcomes: 0 decisive, 1 ties, 2 without verdict') for l in logs)
+
+
+def test_duplicate_generations_are_judged_once():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    logs = []
+    with patch('engine.generate_players', return_value=(['p1', 'p2', 'p1 ', 'p1'], usage)), \
+         patch('engine.prompt_score') as mock_score, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()):
+        mock_score.side_effect = lambda instr, cl, block, player, **kw: (f"Final verdict: [{player[1]}]", usage)
+        state = engine.run(**stream_kwargs(stream_generation=False), on_log=logs.append)
+
+    assert [c.args[3] for c in mock_score.call_args_list] == ['p1', 'p2']
+    assert state.players == ['p1', 'p2']
+    assert state.multiplicity == {'p1': 3, 'p2': 1}
+    result = state.to_dict()
+    assert result['num_generations'] == 4
+    assert {p['text']: p['count'] for p in result['top_picks']} == {'p2': 1, 'p1': 3}
+    assert 'Collapsed 4 generations into 2 distinct answers (2 exact and 0 near duplicates)' in logs
+
+
+def test_async_streaming_skips_scoring_duplicates():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    outputs = iter(['p1', 'p2', 'p1'])
+
+    async def fake_generate(*args, **kwargs):
+        return [next(outputs)], usage
+
+    async def fake_score(instr, cl, block, player, **kw):
+        return f"Final verdict: [{player[1]}]", usage
+
+    with patch('engine.agenerate_players', side_effect=fake_generate), \
+         patch('engine.aprompt_score', side_effect=fake_score) as mock_score:
+        state = engine.run(**stream_kwargs(n_gen=3, pool_size=3, use_async=True))
+
+    assert mock_score.call_count == 2
+    assert sorted(state.players) == ['p1', 'p2']
+    assert state.pool == ['p2', 'p1']
+    assert state.multiplicity == {'p1': 2, 'p2': 1}
+
+
+def test_ensemble_helpers():
+    assert engine._split_models(' a, b ,,c') == ['a', 'b', 'c']
+    assert engine._combine_scores([(4.0, [4, 4]), (None, None), (6.0, [8, 4])]) == (5.0, [6.0, 4.0])
+    assert engine._combine_scores([(None, None)]) == (None, None)
+    assert not engine._close_call(['x', 'x', None])
+    assert engine._close_call(['x', 'y']) and engine._close_call([engine.TIE]) and engine._close_call([None])
+    scores = {'a': 9, 'b': 7.2, 'c': 7.0, 'd': 3}
+    assert engine._near_cut(scores, 2, 0.5) == ['b', 'c']
+    assert engine._near_cut(scores, 4, 0.5) == []
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_ensemble_averages_scores_and_cascade_rescores_the_cut_line(use_async):
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    logs = []
+    # The cheap judges cannot tell p2 and p3 apart; the cascade judge can.
+    verdicts = {'cheap1': {'p1': 9, 'p2': 5, 'p3': 6, 'p4': 1}, 'cheap2': {'p1': 9, 'p2': 6, 'p3': 5, 'p4': 1},
+                'big': {'p2': 8, 'p3': 4}}
+
+    def fake_score(instr, cl, block, player, **kw):
+        return f"Final verdict: [{verdicts[kw['model']][player]}]", usage
+
+    with patch('engine.generate_players', return_value=(['p1', 'p2', 'p3', 'p4'], usage)), \
+         patch('engine.agenerate_players', new=AsyncMock(return_value=(['p1', 'p2', 'p3', 'p4'], usage))), \
+         patch('engine.prompt_score', side_effect=fake_score) as mock_sync, \
+         patch('engine.aprompt_score', new=AsyncMock(side_effect=fake_score)) as mock_async, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()):
+        state = engine.run(**stream_kwargs(
+            stream_generation=False, use_async=use_async, score_model='cheap1,cheap2', cascade_model='big',
+            cascade_margin=1,
+        ), on_log=logs.append)
+    mock_score = mock_async if use_async else mock_sync
+
+    models = [c.kwargs['model'] for c in mock_score.call_args_list]
+    assert models.count('cheap1') == models.count('cheap2') == 4 and models.count('big') == 2
+    assert state.scores == {'p1': 9, 'p2': 8, 'p3': 4, 'p4': 1}
+    assert state.pool == ['p1', 'p2']
+    assert state.to_dict()['escalations'] == {'score': 2}
+    assert 'Escalating 2 players scored near the cut line to big' in logs
+
+
+def test_cascade_judges_open_matches_again():
+    usage = {'prompt_tokens': 1, 'completion_tokens': 1}
+    logs = []
+
+    def fake_pairwise(instr, block, a, b, **kw):
+        assert kw['allow_tie'] is (kw['model'] != 'big')
+        if kw['model'] == 'big':
+            return "Final verdict: B", usage
+        # The cheap judges agree on p1 vs p2 and split on everything else.
+        if {a, b} == {'p1', 'p2'}:
+            return "Final verdict: A", usage
+        return ("Final verdict: A" if kw['model'] == 'cheap1' else "Final verdict: B"), usage
+
+    with patch('engine.generate_players', return_value=(['p1', 'p2', 'p3'], usage)), \
+         patch('engine.prompt_pairwise', side_effect=fake_pairwise) as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: list(futs)):
+        state = engine.run(**stream_kwargs(
+            n_gen=3, pool_size=3, num_top_picks=1, stream_generation=False, enable_score_filter=False,
+            enable_pairwise_filter=True, pairwise_model='cheap1,cheap2', cascade_model='big',
+        ), on_log=logs.append)
+
+    models = [c.kwargs['model'] for c in mock_pair.call_args_list]
+    assert models.count('cheap1') == models.count('cheap2') == 3 and models.count('big') == 2
+    assert state.pairwise_outcomes['escalated'] == 2 and state.escalations == {'pairwise': 2}
+    assert state.top_picks == ['p3']
+    assert any(l.endswith(', 2 escalated to big') for l in logs)
+    assert ('pairwise', 'big') in state.metrics.snapshot()
+
+
+def test_async_ensemble_with_cascade_on_fake_backend():
+    from benchmarks.fake_llm import FakeLLM
+    from dispatch import Dispatcher
+
+    backend = FakeLLM(seed=1, time_scale=0, judge_noise=1.0, model_noise={'big': 0})
+    with backend.installed():
+        state = engine.run(**stream_kwargs(
+            n_gen=8, pool_size=4, stream_generation=False, enable_pairwise_filter=True, use_async=True,
+            score_model='a,b', pairwise_model='a,b', cascade_model='big', dispatcher=Dispatcher(),
+        ))
+
+    # Every score and match goes to both cheap judges, only players near the
+    # cut and open matches reach the cascade judge.
+    assert backend.calls_by_model['a'] == backend.calls_by_model['b'] == 8 + 6
+    assert 0 < state.escalations['pairwise'] < 6
+    assert backend.calls_by_model['big'] == state.escalations['pairwise'] + state.escalations.get('score', 0)
+    assert len(state.top_picks) == 2
+
+
+def test_group_stages_are_reported():
+    from benchmarks.fake_llm import FakeLLM
+    from dispatch import Dispatcher
+
+    logs = []
+    with FakeLLM(judge_noise=0, time_scale=0).installed():
+        state = engine.run(**stream_kwargs(
+            n_gen=20, pool_size=20, num_top_picks=2, stream_generation=False, enable_score_filter=False,
+            enable_pairwise_filter=True, pairing_mode='groups', group_stage_size=5, group_advance=2,
+            dispatcher=Dispatcher(),
+        ), on_log=logs.append)
+
+    assert state.to_dict()['stages'] == [
+        {'players': 20, 'groups': 4, 'matches': 40, 'advanced': 8},
+        {'players': 8, 'groups': 2, 'matches': 12, 'advanced': 4},
+        {'players': 4, 'groups': 1, 'matches': 6},
+    ]
+    assert [l.split(':')[0] for l in logs if l.startswith('Stage ')] == ['Stage 1', 'Stage 2', 'Stage 3 (final)']
+    # Players who met in an earlier stage reuse that verdict.
+    assert state.metrics.totals().calls <= 1 + 58
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_structured_verdicts_and_parse_failures_are_counted(use_async):
+    from benchmarks.fake_llm import FakeLLM
+    from dispatch import Dispatcher
+
+    kwargs = stream_kwargs(
+        n_gen=10, pool_size=6, num_top_picks=2, enable_pairwise_filter=True, stream_generation=False, use_async=use_async,
+        dispatcher=Dispatcher(),
+    )
+    with FakeLLM(judge_noise=0, time_scale=0).installed():
+        text = engine.run(**kwargs)
+    logs = []
+    with FakeLLM(judge_noise=0, time_scale=0).installed():
+        structured = engine.run(**dict(kwargs, structured_verdicts=True), on_log=logs.append)
+    assert structured.top_picks == text.top_picks and structured.scores == text.scores
+    assert structured.parse_failures == {} and 'parse_failures' not in structured.to_dict()
+
+    with FakeLLM(judge_noise=0, time_scale=0, parse_failure_rate=0.3).installed():
+        state = engine.run(**dict(kwargs, structured_verdicts=True), on_log=logs.append)
+    failures = state.to_dict()['parse_failures']
+    assert failures['score'] > 0 and failures['pairwise'] == state.pairwise_outcomes['unparsed']
+    # Players without a score verdict are left out of the scores and the cut rather than scored 0.
+    assert len(state.scores) == len(state.raw_scores) == len(state.players) - failures['score']
+    assert set(state.pool) <= set(state.scores)
+    assert any(l.startswith('Judge answers without a parsable verdict: ') for l in logs)
@@ -0,0 +1,60 @@
+import sys, os, subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Dependencies that must only load on first use, never at import time.
+HEAVY_MODULES = ('gradio', 'matplotlib', 'litellm', 'numpy', 'pandas')
+# Generous on purpose: the module check above is the real guard, this only
+# catches an accidental heavy import that is not on the list.
+IMPORT_BUDGET_US = int(os.getenv('IMPORT_TIME_BUDGET_MS', 500)) * 1000
+
+# Light dependencies may be missing from the test environment; stand in for
+# them so the subprocess measures our own modules.
+PRELUDE = """
+import sys, types
+try:
+    import dotenv
+except ImportError:
+    sys.modules['dotenv'] = types.SimpleNamespace(load_dotenv=lambda *a, **k: None)
+try:
+    import tqdm
+except ImportError:
+    sys.modules['tqdm'] = types.SimpleNamespace(tqdm=types.SimpleNamespace(write=print))
+"""
+
+
+def import_profile(module: str) -> dict[str, int]:
+    """Import ``module`` under ``python -X importtime``; return cumulative µs per module."""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PRELUDE + f'import {module}'],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def check_module(module):
+    profile = import_profile(module)
+    loaded = sorted(name for name in profile if name.split('.')[0] in HEAVY_MODULES)
+    assert loaded == [], f'importing {module} loads {loaded}'
+    assert profile[module] < IMPORT_BUDGET_US, f'importing {module} took {profile[module] / 1000:.0f} ms'
+
+
+def test_engine_import_is_lightweight():
+    check_module('engine')
+
+
+def test_main_import_is_lightweight():
+    check_module('main')
+
+
+def test_tournament_utils_import_is_lightweight():
+    check_module('tournament_utils')
@@ -0,0 +1,129 @@
+import sys, os, types, json
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Provide dummy litellm module so import succeeds
+fake_litellm = types.ModuleType('litellm')
+sys.modules.setdefault('litellm', fake_litellm)
+
+import engine
+import journal
+import tournament_utils
+from benchmarks.fake_llm import FakeLLM
+from dispatch import Dispatcher
+
+
+def test_journal_answers_recorded_calls_once_in_either_player_order(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    log = journal.Journal(path)
+    ab = journal.call_key(tournament_utils.prompt_pairwise, ('q', 'c', 'x', 'y'), {'model': 'm', 'cache': None})
+    ba = journal.call_key(tournament_utils.aprompt_pairwise, ('q', 'c', 'y', 'x'), {'model': 'm'})
+    assert ab[0] == ba[0] and ab[1] != ba[1]
+    log.record(ab, 'pairwise', 'm', 'Final verdict: A', {'prompt_tokens': 5, 'completion_tokens': 1})
+    log.close()
+    # A crash in the middle of the next write leaves a broken last line.
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "call", "key": "')
+
+    resumed = journal.Journal(path)
+    assert len(resumed) == 1
+    assert resumed.take(ba) == ('Final verdict: A', {'prompt_tokens': 5, 'completion_tokens': 1}, True)
+    assert resumed.take(ba) is None
+    resumed.record(ba, 'pairwise', 'm', 'Final verdict: B')
+    resumed.close()
+    events = [json.loads(line) for line in open(path, encoding='utf-8') if line.startswith('{"event": "call", "key": "' + ab[0])]
+    assert [e.get('swapped', False) for e in events] == [False, True]
+
+    replay = journal.Journal(path, 'replay')
+    replay.take(ab), replay.take(ab)
+    with pytest.raises(journal.NotJournaled):
+        replay.take(ab)
+    assert replay.as_dict() == {'replayed': 2, 'recorded': 0, 'refused': 1}
+    assert engine._swap_label('A') == 'B' and engine._swap_label('tie') == 'tie'
+
+
+def tournament_args(**kwargs):
+    args = dict(
+        api_base='', api_token='', generate_model='g', score_model='s', pairwise_model='p',
+        generate_temperature=0.9, score_temperature=0.5, pairwise_temperature=0.5,
+        instruction_input='Explain the claim.', criteria_input='Factuality,Precision',
+        n_gen=10, pool_size=6, num_top_picks=2, max_workers=4, enable_score_filter=True,
+        enable_pairwise_filter=True, score_with_instruction=True, pairwise_with_instruction=True,
+        generate_thinking=False, score_thinking=False, pairwise_thinking=False, dispatcher=Dispatcher(),
+    )
+    args.update(kwargs)
+    return args
+
+
+# Players shown in the other order still find their recorded match.
+@pytest.mark.parametrize('options', [{}, {'use_async': True, 'pairwise_order': 'random'}])
+def test_interrupted_run_resumes_without_paying_twice(tmp_path, options):
+    path = str(tmp_path / 'run.jsonl')
+    full_backend = FakeLLM(judge_noise=0, time_scale=0)
+    with full_backend.installed():
+        full = engine.run(**tournament_args(journal_path=path, **options))
+    assert full.to_dict()['journal'] == {'replayed': 0, 'recorded': sum(full_backend.calls.values()), 'refused': 0}
+
+    # Keep the first half of the journal, as if the process had died there.
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[: len(lines) // 2])
+        f.write(lines[len(lines) // 2][:20])
+    kept = sum('"event": "call"' in line for line in lines[: len(lines) // 2])
+
+    logs = []
+    backend = FakeLLM(judge_noise=0, time_scale=0)
+    with backend.installed():
+        resumed = engine.run(**tournament_args(journal_path=path, **options), on_log=logs.append)
+    assert resumed.top_picks == full.top_picks and resumed.scores == full.scores
+    assert resumed.journal['replayed'] == kept
+    assert sum(backend.calls.values()) == sum(full_backend.calls.values()) - kept
+    assert f'Journal: {kept} recorded calls in {path} are answered from it' in logs
+
+
+def test_replay_rates_a_finished_run_again_without_model_calls(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    with FakeLLM(judge_noise=0.3, time_scale=0).installed():
+        engine.run(**tournament_args(journal_path=path))
+
+    backend = FakeLLM(time_scale=0)
+    logs = []
+    with backend.installed():
+        replay = engine.run(
+            **tournament_args(journal_path=path, journal_mode='replay', pool_size=4, pairing_mode='swiss', num_top_picks=1),
+            on_log=logs.append,
+        )
+    assert not backend.calls
+    assert len(replay.pool) == 4 and len(replay.top_picks) == 1
+    assert replay.journal['refused'] == 0 and logs[-1].startswith('Journal: ')
+    with pytest.raises(FileNotFoundError):
+        engine.run(**tournament_args(journal_path=str(tmp_path / 'missing.jsonl'), journal_mode='replay'))
+
+
+class ExplainingLLM(FakeLLM):
+    """Judges that give their reasons before the verdict."""
+
+    def _judge(self, rng, prompt, model, structured=False):
+        kind, text = super()._judge(rng, prompt, model, structured)
+        return kind, f'Reasons: the {kind} call was weighed.\n{text}'
+
+
+# Each run shows a random half of the matches the other way round.
+def test_replayed_swapped_answers_keep_the_judge_text(tmp_path):
+    path = str(tmp_path / 'run.jsonl')
+    with ExplainingLLM(judge_noise=0, time_scale=0).installed():
+        live = engine.run(**tournament_args(journal_path=path, enable_score_filter=False, pairwise_order='random'))
+
+    logs = []
+    with FakeLLM(time_scale=0).installed():
+        replay = engine.run(
+            **tournament_args(journal_path=path, journal_mode='replay', enable_score_filter=False, pairwise_order='random'),
+            on_log=logs.append,
+        )
+    assert replay.top_picks == live.top_picks and replay.journal['refused'] == 0
+    shown = [line for line in logs if line.startswith('Pairwise completion ')]
+    assert shown and all('Reasons: the pairwise call was weighed.' in line for line in shown)
@@ -0,0 +1,64 @@
+import sys, os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from judge_cache import JudgeCache
+
+
+def _write_entries(path, start):
+    cache = JudgeCache(path)
+    for i in range(start, start + 20):
+        cache.set(JudgeCache.key(i=i), f"v{i}")
+    return True
+
+
+def test_key_is_stable_and_order_independent():
+    assert JudgeCache.key(a=1, b='x') == JudgeCache.key(b='x', a=1)
+    assert JudgeCache.key(a=1, b='x') != JudgeCache.key(a=1, b='y')
+
+
+def test_get_set_and_stats(tmp_path):
+    cache = JudgeCache(str(tmp_path / 'cache.sqlite'))
+    key = JudgeCache.key(model='m', prompt='p')
+    assert cache.get(key) is None
+    cache.set(key, 'Final verdict: A')
+    assert cache.get(key) == 'Final verdict: A'
+    assert (cache.hits, cache.misses) == (1, 1)
+    # A new instance sees what the first one wrote.
+    assert JudgeCache(str(tmp_path / 'cache.sqlite')).get(key) == 'Final verdict: A'
+
+
+def test_ttl_expires_entries(tmp_path):
+    cache = JudgeCache(str(tmp_path / 'cache.sqlite'), ttl=0.01)
+    cache.set('k', 'v')
+    time.sleep(0.02)
+    assert cache.get('k') is None
+    cache.evict()
+    assert len(cache) == 0
+
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    cache = JudgeCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    cache.set('a', '1')
+    time.sleep(0.001)
+    cache.set('b', '2')
+    time.sleep(0.001)
+    cache.get('a')
+    time.sleep(0.001)
+    cache.set('c', '3')
+    cache.evict()
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == '1'
+
+
+def test_concurrent_processes_share_cache(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    with ProcessPoolExecutor(max_workers=3) as ex:
+        assert all(ex.map(_write_entries, [path] * 3, [0, 20, 40]))
+    cache = JudgeCache(path)
+    assert len(cache) == 60
+    assert cache.get(JudgeCache.key(i=45)) == 'v45'
@@ -1,5 +1,6 @@
-import sys, os, types, json
-from unittest.mock import patch, MagicMock
+import sys, os, types, json, time, inspect
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Ensure project root in path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -7,6 +8,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # Provide dummy litellm module so import succeeds
 fake_litellm = types.ModuleType('litellm')
 fake_litellm.completion = MagicMock()
+fake_litellm.acompletion = AsyncMock()
 sys.modules.setdefault('litellm', fake_litellm)
 
 # Provide dummy dotenv module
@@ -21,6 +23,7 @@ fake_gradio.Textbox = MagicMock
 fake_gradio.Number = MagicMock
 fake_gradio.Checkbox = MagicMock
 fake_gradio.Plot = MagicMock
+fake_gradio.Dropdown = MagicMock
 sys.modules.setdefault('gradio', fake_gradio)
 
 # Dummy tqdm module for write method
@@ -47,26 +50,14 @@ sys.modules.setdefault('matplotlib', fake_matplotlib)
 sys.modules.setdefault('matplotlib.pyplot', fake_plt)
 
 import main
+from dummy_executor import DummyExecutor
 
-class DummyFuture:
-    def __init__(self, func, *args):
-        self._func = func
-        self._args = args
-    def result(self):
-        return self._func(*self._args)
 
-class DummyExecutor:
-    def __init__(self, *args, **kwargs):
-        pass
-    def __enter__(self):
-        return self
-    def __exit__(self, exc_type, exc, tb):
-        pass
-    def submit(self, func, *args):
-        return DummyFuture(func, *args)
-    def map(self, func, iterable):
-        for item in iterable:
-            yield func(item)
+def rendered(chart):
+    # A chart job that is already done, so the refresh it triggers is deterministic.
+    future = Future()
+    future.set_result(chart)
+    return future
 
 class DummyTqdm:
     def __call__(self, iterable=None, total=None):
@@ -74,17 +65,44 @@ class DummyTqdm:
     def write(self, msg):
         pass
 
+
+def kwargs(**overrides):
+    kwargs = dict(
+        api_base='b',
+        api_token='k',
+        generate_model='gm',
+        score_model='sm',
+        pairwise_model='pm',
+        generate_temperature=1,
+        score_temperature=1,
+        pairwise_temperature=1,
+        instruction_input='instr',
+        criteria_input='c1,c2',
+        n_gen=4,
+        pool_size=2,
+        num_top_picks=1,
+        max_workers=1,
+        enable_score_filter=True,
+        enable_pairwise_filter=True,
+        score_with_instruction=True,
+        pairwise_with_instruction=True,
+        generate_thinking=True,
+        score_thinking=True,
+        pairwise_thinking=True,
+    )
+    kwargs.update(overrides)
+    return kwargs
+
+
 def test_run_tournament_full_loop():
     dummy_tqdm = DummyTqdm()
-    with patch('main.generate_players') as mock_gen, \
-         patch('main.prompt_score') as mock_score, \
-         patch('main.prompt_pairwise') as mock_pair, \
-         patch('main.ThreadPoolExecutor', return_value=DummyExecutor()) as MockExec, \
-         patch('main.as_completed', new=lambda futs: futs), \
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_score') as mock_score, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()) as MockExec, \
+         patch('engine.as_completed', new=lambda futs: futs), \
          patch('main.tqdm', new=dummy_tqdm), \
-         patch('main.plt.figure', return_value='fig'), \
-         patch('main.plt.hist'), \
-         patch('main.plt.bar'):
+         patch('charts.render', return_value='fig'):
         mock_gen.return_value = (['p1', 'p2', 'p3', 'p4'], {'prompt_tokens':1,'completion_tokens':1})
         scores = {'p1':3, 'p2':2, 'p3':1, 'p4':0}
         mock_score.side_effect = lambda instr, cl, block, player, **kw: (
@@ -96,29 +114,7 @@ def test_run_tournament_full_loop():
             {'prompt_tokens':1,'completion_tokens':1}
         )
 
-        results = list(main.run_tournament(
-            api_base='b',
-            api_token='k',
-            generate_model='gm',
-            score_model='sm',
-            pairwise_model='pm',
-            generate_temperature=1,
-            score_temperature=1,
-            pairwise_temperature=1,
-            instruction_input='instr',
-            criteria_input='c1,c2',
-            n_gen=4,
-            pool_size=2,
-            num_top_picks=1,
-            max_workers=1,
-            enable_score_filter=True,
-            enable_pairwise_filter=True,
-            score_with_instruction=True,
-            pairwise_with_instruction=True,
-            generate_thinking=True,
-            score_thinking=True,
-            pairwise_thinking=True,
-        ))
+        results = list(main.run_tournament(**kwargs()))
 
     process_log, hist_fig, elo_fig, top_picks, usage = results[-1]
     assert 'Done' in process_log
@@ -135,45 +131,209 @@ def test_run_tournament_full_loop():
 
 def test_run_tournament_pairwise_odd_players():
     dummy_tqdm = DummyTqdm()
-    with patch('main.generate_players') as mock_gen, \
-         patch('main.prompt_pairwise') as mock_pair, \
-         patch('main.ThreadPoolExecutor', return_value=DummyExecutor()) as MockEx, \
-         patch('main.as_completed', new=lambda futs: futs), \
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()) as MockEx, \
+         patch('engine.as_completed', new=lambda futs: futs), \
          patch('main.tqdm', new=dummy_tqdm), \
-         patch('main.plt.figure', return_value='fig'), \
-         patch('main.plt.hist'), \
-         patch('main.plt.bar'):
+         patch('charts.render', return_value='fig'):
         mock_gen.return_value = (['p1', 'p2', 'p3'], {'prompt_tokens':1,'completion_tokens':1})
         mock_pair.side_effect = lambda instr, block, a, b, **kw: (
             "Final verdict: A",
             {'prompt_tokens':1,'completion_tokens':1}
         )
 
-        results = list(main.run_tournament(
-            api_base='b',
-            api_token='k',
-            generate_model='gm',
-            score_model='sm',
-            pairwise_model='pm',
-            generate_temperature=1,
-            score_temperature=1,
-            pairwise_temperature=1,
-            instruction_input='instr',
-            criteria_input='c1,c2',
-            n_gen=3,
-            pool_size=3,
-            num_top_picks=1,
-            max_workers=1,
-            enable_score_filter=False,
-            enable_pairwise_filter=True,
-            score_with_instruction=True,
-            pairwise_with_instruction=True,
-            generate_thinking=True,
-            score_thinking=True,
-            pairwise_thinking=True,
-        ))
+        results = list(main.run_tournament(**kwargs(n_gen=3, pool_size=3, enable_score_filter=False)))
 
     process_log, hist_fig, elo_fig, top_picks, usage = results[-1]
     assert 'Done' in process_log
     assert any(p in top_picks for p in {'p1', 'p2', 'p3'})
     assert mock_pair.call_count == 3
+
+
+def test_run_tournament_max_matches_caps_pairwise_calls():
+    dummy_tqdm = DummyTqdm()
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: futs), \
+         patch('main.tqdm', new=dummy_tqdm), \
+         patch('charts.render', return_value='fig'):
+        mock_gen.return_value = ([f'p{i}' for i in range(8)], {'prompt_tokens':1,'completion_tokens':1})
+        mock_pair.side_effect = lambda instr, block, a, b, **kw: (
+            "Final verdict: A",
+            {'prompt_tokens':1,'completion_tokens':1}
+        )
+
+        results = list(main.run_tournament(**kwargs(n_gen=8, pool_size=8, enable_score_filter=False, pairing_mode='swiss', max_matches=5)))
+
+    process_log, hist_fig, elo_fig, top_picks, usage = results[-1]
+    assert 'Done' in process_log
+    assert 'swiss' in process_log
+    assert mock_pair.call_count == 5
+
+
+def test_run_tournament_async_pipeline():
+    dummy_tqdm = DummyTqdm()
+    scores = {'p1':3, 'p2':2, 'p3':1, 'p4':0}
+    usage = {'prompt_tokens':1,'completion_tokens':1}
+
+    async def fake_score(instr, cl, block, player, **kw):
+        return f"Final verdict: [{scores[player]}]", usage
+
+    async def fake_pair(instr, block, a, b, **kw):
+        return "Final verdict: B", usage
+
+    with patch('engine.agenerate_players', new=AsyncMock(return_value=(list(scores), usage))) as mock_gen, \
+         patch('engine.aprompt_score', side_effect=fake_score) as mock_score, \
+         patch('engine.aprompt_pairwise', side_effect=fake_pair) as mock_pair, \
+         patch('main.tqdm', new=dummy_tqdm), \
+         patch('charts.render', return_value='fig'):
+        results = list(main.run_tournament(**kwargs(pool_size=3, max_workers=2, use_async=True, model_concurrency='sm=1')))
+
+    process_log, hist_fig, elo_fig, top_picks, usage_text = results[-1]
+    assert 'Done' in process_log
+    assert hist_fig == elo_fig == 'fig'
+    assert mock_score.call_count == 4
+    assert mock_pair.call_count == 3
+    assert 'p4' not in top_picks
+    assert 'Total tokens: 16' in usage_text
+
+
+def test_run_tournament_batched_scoring_falls_back_on_bad_verdict():
+    dummy_tqdm = DummyTqdm()
+    usage = {'prompt_tokens':1,'completion_tokens':1}
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_score') as mock_score, \
+         patch('engine.prompt_score_batch') as mock_batch, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('main.tqdm', new=dummy_tqdm), \
+         patch('charts.render', return_value='fig'):
+        mock_gen.return_value = (['p1', 'p2', 'p3', 'p4', 'p5'], usage)
+        batch_verdicts = {('p1', 'p2'): "Final verdict: [[1, 1], [9, 9]]", ('p3', 'p4'): "garbled"}
+        mock_batch.side_effect = lambda instr, cl, block, players, **kw: (batch_verdicts[tuple(players)], usage)
+        mock_score.side_effect = lambda instr, cl, block, player, **kw: (
+            "Final verdict: [5, 5]" if player != 'p4' else "Final verdict: [8, 8]", usage
+        )
+
+        results = list(main.run_tournament(**kwargs(n_gen=5, num_top_picks=2, enable_pairwise_filter=False, score_batch_size=2)))
+
+    process_log, hist_fig, elo_fig, top_picks, usage_text = results[-1]
+    assert mock_batch.call_count == 2
+    # p3/p4 fall back to single calls, p5 is a batch of one.
+    assert [c.args[3] for c in mock_score.call_args_list] == ['p3', 'p4', 'p5']
+    assert top_picks.split("\n\n\n=====================================================\n\n\n") == ['p2', 'p4']
+
+
+def test_run_tournament_listwise():
+    dummy_tqdm = DummyTqdm()
+    strength = {f'p{i}': i for i in range(6)}
+
+    def fake_rank(instr, block, players, **kw):
+        order = sorted(range(len(players)), key=lambda i: strength[players[i]], reverse=True)
+        return f"Final verdict: {[i + 1 for i in order]}", {'prompt_tokens':1,'completion_tokens':1}
+
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_rank', side_effect=fake_rank) as mock_rank, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: futs), \
+         patch('main.tqdm', new=dummy_tqdm), \
+         patch('charts.render', return_value='fig'):
+        mock_gen.return_value = (list(strength), {'prompt_tokens':1,'completion_tokens':1})
+        results = list(main.run_tournament(**kwargs(n_gen=6, pool_size=6, enable_score_filter=False, pairing_mode='listwise', rank_group_size=3, rank_rounds=2)))
+
+    process_log, hist_fig, elo_fig, top_picks, usage = results[-1]
+    assert not mock_pair.called
+    assert mock_rank.call_count == 4
+    assert top_picks.startswith('p5')
+
+
+def test_run_tournament_early_stop_skips_settled_matches():
+    dummy_tqdm = DummyTqdm()
+    players = [f'p{i}' for i in range(8)]
+    strength = {p: -i for i, p in enumerate(players)}
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: futs), \
+         patch('main.tqdm', new=dummy_tqdm), \
+         patch('charts.render', return_value='fig'):
+        mock_gen.return_value = (players, {'prompt_tokens':1,'completion_tokens':1})
+        mock_pair.side_effect = lambda instr, block, a, b, **kw: (
+            "Final verdict: A" if strength[a] > strength[b] else "Final verdict: B",
+            {'prompt_tokens':1,'completion_tokens':1}
+        )
+        results = list(main.run_tournament(**kwargs(n_gen=8, pool_size=8, enable_score_filter=False, early_stop_confidence=0.2)))
+
+    process_log, hist_fig, elo_fig, top_picks, usage = results[-1]
+    assert 'Early stop' in process_log
+    assert mock_pair.call_count < 28
+    assert top_picks.startswith('p0')
+
+
+def test_held_back_refresh_is_sent_during_a_slow_step():
+    produced = {}
+
+    def slow_tournament(*args, state=None, **kwargs):
+        yield 'Generating answers …'
+        yield 'Scoring'
+        time.sleep(0.5)
+        produced['late'] = time.monotonic()
+        yield 'Scored'
+
+    refreshes = []
+    with patch('main.tournament', new=slow_tournament), \
+         patch('main.tqdm', new=DummyTqdm()), \
+         patch('main.UI_REFRESH_INTERVAL', 0.1):
+        for process_log, *_ in main.run_tournament(**kwargs()):
+            refreshes.append((time.monotonic(), process_log.splitlines()[-1]))
+
+    # 'Scoring' came right after the first refresh, so it was held back; it
+    # still shows while the slow step runs rather than only after it.
+    shown = [at for at, last in refreshes if last == 'Scoring']
+    assert shown and shown[0] < produced['late']
+    assert refreshes[-1][1] == 'Done'
+
+
+def test_log_buffer_keeps_last_lines():
+    log = main.LogBuffer(2)
+    for i in range(5):
+        log.append(f'line {i}')
+    assert log.render('Done').splitlines() == [
+        '… 3 earlier lines not shown (the console has the full log)', 'line 3', 'line 4', 'Done'
+    ]
+
+
+def test_run_tournament_throttles_ui_refreshes():
+    dummy_tqdm = DummyTqdm()
+    with patch('engine.generate_players') as mock_gen, \
+         patch('engine.prompt_pairwise') as mock_pair, \
+         patch('engine.ThreadPoolExecutor', return_value=DummyExecutor()), \
+         patch('engine.as_completed', new=lambda futs: futs), \
+         patch('main.tqdm', new=dummy_tqdm), \
+         patch('main.UI_REFRESH_INTERVAL', 3600), \
+         patch('main.LOG_MAX_LINES', 3), \
+         patch('charts.submit', side_effect=lambda data: rendered('fig')):
+        mock_gen.return_value = (['p1', 'p2', 'p3'], {'prompt_tokens':1,'completion_tokens':1})
+        mock_pair.return_value = ("Final verdict: A", {'prompt_tokens':1,'completion_tokens':1})
+
+        results = list(main.run_tournament(**kwargs(n_gen=3, pool_size=3, enable_score_filter=False)))
+
+    # First message, the Elo chart appearing, and the final result.
+    assert len(results) == 3
+    assert results[1][2] == 'fig'
+    process_log = results[-1][0].splitlines()
+    # Omitted-lines header, the last three messages, then "Done".
+    assert len(process_log) == 5
+    assert process_log[0].startswith('… ')
+    assert process_log[-1] == 'Done'
+
+
+def test_run_tournament_takes_one_parameter_per_ui_input():
+    fake_gradio.Interface.reset_mock()
+    main.build_demo()
+    inputs = fake_gradio.Interface.call_args.kwargs['inputs']
+    params = inspect.signature(main.run_tournament).parameters
+    assert len(params) == len(inputs)
+    assert 'state' not in params and 'dispatcher' not in params
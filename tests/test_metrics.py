@@ -0,0 +1,111 @@
+import sys, os, types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import metrics
+from metrics import Metrics, estimate_cost, usage_tokens
+
+
+def test_concurrent_records_add_up_exactly():
+    m = Metrics()
+
+    def work(_):
+        for _ in range(1000):
+            m.record('score', 'sm', 0.001, {'prompt_tokens': 3, 'completion_tokens': 1}, cost=0.0)
+
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        list(ex.map(work, range(16)))
+    total = m.totals()
+    assert total.calls == 16000
+    assert total.prompt_tokens == 48000
+    assert total.completion_tokens == 16000
+
+
+def test_snapshot_groups_by_stage_and_model():
+    m = Metrics()
+    m.record('pairwise', 'pm', 2.0, {'prompt_tokens': 5, 'completion_tokens': 2}, cost=0.5)
+    m.record('generate', 'gm', 1.0, None, retries=2, cost=0.0)
+    m.record('pairwise', 'pm', 4.0, {'prompt_tokens': 5, 'completion_tokens': 2}, cost=0.5)
+    snap = m.snapshot()
+    assert list(snap) == [('generate', 'gm'), ('pairwise', 'pm')]
+    pair = snap[('pairwise', 'pm')]
+    assert (pair.calls, pair.latency, pair.latency_max, pair.prompt_tokens, pair.cost) == (2, 6.0, 4.0, 10, 1.0)
+    assert snap[('generate', 'gm')].retries == 2
+
+    other = Metrics()
+    other.merge(m)
+    other.merge(m)
+    assert other.totals().calls == 6
+
+
+def test_summary_table_and_prometheus_dump():
+    m = Metrics()
+    m.record('score', 'my"model', 1.5, {'prompt_tokens': 10, 'completion_tokens': 4}, cost=0.25)
+    table = m.summary_table().splitlines()
+    assert table[0].split()[:3] == ['stage', 'model', 'calls']
+    assert table[1].split()[:5] == ['score', 'my"model', '1', '10', '4']
+
+    text = m.prometheus()
+    assert '# TYPE llm_tournament_calls_total counter' in text
+    assert 'llm_tournament_calls_total{stage="score",model="my\\"model"} 1' in text
+    assert 'llm_tournament_latency_seconds_sum{stage="score",model="my\\"model"} 1.5' in text
+    assert 'llm_tournament_cost_usd_total{stage="score",model="my\\"model"} 0.25' in text
+
+
+def test_usage_tokens_accepts_objects_and_dicts():
+    class Usage:
+        prompt_tokens = 7
+        completion_tokens = 2
+
+    assert usage_tokens(Usage()) == (7, 2)
+    assert usage_tokens({'prompt_tokens': 1}) == (1, 0)
+    assert usage_tokens(None) == (0, 0)
+
+
+def test_cached_prompt_tokens_from_either_usage_style():
+    class Details:
+        cached_tokens = 6
+
+    class Usage:
+        prompt_tokens = 8
+        completion_tokens = 1
+        prompt_tokens_details = Details()
+
+    m = Metrics()
+    m.record('pairwise', 'pm', 1.0, Usage(), cost=0.0)
+    m.record('pairwise', 'pm', 1.0, {'prompt_tokens': 8, 'cache_read_input_tokens': 4}, cost=0.0)
+    m.record('pairwise', 'pm', 1.0, {'prompt_tokens': 8}, cost=0.0)
+    assert m.totals().cached_tokens == 10
+    assert 'llm_tournament_cached_tokens_total{stage="pairwise",model="pm"} 10' in m.prometheus()
+
+
+def test_cost_lookup_is_resolved_once_and_only_swallows_unpriced_models(monkeypatch):
+    class NotFoundError(Exception):
+        pass
+
+    lookups = []
+
+    def cost_per_token(model, prompt_tokens, completion_tokens):
+        lookups.append(model)
+        if model == 'unknown':
+            raise NotFoundError(model)
+        if model == 'broken':
+            raise RuntimeError(model)
+        return prompt_tokens * 0.5, completion_tokens * 2.0
+
+    fake = types.ModuleType('litellm')
+    fake.cost_per_token, fake.NotFoundError = cost_per_token, NotFoundError
+    monkeypatch.setitem(sys.modules, 'litellm', fake)
+    monkeypatch.setattr(metrics, '_cost_lookup', None)
+    assert estimate_cost('m', 2, 1) == 3.0
+    # Swapping the module afterwards changes nothing: the lookup was resolved once.
+    monkeypatch.setitem(sys.modules, 'litellm', types.ModuleType('litellm'))
+    assert estimate_cost('unknown', 2, 1) == 0.0
+    assert estimate_cost('m', 0, 0) == 0.0
+    assert lookups == ['m', 'unknown']
+    with pytest.raises(RuntimeError):
+        estimate_cost('broken', 1, 1)
@@ -0,0 +1,101 @@
+import sys, os
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+import pairing
+
+
+def play_out(scheduler, strength):
+    """Run ``scheduler`` to completion where the stronger player always wins."""
+    rating = {p: 1000.0 for p in scheduler.players}
+    matches = []
+    while True:
+        pairs = scheduler.next_round(rating)
+        if not pairs:
+            return matches, rating
+        for a, b in pairs:
+            winner = a if strength[a] > strength[b] else b
+            rating[winner] += 10
+            scheduler.record(a, b, winner)
+            matches.append((a, b))
+
+
+def test_round_robin_plays_all_pairs_once():
+    players = ['a', 'b', 'c', 'd']
+    matches, _ = play_out(pairing.RoundRobin(players), {p: i for i, p in enumerate(players)})
+    assert len(matches) == 6
+    assert len({frozenset(m) for m in matches}) == 6
+
+
+def test_swiss_is_subquadratic_and_never_repeats():
+    players = list(range(32))
+    scheduler = pairing.Swiss(players)
+    matches, _ = play_out(scheduler, {p: p for p in players})
+    assert len(matches) <= scheduler.expected_matches()
+    assert len(matches) < 32 * 31 // 2 // 4
+    assert len({frozenset(m) for m in matches}) == len(matches)
+
+
+def test_knockout_finds_strongest_player():
+    players = list(range(7))
+    scheduler = pairing.Knockout(players)
+    matches, _ = play_out(scheduler, {p: p for p in players})
+    assert len(matches) == 6
+    assert scheduler.alive == [6]
+
+
+def test_knockout_tie_keeps_higher_seed():
+    scheduler = pairing.Knockout(['a', 'b', 'c', 'd'])
+    rating = {'a': 1030.0, 'b': 1020.0, 'c': 1010.0, 'd': 1000.0}
+    (a1, b1), (a2, b2) = scheduler.next_round(rating)
+    scheduler.record(a1, b1, pairing.TIE)
+    scheduler.record(a2, b2, None)
+    assert scheduler.alive == ['a', 'b']
+
+
+def test_active_recovers_top_k():
+    players = list(range(16))
+    scheduler = pairing.Active(players, top_k=3)
+    matches, rating = play_out(scheduler, {p: p for p in players})
+    assert len(matches) < 16 * 15 // 2
+    top = sorted(rating, key=rating.get, reverse=True)[:3]
+    assert 15 in top
+
+
+def test_make_scheduler_rejects_unknown_mode():
+    assert isinstance(pairing.make_scheduler('swiss', [1, 2]), pairing.Swiss)
+    with pytest.raises(ValueError):
+        pairing.make_scheduler('bogus', [1, 2])
+
+
+def test_listwise_groups_cover_every_player_each_round():
+    players = list(range(10))
+    scheduler = pairing.Listwise(players, group_size=4, rounds=3)
+    rating = {p: -p for p in players}
+    for _ in range(3):
+        groups = scheduler.next_round(rating)
+        assert sorted(p for g in groups for p in g) == players
+        assert all(len(g) >= 2 for g in groups)
+    assert scheduler.next_round(rating) == []
+
+
+def test_group_stage_promotes_group_winners_to_a_final():
+    players = list(range(40))
+    scheduler = pairing.make_scheduler('groups', players, stage_size=8, advance=2)
+    matches, rating = play_out(scheduler, {p: p for p in players})
+    assert len(matches) == scheduler.expected_matches()
+    assert [(s['players'], s['groups'], s['matches']) for s in scheduler.stages] == [(40, 5, 140), (10, 2, 20), (4, 1, 6)]
+    # Dealt like cards, every group of the first stage holds one of the five best players.
+    assert sorted(scheduler.stages[0]['advanced'])[-5:] == [35, 36, 37, 38, 39]
+    assert scheduler.stages[-1]['standings'] == [[39, 38, 37, 36]]
+    assert scheduler.next_round(rating) == []
+
+
+def test_group_stage_grows_linearly():
+    small = pairing.GroupStage(list(range(100))).expected_matches()
+    large = pairing.GroupStage(list(range(400))).expected_matches()
+    assert large < 4.5 * small
+    assert pairing.GroupStage(list(range(5))).expected_matches() == 10
@@ -0,0 +1,62 @@
+import sys, os
+import math
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+
+from pairing import TIE
+from players import MatchTable, Player, PlayerRegistry
+
+
+def test_registry_numbers_distinct_answers():
+    registry = PlayerRegistry()
+    added = [registry.add(t) for t in ['long answer', 'other', 'long  answer']]
+    assert [(p.id, new) for p, new in added] == [(0, True), (1, True), (0, False)]
+    assert registry[0].count == 2
+    assert registry.texts([1, 0]) == ['other', 'long answer']
+    assert math.isnan(registry.scores[1])
+    assert registry.dedup_summary() == "Collapsed 3 generations into 2 distinct answers (1 exact and 0 near duplicates)"
+
+
+def test_registry_ranks_by_score_keeping_order_of_ties():
+    registry = PlayerRegistry()
+    for t in 'abcd':
+        registry.add(t)
+    for pid, s in enumerate([5, 7, 5, 9]):
+        registry.set_score(pid, s, [s])
+    assert registry.ranked(range(4)) == [3, 1, 0, 2]
+    assert registry.raw_scores[1] == [7]
+
+
+def test_players_without_a_score_verdict_are_not_ranked():
+    registry = PlayerRegistry()
+    for t in 'abc':
+        registry.add(t)
+    registry.set_score(0, 4.0, [4])
+    registry.set_score(1, None)
+    registry.set_score(2, 1.0, [1])
+    assert registry.scored(range(3)) == [0, 2]
+    assert registry.ranked(range(3)) == [0, 2]
+    assert registry.raw_scores[1] is None
+
+
+def test_player_has_no_instance_dict():
+    with pytest.raises(AttributeError):
+        Player(0, 'x').extra = 1
+
+
+def test_match_table_is_symmetric():
+    table = MatchTable(4)
+    table.record(2, 1, 2)
+    table.record(0, 3, TIE)
+    table.record(1, 3, None)
+    assert (1, 2) in table and (2, 1) in table and (0, 1) not in table
+    assert table.get(1, 2) == 2
+    assert table.get(3, 0) is TIE
+    assert table.get(1, 3) is None
+    assert len(table) == 3
+    assert table.codes.nbytes == 16
+    with pytest.raises(KeyError):
+        table.get(0, 1)
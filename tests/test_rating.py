@@ -0,0 +1,118 @@
+import sys, os
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+
+from rating import BradleyTerry, EarlyStop, plackett_luce, top_k_separated
+
+
+def test_fit_is_independent_of_result_order():
+    results = [('a', 'b', 'a'), ('b', 'c', 'b'), ('a', 'c', 'c'), ('a', 'b', 'a'), ('c', 'b', 'c')]
+    forward = BradleyTerry(['a', 'b', 'c'])
+    backward = BradleyTerry(['a', 'b', 'c'])
+    for r in results:
+        forward.record(*r)
+    for r in reversed(results):
+        backward.record(*r)
+    forward.fit()
+    backward.fit()
+    assert forward.as_dict() == backward.as_dict()
+
+
+def test_fit_recovers_strength_order():
+    rng = np.random.default_rng(0)
+    n = 30
+    true = np.linspace(-2, 2, n)
+    i = rng.integers(0, n, 3000)
+    j = (i + rng.integers(1, n, 3000)) % n
+    outcome = (rng.random(3000) < 1 / (1 + np.exp(true[j] - true[i]))).astype(float)
+    bt = BradleyTerry(range(n))
+    bt.add_many(i, j, outcome)
+    bt.fit()
+    ratings = bt.ratings()
+    assert abs(ratings.mean() - 1000.0) < 1e-6
+    assert np.corrcoef(ratings, true)[0, 1] > 0.95
+    assert int(np.argmax(ratings)) >= n - 3
+
+
+def test_add_many_matches_add_and_ties():
+    single = BradleyTerry(range(3))
+    single.add(0, 1)
+    single.add(1, 2, 0.5)
+    batch = BradleyTerry(range(3))
+    batch.add_many([0, 1], [1, 2], [1.0, 0.5])
+    assert np.array_equal(single.wins, batch.wins)
+    assert single.games.tolist() == [1.0, 2.0, 1.0]
+
+
+def test_record_counts_ties_as_half_and_skips_missing_verdicts():
+    from pairing import TIE
+
+    bt = BradleyTerry(['a', 'b'])
+    bt.record('a', 'b', TIE)
+    bt.record('a', 'b', None)
+    bt.record('b', 'a', 'b')
+    assert bt.wins.tolist() == [[0.0, 0.5], [1.5, 0.0]]
+
+
+def test_intervals_shrink_with_more_games():
+    few = BradleyTerry(['a', 'b'])
+    many = BradleyTerry(['a', 'b'])
+    few.add(0, 1)
+    many.add_many([0] * 20, [1] * 20, [1.0, 0.0] * 10)
+    few.fit()
+    many.fit()
+    assert many.stderr()[0] < few.stderr()[0]
+    low, high = many.intervals()
+    assert np.all(low < many.ratings()) and np.all(many.ratings() < high)
+
+
+def test_top_k_separated():
+    ratings = [1200, 1150, 1000, 900]
+    assert top_k_separated(ratings, [10, 10, 10, 10], 2, 1.96)
+    assert not top_k_separated(ratings, [80, 80, 80, 80], 2, 1.96)
+    assert not top_k_separated(ratings, [10, 10, 10, 10], 4, 1.96)
+
+
+def test_early_stop_waits_for_enough_evidence():
+    bt = BradleyTerry(['a', 'b', 'c'])
+    stop = EarlyStop(1, confidence=0.9)
+    bt.record('a', 'b', 'a')
+    assert not stop.settled(bt)
+    for _ in range(30):
+        bt.record('a', 'b', 'a')
+        bt.record('a', 'c', 'a')
+    assert stop.settled(bt)
+
+
+def test_early_stop_checks_once_per_batch_of_results():
+    players = list(range(10))
+    bt = BradleyTerry(players)
+    stop = EarlyStop(1, confidence=0.5, every=2)
+    for _ in range(30):
+        bt.add_many([0] * 9, players[1:], 1.0)
+    fits = []
+    bt.fit = lambda fit=bt.fit: fits.append(1) or fit()
+    # Half of the ten players play in a batch: the fifth result is checked.
+    assert [stop.result(bt) for _ in range(5)] == [False] * 4 + [True]
+    assert len(fits) == 1 and stop.unchecked == 0
+
+
+def test_plackett_luce_orders_players_from_partial_rankings():
+    rankings = [['a', 'b', 'c'], ['b', 'c', 'd'], ['a', 'c', 'd'], ['a', 'b', 'd']]
+    rating = plackett_luce(['a', 'b', 'c', 'd'], rankings)
+    assert sorted(rating, key=rating.get, reverse=True) == ['a', 'b', 'c', 'd']
+    assert abs(sum(rating.values()) / 4 - 1000.0) < 1e-6
+
+
+def test_plackett_luce_takes_rankings_of_any_length():
+    players = ['a', 'b', 'c', 'd', 'e']
+    rating = plackett_luce(players, [['a', 'b', 'c'], ['b', 'd']])
+    assert rating['a'] > rating['b'] > rating['d']
+    assert all(np.isfinite(list(rating.values())))
+    # A ranking of one player says nothing.
+    assert plackett_luce(players, [['a', 'b', 'c'], ['b', 'd'], ['e']]) == pytest.approx(rating)
+    assert plackett_luce([], []) == {}
@@ -0,0 +1,133 @@
+import sys, os, types, threading
+from unittest.mock import patch
+
+import pytest
+
+# Ensure project root in path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Provide dummy litellm module so import succeeds
+fake_litellm = types.ModuleType('litellm')
+sys.modules.setdefault('litellm', fake_litellm)
+
+import engine
+import shards
+import tournament_utils
+from benchmarks.fake_llm import FakeLLM
+from dispatch import Dispatcher
+
+
+def test_job_table_hands_each_job_to_one_worker(tmp_path):
+    table = shards.JobTable(str(tmp_path / 'jobs.db'))
+    first = table.post('run', 'prompt_score', ['q'], {'model': 'm'})
+    table.post('run', 'prompt_pairwise', ['q'], {'model': 'm'})
+    assert table.claim('w1') == (first, 'prompt_score', {'args': ['q'], 'kwargs': {'model': 'm'}})
+    second = table.claim('w2')
+    assert second[1] == 'prompt_pairwise' and table.claim('w3') is None
+    table.finish(first, {'text': 'Final verdict: [7]', 'usage': None, 'retries': 0})
+    assert table.collect('run') == [(first, 'w1', {'text': 'Final verdict: [7]', 'usage': None, 'retries': 0})]
+    # The second worker went quiet: its job goes back to the queue.
+    assert table.requeue_stale('run', lease=-1) == 1
+    assert table.claim('w3')[0] == second[0]
+    assert table.counts() == {'running': 1}
+
+
+def test_async_judge_functions_become_the_same_jobs():
+    assert shards.job_name(tournament_utils.aprompt_pairwise) == 'prompt_pairwise'
+    assert shards.job_name(tournament_utils.prompt_score_batch) == 'prompt_score_batch'
+    assert shards.job_name(tournament_utils.generate_players) is None
+
+
+def tournament_args(**kwargs):
+    args = dict(
+        api_base='', api_token='', generate_model='g', score_model='s', pairwise_model='p',
+        generate_temperature=0.9, score_temperature=0.5, pairwise_temperature=0.5,
+        instruction_input='Explain the claim.', criteria_input='Factuality,Precision',
+        n_gen=10, pool_size=6, num_top_picks=2, max_workers=4, enable_score_filter=True,
+        enable_pairwise_filter=True, score_with_instruction=True, pairwise_with_instruction=True,
+        generate_thinking=False, score_thinking=False, pairwise_thinking=False, dispatcher=Dispatcher(),
+    )
+    args.update(kwargs)
+    return args
+
+
+def run_sharded(path, **kwargs):
+    logs = []
+    return engine.run(on_log=logs.append, **tournament_args(**kwargs)), logs
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_sharded_tournament_matches_the_in_process_one(tmp_path, use_async):
+    path = str(tmp_path / 'jobs.db')
+    stop = threading.Event()
+    with FakeLLM(judge_noise=0, time_scale=0).installed():
+        local, _ = run_sharded(path, use_async=use_async)
+    with FakeLLM(judge_noise=0, time_scale=0).installed():
+        workers = [
+            threading.Thread(
+                target=shards.work, args=(path,), kwargs=dict(threads=2, stop=stop, dispatcher=Dispatcher(), name=f'w{i}')
+            )
+            for i in range(2)
+        ]
+        for w in workers:
+            w.start()
+        try:
+            sharded, logs = run_sharded(path, use_async=use_async, shard_jobs=path)
+        finally:
+            stop.set()
+            for w in workers:
+                w.join()
+
+    assert sharded.top_picks == local.top_picks and sharded.rating == local.rating
+    assert sharded.metrics.totals().calls == local.metrics.totals().calls
+    assert logs[-1].startswith('Shards: 25 judge calls on ')
+    assert shards.JobTable(path).counts() == {}
+
+
+def test_worker_errors_reach_the_tournament(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    stop = threading.Event()
+    coordinator = shards.Coordinator(path)
+
+    def broken(**kwargs):
+        raise ValueError('bad request')
+
+    with patch('tournament_utils.completion', side_effect=broken):
+        worker = threading.Thread(
+            target=shards.work, args=(path,), kwargs=dict(threads=1, stop=stop, dispatcher=Dispatcher(max_retries=0))
+        )
+        worker.start()
+        try:
+            future = coordinator.submit(tournament_utils.prompt_score, ('q', ['c'], '1) c', 'answer'), {'model': 'm'})
+            with pytest.raises(shards.ShardJobError, match='ValueError: bad request'):
+                future.result(timeout=10)
+        finally:
+            stop.set()
+            worker.join()
+            coordinator.close()
+    with pytest.raises(ValueError):
+        coordinator.submit(tournament_utils.generate_players, ('q', 1), {'model': 'm'})
+
+
+@pytest.mark.parametrize('stop', ['cancel', 'error'])
+def test_stopped_run_closes_its_shards_and_journal(tmp_path, stop):
+    import journal
+
+    path = str(tmp_path / 'jobs.db')
+    args = dict(shard_jobs=path, journal_path=str(tmp_path / 'run.jsonl'), dispatcher=Dispatcher(max_retries=0))
+    with patch.object(shards.Coordinator, 'close', autospec=True, side_effect=shards.Coordinator.close) as close_shards, \
+            patch.object(journal.Journal, 'close', autospec=True, side_effect=journal.Journal.close) as close_journal:
+        if stop == 'cancel':
+            # What a cancelled UI run does: the tournament generator is closed mid-run.
+            with FakeLLM(time_scale=0).installed():
+                steps = engine.tournament(**tournament_args(**args))
+                for msg in steps:
+                    if msg.startswith('Judge calls go to the job table'):
+                        break
+                steps.close()
+        else:
+            with patch('tournament_utils.completion', side_effect=RuntimeError('down')):
+                with pytest.raises(RuntimeError):
+                    run_sharded(path, **args)
+    assert close_shards.call_count == 1 and close_journal.call_count == 1
+    assert shards.JobTable(path).counts() == {}
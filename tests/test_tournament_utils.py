@@ -1,5 +1,5 @@
 import sys, os, types
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Ensure project root in path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -7,8 +7,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # Provide dummy litellm module so import succeeds
 fake_litellm = types.ModuleType('litellm')
 fake_litellm.completion = MagicMock()
+fake_litellm.acompletion = AsyncMock()
 sys.modules.setdefault('litellm', fake_litellm)
 
+import asyncio
+
 import tournament_utils as tu
 
 
@@ -72,3 +75,122 @@ def test_thinking_disabled_by_default():
         assert mock_comp.call_count == 3
         for call in mock_comp.call_args_list:
             assert call.kwargs['chat_template_kwargs'] == {'enable_thinking': False}
+
+
+def test_async_variants_use_acompletion():
+    resp = make_response(["Final verdict: B"])
+    with patch('tournament_utils.acompletion', new=AsyncMock(return_value=resp)) as mock_acomp:
+        players = asyncio.run(tu.agenerate_players('i', 1, model='m'))
+        score = asyncio.run(tu.aprompt_score('i', ['c'], 'block', 'p', model='m'))
+        winner = asyncio.run(tu.aprompt_pairwise('i', 'block', 'a', 'b', model='m', api_key='k'))
+    assert players == ['Final verdict: B']
+    assert score == winner == 'Final verdict: B'
+    assert mock_acomp.await_count == 3
+    assert mock_acomp.call_args.kwargs['api_key'] == 'k'
+    assert 'Final verdict: A or Final verdict: B' in mock_acomp.call_args.kwargs['messages'][0]['content']
+
+
+def test_judge_cache_skips_repeated_calls(tmp_path):
+    from judge_cache import JudgeCache
+
+    cache = JudgeCache(str(tmp_path / 'cache.sqlite'))
+    resp = make_response(["Final verdict: A"])
+    with patch('tournament_utils.completion', return_value=resp) as mock_comp:
+        first = tu.prompt_pairwise('i', 'block', 'a', 'b', model='m', temperature=0.1, return_usage=True, cache=cache)
+        second = tu.prompt_pairwise('i', 'block', 'a', 'b', model='m', temperature=0.1, return_usage=True, cache=cache)
+        tu.prompt_pairwise('i', 'block', 'a', 'b', model='m', temperature=0.1, explain=True, cache=cache)
+    assert mock_comp.call_count == 2
+    assert first[0] == second[0] == 'Final verdict: A'
+    assert second[1] is None
+
+
+def test_judge_cache_keeps_only_answers_with_a_verdict_per_endpoint(tmp_path):
+    from judge_cache import JudgeCache
+
+    cache = JudgeCache(str(tmp_path / 'cache.sqlite'))
+    answers = ["I cannot decide.", "Final verdict: [[5], [6]]", "Final verdict: [[5], [6]]"]
+    with patch('tournament_utils.completion', side_effect=[make_response([a]) for a in answers]) as mock_comp:
+        call = lambda base: tu.prompt_score_batch('i', ['c'], 'block', ['x', 'y'], model='m', api_base=base, cache=cache)
+        assert call('http://one') == "I cannot decide."
+        assert call('http://one') == "Final verdict: [[5], [6]]"
+        assert call('http://one') == "Final verdict: [[5], [6]]"
+        # The same model name behind another endpoint is another cache entry.
+        assert call('http://two') == "Final verdict: [[5], [6]]"
+        assert call('http://two') == "Final verdict: [[5], [6]]"
+    assert mock_comp.call_count == 3
+    assert len(cache) == 2
+
+
+def test_prompt_score_batch_sends_all_players_once():
+    resp = make_response(["Final verdict: [[5], [6], [7]]"])
+    with patch('tournament_utils.completion', return_value=resp) as mock_comp:
+        result = tu.prompt_score_batch('instr', ['c1'], 'block', ['x', 'y', 'z'], model='m')
+    mock_comp.assert_called_once()
+    prompt = mock_comp.call_args.kwargs['messages'][0]['content']
+    assert prompt.count('instr') == 1
+    assert '<O1>x</O1>' in prompt and '<O3>z</O3>' in prompt
+    assert result == 'Final verdict: [[5], [6], [7]]'
+
+
+def test_prefix_layouts_share_the_judge_prompt_head():
+    resp = make_response(["Final verdict: A"])
+    with patch('tournament_utils.completion', return_value=resp) as mock_comp:
+        tu.prompt_pairwise('instr', 'block', 'a1', 'b1', model='m', layout='prefix')
+        tu.prompt_pairwise('instr', 'block', 'a2', 'b2', model='m', layout='prefix')
+        tu.prompt_score('instr', ['c1'], 'block', 'pl', model='m', layout='split')
+    first, second, split = (c.kwargs['messages'] for c in mock_comp.call_args_list)
+    head = first[0]['content'].split('Task:')[0]
+    assert head.startswith(tu.JUDGE_PREAMBLE)
+    assert head.index('instr') < head.index('block')
+    assert second[0]['content'].startswith(head)
+    assert [m['role'] for m in split] == ['system', 'user']
+    assert head.rstrip() == split[0]['content']
+    assert split[1]['content'].endswith('Output:\npl')
+
+
+def test_structured_mode_requests_a_json_verdict():
+    resp = make_response(['{"verdict": "A"}'])
+    with patch('tournament_utils.completion', return_value=resp) as mock_comp:
+        tu.prompt_pairwise('instr', 'block', 'a', 'b', model='m', structured=True, allow_tie=True)
+        tu.prompt_score('instr', ['c1'], 'block', 'pl', model='m', structured=True, explain=True)
+        tu.prompt_score('instr', ['c1'], 'block', 'pl', model='m')
+    pairwise, explained, plain = mock_comp.call_args_list
+    assert pairwise.kwargs['response_format'] == {'type': 'json_object'}
+    assert '{"verdict": "A"} or {"verdict": "B"} or {"verdict": "tie"}' in pairwise.kwargs['messages'][0]['content']
+    assert '{"reasons": "<' in explained.kwargs['messages'][0]['content']
+    assert 'response_format' not in plain.kwargs
+    assert 'Final verdict:' in plain.kwargs['messages'][0]['content']
+
+
+def test_split_batch_scores():
+    assert tu.split_batch_scores(tu.parse_verdict("Final verdict: [[7, 8], [5, 6]]"), 2) == [[7, 8], [5, 6]]
+    assert tu.split_batch_scores(tu.parse_verdict("Final verdict: [[7, 8]]"), 2) is None
+    assert tu.split_batch_scores(tu.parse_verdict("Final verdict: [7, 8]"), 2) is None
+
+
+def test_parse_ranking():
+    assert tu.parse_ranking(tu.parse_verdict("Final verdict: [2, 3, 1]"), 3) == [1, 2, 0]
+    assert tu.parse_ranking(tu.parse_verdict("Final verdict: [2, 2, 1]"), 3) is None
+    assert tu.parse_ranking(tu.parse_verdict("Final verdict: A"), 3) is None
+
+
+def test_parse_pairwise_tells_ties_and_failures_apart():
+    parse = lambda text: tu.parse_pairwise(tu.parse_verdict(text))
+    assert parse("Final verdict: A") == 'A'
+    assert parse("Final verdict: **B**") == 'B'
+    assert parse("Final verdict: tie") == 'tie'
+    assert parse("Final verdict: [Draw]") == 'tie'
+    assert parse("Final verdict: neither") is None
+    assert parse("no verdict at all") is None
+
+
+def test_parse_verdict_reads_the_last_verdict_line_and_json():
+    reasons = "Reasons:\nA quote of the format: Final verdict: [1, 1]\n" + "filler " * 2000
+    assert tu.parse_verdict(reasons + "\nFinal verdict: [7, 8]") == {'scores': [7, 8]}
+    assert tu.parse_verdict("FINAL VERDICT:\n[7, 8.5]") == {'scores': [7, 8.5]}
+    assert tu.parse_verdict("Final verdict: 7") == {'scores': [7]}
+    assert tu.parse_verdict("```\nFinal verdict: B\n```") == {'winner': 'B'}
+    assert tu.parse_verdict('```json\n{"reasons": "x", "verdict": [[5], [6]]}\n```') == {'scores': [[5], [6]]}
+    assert tu.parse_verdict('Here it is: {"verdict": "tie"}') == {'winner': 'tie'}
+    assert tu.parse_verdict('{"verdict": [7,') == {}
+    assert tu.parse_verdict("The final verdict: A") == {}
@@ -1,4 +1,17 @@
-from litellm import completion
+import ast, json, re
+
+# litellm takes seconds to import; it is loaded on the first model call so that
+# importing this module (and the engine) stays cheap.
+def completion(*args, **kwargs):
+    from litellm import completion
+
+    return completion(*args, **kwargs)
+
+
+async def acompletion(*args, **kwargs):
+    from litellm import acompletion
+
+    return await acompletion(*args, **kwargs)
 
 
 def _completion_kwargs(
@@ -17,6 +30,88 @@ def _completion_kwargs(
     return kwargs
 
 
+def _generate_request(
+    instruction: str,
+    n: int,
+    model: str,
+    api_base: str | None,
+    api_key: str | None,
+    temperature: float | None,
+    thinking: bool,
+) -> dict:
+    """Keyword arguments of the completion call asking for ``n`` answers."""
+    kwargs = _completion_kwargs(api_base, api_key, temperature)
+    kwargs["chat_template_kwargs"] = {"enable_thinking": thinking}
+    return {"model": model, "messages": [{"role": "user", "content": instruction}], "n": n, **kwargs}
+
+
+def _players_result(response, return_usage: bool):
+    players = [c.message.content.strip() for c in response.choices]
+    if return_usage:
+        return players, getattr(response, "usage", None)
+    return players
+
+
+def _text_result(response, return_usage: bool, cache=None, key: str | None = None, valid=None):
+    """The answer text; it is cached under ``key`` only when ``valid(text)`` holds.
+
+    A judge answer without a usable verdict is not cached, so the same
+    request asks the model again instead of failing the same way forever.
+    """
+    text = response.choices[0].message.content.strip()
+    if key is not None and (valid is None or valid(text)):
+        cache.set(key, text)
+    if return_usage:
+        return text, getattr(response, "usage", None)
+    return text
+
+
+def _judge_cache_key(
+    cache, model: str, api_base: str | None, temperature: float | None, thinking: bool, prompt
+) -> str | None:
+    """Cache key for a judge call; the prompt covers criteria, flags and players.
+
+    ``api_base`` is part of the key: the same model name served by another
+    endpoint may be another model.
+    """
+    if cache is None:
+        return None
+    return cache.key(model=model, api_base=api_base or None, temperature=temperature, thinking=thinking, prompt=prompt)
+
+
+def _judge_request(
+    messages: list[dict],
+    model: str,
+    api_base: str | None,
+    api_key: str | None,
+    temperature: float | None,
+    thinking: bool,
+    cache,
+    structured: bool,
+) -> tuple[str | None, dict]:
+    """The cache key of a judge call and the keyword arguments of its completion call.
+
+    Shared by the sync and async prompt functions, which only differ in
+    how they send the request.
+    """
+    key = _judge_cache_key(cache, model, api_base, temperature, thinking, _prompt_key(messages))
+    kwargs = _completion_kwargs(api_base, api_key, temperature)
+    kwargs["chat_template_kwargs"] = {"enable_thinking": thinking}
+    if structured:
+        kwargs["response_format"] = {"type": "json_object"}
+    return key, {"model": model, "messages": messages, **kwargs}
+
+
+def _cached_result(cache, key: str | None, return_usage: bool):
+    """Return the cached judge text (with empty usage) or ``None`` on a miss."""
+    if key is None:
+        return None
+    text = cache.get(key)
+    if text is None:
+        return None
+    return (text, None) if return_usage else text
+
+
 def generate_players(
     instruction: str,
     n: int,
@@ -33,19 +128,252 @@ def generate_players(
     When ``return_usage`` is ``True`` the ``usage`` object from the completion
     response is also returned.
     """
-    messages = [{"role": "user", "content": instruction}]
-    kwargs = _completion_kwargs(api_base, api_key, temperature)
-    kwargs["chat_template_kwargs"] = {"enable_thinking": thinking}
-    response = completion(
-        model=model,
-        messages=messages,
-        n=n,
-        **kwargs,
+    request = _generate_request(instruction, n, model, api_base, api_key, temperature, thinking)
+    return _players_result(completion(**request), return_usage)
+
+
+async def agenerate_players(
+    instruction: str,
+    n: int,
+    model: str = "gpt-4o-mini",
+    *,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    temperature: float | None = None,
+    thinking: bool = False,
+    return_usage: bool = False,
+) -> list[str] | tuple[list[str], object]:
+    """Async variant of :func:`generate_players` using ``litellm.acompletion``."""
+    request = _generate_request(instruction, n, model, api_base, api_key, temperature, thinking)
+    return _players_result(await acompletion(**request), return_usage)
+
+
+PROMPT_LAYOUTS = ("legacy", "prefix", "split")
+
+JUDGE_PREAMBLE = (
+    "You are an impartial judge. Read the instruction and the criteria, then follow the task "
+    "given after them exactly."
+)
+
+
+# Structured verdicts are requested as a JSON object with this key (and a
+# "reasons" key in explain mode), using the provider's JSON response mode.
+VERDICT_KEY = "verdict"
+
+
+def _answer_format(choices: list[str], reasons: str, explain: bool, structured: bool = False) -> str:
+    """How the judge should answer; ``choices`` are the verdicts it may give."""
+    if structured:
+        verdict = " or ".join(f'{{"{VERDICT_KEY}": {c}}}' for c in choices)
+        if not explain:
+            return f"Respond with a JSON object only, exactly like:\n{verdict}"
+        return (
+            "Provide detailed reasons in English.\n"
+            "Respond with a JSON object only, in following format:\n"
+            f'{{"reasons": "<{reasons}>", "{VERDICT_KEY}": {" or ".join(choices)}}}'
+        )
+    verdict = " or ".join(f"Final verdict: {c}" for c in choices)
+    if not explain:
+        return f"Respond in plain text exactly like:\n{verdict}"
+    return (
+        "Provide detailed reasons in English.\n"
+        "Respond in plain text with two sections in following format:\n"
+        f"Reasons:\n<{reasons}>\n\n\n"
+        f"{verdict}"
+    )
+
+
+# Marker of the verdict line in plain-text judge output, matched case-insensitively
+VERDICT_MARKER = "final verdict:"
+# Pairwise verdict label, tolerating brackets, quotes and markdown around it
+PAIRWISE_LABEL_RE = re.compile(r"^\W*(A|B|tie|draw)\b", re.IGNORECASE)
+
+
+def _verdict_value(verdict):
+    """``{"scores": [...]}`` for a list or a number, ``{"winner": str}`` otherwise."""
+    if isinstance(verdict, str):
+        verdict = verdict.strip()
+        # Only lists and numbers are worth decoding; labels are kept as text.
+        if verdict[:1] in ("[", "-", ".") or verdict[:1].isdigit():
+            try:
+                verdict = json.loads(verdict)
+            except ValueError:
+                try:
+                    verdict = ast.literal_eval(verdict)
+                except Exception:
+                    pass
+    if isinstance(verdict, list):
+        return {"scores": verdict}
+    if isinstance(verdict, (int, float)) and not isinstance(verdict, bool):
+        return {"scores": [verdict]}
+    return {"winner": str(verdict)}
+
+
+def parse_verdict(txt: str) -> dict:
+    """Extract verdict information from judge output.
+
+    Structured answers are a JSON object with a ``"verdict"`` key; plain
+    text answers end with a ``Final verdict:`` line. The text is scanned
+    from the end, so long reasoning before the verdict costs a single
+    ``rfind`` and a verdict quoted in the reasons does not shadow the real
+    one. Returns ``{}`` when there is no verdict.
+    """
+    txt = txt.strip()
+    if txt.startswith("```"):
+        txt = txt.partition("\n")[2]
+    if txt.endswith("```"):
+        txt = txt[:-3]
+    txt = txt.strip()
+    if txt.endswith("}"):
+        start = txt.find("{")
+        try:
+            data = json.loads(txt[start:]) if start >= 0 else None
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and VERDICT_KEY in data:
+            return _verdict_value(data[VERDICT_KEY])
+    lower = txt.lower()
+    end = len(lower)
+    while True:
+        at = lower.rfind(VERDICT_MARKER, 0, end)
+        if at < 0:
+            return {}
+        if at == 0 or lower[at - 1] == "\n":
+            break
+        end = at
+    # The verdict may also be on the line after the marker.
+    verdict = txt[at + len(VERDICT_MARKER):].lstrip().partition("\n")[0]
+    return _verdict_value(verdict)
+
+
+def verdict_scores(verdict: dict) -> list | None:
+    """The numbers of a score verdict, ``None`` unless it is a non-empty list of numbers."""
+    scores = verdict.get("scores")
+    if not scores or not all(isinstance(v, (int, float)) for v in scores):
+        return None
+    return scores
+
+
+def split_batch_scores(verdict: dict, k: int) -> list[list] | None:
+    """Demultiplex a batched score verdict into one score list per player.
+
+    Returns ``None`` unless the verdict holds exactly ``k`` non-empty lists of
+    numbers, so the caller can fall back to scoring players one by one.
+    """
+    scores = verdict.get("scores")
+    if not isinstance(scores, list) or len(scores) != k:
+        return None
+    for vals in scores:
+        if not isinstance(vals, list) or not vals or not all(isinstance(v, (int, float)) for v in vals):
+            return None
+    return scores
+
+
+def parse_ranking(verdict: dict, k: int) -> list[int] | None:
+    """Turn a ranking verdict (1-based numbers, best first) into 0-based indices.
+
+    Returns ``None`` unless the verdict is a permutation of ``1..k``.
+    """
+    order = verdict.get("scores")
+    if not isinstance(order, list) or sorted(order) != list(range(1, k + 1)):
+        return None
+    return [int(i) - 1 for i in order]
+
+
+def parse_pairwise(verdict: dict) -> str | None:
+    """Return ``"A"``, ``"B"`` or ``"tie"`` for a pairwise verdict, ``None`` if there is none."""
+    match = PAIRWISE_LABEL_RE.match(str(verdict.get("winner", "")))
+    if not match:
+        return None
+    label = match.group(1).upper()
+    return "tie" if label in ("TIE", "DRAW") else label
+
+
+def _score_answer(text: str) -> bool:
+    return verdict_scores(parse_verdict(text)) is not None
+
+
+def _batch_answer(k: int):
+    return lambda text: split_batch_scores(parse_verdict(text), k) is not None
+
+
+def _pairwise_answer(text: str) -> bool:
+    return parse_pairwise(parse_verdict(text)) is not None
+
+
+def _rank_answer(k: int):
+    return lambda text: parse_ranking(parse_verdict(text), k) is not None
+
+
+def _judge_messages(
+    layout: str,
+    instruction: str,
+    criteria_block: str,
+    include_instruction: bool,
+    header: str,
+    task: str,
+    response_format: str,
+    body: str,
+) -> list[dict]:
+    """Lay out a judge prompt as chat messages.
+
+    ``legacy`` keeps the original single message: task ``header`` and
+    criteria, answer format, instruction, then the players in ``body``.
+    ``prefix`` reorders it so everything shared by the judge calls of a
+    tournament comes first (a fixed preamble, the instruction, the
+    criteria) followed by the ``task``, answer format and players. Providers
+    and servers with prefix caching then reuse the shared part. ``split``
+    uses the same order but sends the shared part as its own system message.
+    """
+    if layout == "legacy":
+        prompt = f"{header}:\n{criteria_block}\n\n{response_format}"
+        if include_instruction:
+            prompt += f"\n\nInstruction:\n{instruction}"
+        return [{"role": "system", "content": f"{prompt}\n\n{body}"}]
+    if layout not in PROMPT_LAYOUTS:
+        raise ValueError(f"Unknown prompt layout: {layout!r}")
+    shared = JUDGE_PREAMBLE
+    if include_instruction:
+        shared += f"\n\nInstruction:\n{instruction}"
+    shared += f"\n\nCriteria:\n{criteria_block}"
+    variable = f"Task: {task}\n{response_format}\n\n{body}"
+    if layout == "split":
+        return [{"role": "system", "content": shared}, {"role": "user", "content": variable}]
+    return [{"role": "system", "content": f"{shared}\n\n{variable}"}]
+
+
+def _prompt_key(messages: list[dict]):
+    """What the judge cache hashes: the text for one message, the messages otherwise."""
+    return messages[0]["content"] if len(messages) == 1 else messages
+
+
+def _score_messages(
+    instruction: str,
+    criteria_list: list[str],
+    criteria_block: str,
+    player: str,
+    include_instruction: bool,
+    explain: bool,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> list[dict]:
+    example_scores = ", ".join(["1-10"] * len(criteria_list)) or "1-10"
+    response_format = _answer_format(
+        [f"<list of each criteria score in range 1-10> (e.g. [{example_scores}])"],
+        "explain your reasoning in each criteria before write final score",
+        explain,
+        structured,
+    )
+    return _judge_messages(
+        layout,
+        instruction,
+        criteria_block,
+        include_instruction,
+        "Evaluate the output below on the following criteria",
+        "Evaluate the output below on each of the criteria.",
+        response_format,
+        f"Output:\n{player}",
     )
-    players = [c.message.content.strip() for c in response.choices]
-    if return_usage:
-        return players, getattr(response, "usage", None)
-    return players
 
 
 def prompt_score(
@@ -62,38 +390,172 @@ def prompt_score(
     thinking: bool = False,
     explain: bool = False,
     return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    structured: bool = False,
 ) -> str | tuple[str, object]:
-    """Return a plaintext score evaluation for `player`."""
+    """Return a plaintext score evaluation for `player`.
+
+    When a :class:`judge_cache.JudgeCache` is passed as ``cache`` identical
+    requests are answered from it and report no usage. With ``structured``
+    the judge is asked for a JSON object (``{"verdict": [...]}``) in the
+    provider's JSON response mode instead of a ``Final verdict:`` line.
+    """
+    messages = _score_messages(instruction, criteria_list, criteria_block, player, include_instruction, explain, layout, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(completion(**request), return_usage, cache, key, _score_answer)
+
+
+async def aprompt_score(
+    instruction: str,
+    criteria_list: list[str],
+    criteria_block: str,
+    player: str,
+    model: str = "gpt-4o-mini",
+    *,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    temperature: float | None = None,
+    include_instruction: bool = True,
+    thinking: bool = False,
+    explain: bool = False,
+    return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> str | tuple[str, object]:
+    """Async variant of :func:`prompt_score`."""
+    messages = _score_messages(instruction, criteria_list, criteria_block, player, include_instruction, explain, layout, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(await acompletion(**request), return_usage, cache, key, _score_answer)
+
+
+def _batch_score_messages(
+    instruction: str,
+    criteria_list: list[str],
+    criteria_block: str,
+    players: list[str],
+    include_instruction: bool,
+    explain: bool,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> list[dict]:
     example_scores = ", ".join(["1-10"] * len(criteria_list)) or "1-10"
-    prompt = f"""Evaluate the output below on the following criteria:
-{criteria_block}
+    example_list = ", ".join(f"[{example_scores}]" for _ in players[:2])
+    response_format = _answer_format(
+        [
+            f"<list with one list of criteria scores in range 1-10 per output, "
+            f"in output order> (e.g. [{example_list}{', …' if len(players) > 2 else ''}])"
+        ],
+        "explain your reasoning for each output before write final scores",
+        explain,
+        structured,
+    )
+    body = "Outputs:" + "".join(f"\n<O{i}>{player}</O{i}>" for i, player in enumerate(players, 1))
+    return _judge_messages(
+        layout,
+        instruction,
+        criteria_block,
+        include_instruction,
+        f"Evaluate each of the {len(players)} outputs below independently on the following criteria",
+        f"Evaluate each of the {len(players)} outputs below independently on each of the criteria.",
+        response_format,
+        body,
+    )
 
-"""
 
-    if explain:
-        prompt += "Provide detailed reasons in English.\n"\
-                "Respond in plain text with two sections in following format:\n" \
-                 "Reasons:\n<explain your reasoning in each criteria before write final score>\n\n\n" \
-                 f"Final verdict: <list of each criteria score in range 1-10> (e.g. [{example_scores}])"
-    else:
-        prompt += "Respond in plain text exactly like:\n" \
-                 f"Final verdict: <list of each criteria score in range 1-10> (e.g. [{example_scores}])"
+def prompt_score_batch(
+    instruction: str,
+    criteria_list: list[str],
+    criteria_block: str,
+    players: list[str],
+    model: str = "gpt-4o-mini",
+    *,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    temperature: float | None = None,
+    include_instruction: bool = True,
+    thinking: bool = False,
+    explain: bool = False,
+    return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> str | tuple[str, object]:
+    """Score several players in one request.
 
-    if include_instruction:
-        prompt += f"\n\nInstruction:\n{instruction}"
+    The instruction and criteria are sent once for the whole batch. The
+    verdict is a list holding one score list per player, in order.
+    """
+    messages = _batch_score_messages(instruction, criteria_list, criteria_block, players, include_instruction, explain, layout, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(completion(**request), return_usage, cache, key, _batch_answer(len(players)))
 
-    prompt += f"\n\nOutput:\n{player}"
-    kwargs = _completion_kwargs(api_base, api_key, temperature)
-    kwargs["chat_template_kwargs"] = {"enable_thinking": thinking}
-    response = completion(
-        model=model,
-        messages=[{"role": "system", "content": prompt}],
-        **kwargs,
+
+async def aprompt_score_batch(
+    instruction: str,
+    criteria_list: list[str],
+    criteria_block: str,
+    players: list[str],
+    model: str = "gpt-4o-mini",
+    *,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    temperature: float | None = None,
+    include_instruction: bool = True,
+    thinking: bool = False,
+    explain: bool = False,
+    return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> str | tuple[str, object]:
+    """Async variant of :func:`prompt_score_batch`."""
+    messages = _batch_score_messages(instruction, criteria_list, criteria_block, players, include_instruction, explain, layout, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(await acompletion(**request), return_usage, cache, key, _batch_answer(len(players)))
+
+
+def _pairwise_messages(
+    instruction: str,
+    criteria_block: str,
+    a: str,
+    b: str,
+    include_instruction: bool,
+    explain: bool,
+    layout: str = "legacy",
+    allow_tie: bool = False,
+    structured: bool = False,
+) -> list[dict]:
+    labels = ["A", "B", "tie"] if allow_tie else ["A", "B"]
+    response_format = _answer_format(
+        [f'"{label}"' for label in labels] if structured else labels,
+        "explain your reasoning in each criteria before write final verdict",
+        explain,
+        structured,
+    )
+    return _judge_messages(
+        layout,
+        instruction,
+        criteria_block,
+        include_instruction,
+        "Compare the two players below using",
+        "Compare the two players below using the criteria.",
+        response_format,
+        f"Players:\n<A>{a}</A>\n<B>{b}</B>",
     )
-    text = response.choices[0].message.content.strip()
-    if return_usage:
-        return text, getattr(response, "usage", None)
-    return text
 
 
 def prompt_pairwise(
@@ -110,38 +572,103 @@ def prompt_pairwise(
     thinking: bool = False,
     explain: bool = False,
     return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    allow_tie: bool = False,
+    structured: bool = False,
 ) -> str | tuple[str, object]:
-    """Return which player wins in plaintext using the given criteria."""
-    prompt = f"""Compare the two players below using:
-{criteria_block}
-
-"""
-
-    verdict_example = "Final verdict: A or Final verdict: B"
-    if explain:
-        prompt += (
-            "Provide detailed reasons in English.\n" \
-            "Respond in plain text with two sections in following format:\n"
-            "Reasons:\n<explain your reasoning in each criteria before write final verdict>\n\n\n"
-            f"{verdict_example}"
-        )
-    else:
-        prompt += (
-            "Respond in plain text exactly like:\n"
-            f"{verdict_example}"
-        )
+    """Return which player wins in plaintext using the given criteria.
 
-    if include_instruction:
-        prompt += f"\n\nInstruction:\n{instruction}"
-    prompt += f"\n\nPlayers:\n<A>{a}</A>\n<B>{b}</B>"
-    kwargs = _completion_kwargs(api_base, api_key, temperature)
-    kwargs["chat_template_kwargs"] = {"enable_thinking": thinking}
-    response = completion(
-        model=model,
-        messages=[{"role": "system", "content": prompt}],
-        **kwargs,
+    With ``allow_tie`` the judge may also answer ``Final verdict: tie``.
+    ``structured`` asks for ``{"verdict": "A"}`` and the like, see
+    :func:`prompt_score`.
+    """
+    messages = _pairwise_messages(instruction, criteria_block, a, b, include_instruction, explain, layout, allow_tie, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(completion(**request), return_usage, cache, key, _pairwise_answer)
+
+
+async def aprompt_pairwise(
+    instruction: str,
+    criteria_block: str,
+    a: str,
+    b: str,
+    model: str = "gpt-4o-mini",
+    *,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    temperature: float | None = None,
+    include_instruction: bool = True,
+    thinking: bool = False,
+    explain: bool = False,
+    return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    allow_tie: bool = False,
+    structured: bool = False,
+) -> str | tuple[str, object]:
+    """Async variant of :func:`prompt_pairwise`."""
+    messages = _pairwise_messages(instruction, criteria_block, a, b, include_instruction, explain, layout, allow_tie, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(await acompletion(**request), return_usage, cache, key, _pairwise_answer)
+
+
+def _rank_messages(
+    instruction: str,
+    criteria_block: str,
+    players: list[str],
+    include_instruction: bool,
+    explain: bool,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> list[dict]:
+    example = ", ".join(str(i) for i in range(len(players), 0, -1))
+    response_format = _answer_format(
+        [f"<list of all output numbers ordered from best to worst> (e.g. [{example}])"],
+        "explain your reasoning in each criteria before write final ranking",
+        explain,
+        structured,
     )
-    text = response.choices[0].message.content.strip()
-    if return_usage:
-        return text, getattr(response, "usage", None)
-    return text
+    body = "Outputs:" + "".join(f"\n<O{i}>{player}</O{i}>" for i, player in enumerate(players, 1))
+    return _judge_messages(
+        layout,
+        instruction,
+        criteria_block,
+        include_instruction,
+        f"Rank the {len(players)} outputs below from best to worst using",
+        f"Rank the {len(players)} outputs below from best to worst using the criteria.",
+        response_format,
+        body,
+    )
+
+
+def prompt_rank(
+    instruction: str,
+    criteria_block: str,
+    players: list[str],
+    model: str = "gpt-4o-mini",
+    *,
+    api_base: str | None = None,
+    api_key: str | None = None,
+    temperature: float | None = None,
+    include_instruction: bool = True,
+    thinking: bool = False,
+    explain: bool = False,
+    return_usage: bool = False,
+    cache=None,
+    layout: str = "legacy",
+    structured: bool = False,
+) -> str | tuple[str, object]:
+    """Return a plaintext ranking of `players` (1-based numbers, best first)."""
+    messages = _rank_messages(instruction, criteria_block, players, include_instruction, explain, layout, structured)
+    key, request = _judge_request(messages, model, api_base, api_key, temperature, thinking, cache, structured)
+    cached = _cached_result(cache, key, return_usage)
+    if cached is not None:
+        return cached
+    return _text_result(completion(**request), return_usage, cache, key, _rank_answer(len(players)))